@@ -0,0 +1 @@
+"""Benchmarks de las páginas: generadores de datos sintéticos, API local y arnés de medida."""
@@ -0,0 +1,231 @@
+"""Sustituto local de la API de eventos para los benchmarks.
+
+Sirve los mismos endpoints que `api_eventos.API_ENDPOINTS` con datos
+sintéticos relacionados entre sí (participantes que apuntan a estudiantes y
+eventos existentes, asistencias de participantes, etc.), con un número de
+filas y una latencia configurables. Como la API real:
+
+- responde con ETag y contesta 304 a las peticiones condicionales,
+- en asistencia y participantes admite `desde_id`, `pagina` y `por_pagina`
+  (ver `sincronizacion`); con `incremental=False` los ignora y devuelve
+  siempre la colección completa, como una API sin soporte incremental.
+
+Los datos se generan y serializan una sola vez al arrancar, así que el coste
+medido es el de la página y no el del servidor.
+
+    python -m benchmarks.api_local --filas 100000 --latencia 0.2
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from utilidades import api_eventos, sincronizacion
+
+SEMILLA = 2025
+CARRERAS = ["Sistemas", "Industrial", "Civil", "Electrónica", "Administración", "Contaduría", "Derecho", "Medicina"]
+DEPARTAMENTOS = ["Matemáticas", "Física", "Informática", "Humanidades", "Idiomas", "Ciencias Básicas"]
+UBICACIONES = ["Auditorio", "Aula 101", "Aula 202", "Laboratorio", "Biblioteca", "Coliseo", "Sala de juntas"]
+ROLES = ["asistente", "ponente", "organizador", "voluntario"]
+
+
+def _fechas(rng, n, desde="2024-01-01", dias=730):
+    base = np.datetime64(desde)
+    return [str(base + int(dia)) for dia in rng.integers(dias, size=n)]
+
+
+def generar(filas):
+    """Registros por endpoint. `filas` es el tamaño de estudiantes, participantes y asistencia."""
+    rng = np.random.default_rng(SEMILLA)
+    n_eventos = max(5, filas // 100)
+    n_categorias = 8
+    n_profesores = max(10, filas // 50)
+    n_asistencias = int(filas * 0.7)
+    fechas_evento = _fechas(rng, n_eventos)
+
+    categorias = [
+        {"id_categoria_evento": i, "nombre_categoria": f"Categoría {i}", "descripcion": f"Eventos de la categoría {i}"}
+        for i in range(1, n_categorias + 1)
+    ]
+    eventos = [
+        {
+            "id_evento": i,
+            "nombre_evento": f"Evento {i}",
+            "fecha_evento": fechas_evento[i - 1],
+            "ubicacion": UBICACIONES[i % len(UBICACIONES)],
+            "id_categoria_evento": int(categoria),
+            "cupo_maximo": int(cupo),
+            "fecha_inicio": f"{fechas_evento[i - 1]}T08:00:00",
+            "fecha_fin": f"{fechas_evento[i - 1]}T10:00:00",
+            "categoria_evento": f"Categoría {categoria}",
+        }
+        for i, categoria, cupo in zip(
+            range(1, n_eventos + 1),
+            rng.integers(1, n_categorias + 1, size=n_eventos),
+            rng.integers(20, 500, size=n_eventos),
+        )
+    ]
+    estudiantes = [
+        {
+            "id_estudiante": i,
+            "nombre": f"Nombre{i}",
+            "apellido": f"Apellido{i % 997}",
+            "correo": f"estudiante{i}@universidad.edu.co",
+            "carrera": CARRERAS[carrera],
+            "semestre": int(semestre),
+            "grado": str(semestre // 3),
+            "grupo": "ABCD"[i % 4],
+            "fechaNacimiento": nacimiento,
+        }
+        for i, carrera, semestre, nacimiento in zip(
+            range(1, filas + 1),
+            rng.integers(len(CARRERAS), size=filas),
+            rng.integers(1, 11, size=filas),
+            _fechas(rng, filas, "1995-01-01", 3650),
+        )
+    ]
+    participantes = [
+        {
+            "id_participante": i,
+            "id_evento": int(evento),
+            "id_estudiante": int(estudiante),
+            "rol": ROLES[rol],
+            "fecha_registro": registro,
+        }
+        for i, evento, estudiante, rol, registro in zip(
+            range(1, filas + 1),
+            rng.integers(1, n_eventos + 1, size=filas),
+            rng.integers(1, filas + 1, size=filas),
+            rng.choice(len(ROLES), size=filas, p=[0.85, 0.05, 0.05, 0.05]),
+            _fechas(rng, filas),
+        )
+    ]
+    asistentes = np.sort(rng.choice(filas, size=n_asistencias, replace=False))
+    asistencia = [
+        {
+            "id_asistencia": i,
+            "id_evento": participantes[p]["id_evento"],
+            "id_participante": participantes[p]["id_participante"],
+            "fecha_asistencia": participantes[p]["fecha_registro"],
+        }
+        for i, p in enumerate(asistentes, start=1)
+    ]
+    profesores = [
+        {
+            "id_profesor": i,
+            "nombre": f"Profesor{i}",
+            "apellido": f"Apellido{i % 211}",
+            "email": f"profesor{i}@universidad.edu.co",
+            "departamento": DEPARTAMENTOS[i % len(DEPARTAMENTOS)],
+            "especialidad": f"Especialidad {i % 15}",
+        }
+        for i in range(1, n_profesores + 1)
+    ]
+    return {
+        "estudiantes": estudiantes,
+        "asistenciaeventos": asistencia,
+        "eventos": eventos,
+        "categoriaevento": categorias,
+        "participantes": participantes,
+        "profesores": profesores,
+    }
+
+
+class ApiLocal:
+    """Servidor HTTP en un hilo con los endpoints de la API de eventos."""
+
+    def __init__(self, filas=1_000, latencia=0.0, puerto=0, incremental=True):
+        self.latencia = latencia
+        self.incremental = incremental
+        self.datos = generar(filas)
+        self.rutas = {urlparse(url).path.rsplit("/", 1)[-1]: tipo for tipo, url in api_eventos.API_ENDPOINTS.items()}
+        self.cuerpos = {tipo: self._serializar(registros) for tipo, registros in self.datos.items()}
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+        api = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api._responder(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", puerto), Manejador)
+        self.servidor.daemon_threads = True
+
+    @staticmethod
+    def _serializar(registros):
+        cuerpo = json.dumps(registros).encode("utf-8")
+        return cuerpo, f'"{hashlib.sha1(cuerpo).hexdigest()}"'
+
+    def publicar(self, tipo, registros):
+        """Sustituye los registros de `tipo` (p. ej. para simular altas o cambios entre refrescos)."""
+        self.datos[tipo] = registros
+        self.cuerpos[tipo] = self._serializar(registros)
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}/api"
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def _cuerpo(self, tipo, consulta):
+        if self.incremental and tipo in sincronizacion.INCREMENTALES and sincronizacion.PARAMETRO_DESDE_ID in consulta:
+            columna_id = sincronizacion.INCREMENTALES[tipo][0]
+            desde = int(consulta[sincronizacion.PARAMETRO_DESDE_ID][0])
+            pagina = int(consulta.get(sincronizacion.PARAMETRO_PAGINA, ["1"])[0])
+            por_pagina = int(consulta.get(sincronizacion.PARAMETRO_POR_PAGINA, [str(sincronizacion.POR_PAGINA)])[0])
+            nuevos = [registro for registro in self.datos[tipo] if registro[columna_id] > desde]
+            return self._serializar(nuevos[(pagina - 1) * por_pagina:pagina * por_pagina])
+        return self.cuerpos[tipo]
+
+    def _responder(self, peticion):
+        if self.latencia:
+            time.sleep(self.latencia)
+        url = urlparse(peticion.path)
+        tipo = self.rutas.get(url.path.rstrip("/").rsplit("/", 1)[-1])
+        if tipo is None:
+            peticion.send_response(404)
+            peticion.end_headers()
+            return
+        cuerpo, etag = self._cuerpo(tipo, parse_qs(url.query))
+        if peticion.headers.get("If-None-Match") == etag:
+            peticion.send_response(304)
+            peticion.send_header("ETag", etag)
+            peticion.end_headers()
+            return
+        peticion.send_response(200)
+        peticion.send_header("Content-Type", "application/json")
+        peticion.send_header("Content-Length", str(len(cuerpo)))
+        peticion.send_header("ETag", etag)
+        peticion.end_headers()
+        peticion.wfile.write(cuerpo)
+        with self._lock:
+            self.bytes_enviados += len(cuerpo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=1_000)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por petición")
+    parser.add_argument("--puerto", type=int, default=8765)
+    argumentos = parser.parse_args()
+    api = ApiLocal(argumentos.filas, argumentos.latencia, argumentos.puerto)
+    print(f"API local en {api.url} (Ctrl+C para salir)")
+    try:
+        api.servidor.serve_forever()
+    except KeyboardInterrupt:
+        api.servidor.server_close()
@@ -0,0 +1,100 @@
+"""Generador de registros sintéticos de carros eléctricos.
+
+Produce CSVs con las mismas columnas que `registros_carros_electricos.csv` y
+cardinalidades parecidas: lugares, tipos de carga y baterías salen de las
+frecuencias del CSV real, el modelo depende de la marca, la versión de
+software tiene ~1.000 valores distintos y los nombres combinan nombres y
+apellidos reales, así que son casi únicos. Se escribe por bloques, de modo que
+generar 10 millones de filas no necesita tenerlas en memoria.
+
+La semilla es fija: el mismo tamaño produce siempre el mismo archivo.
+
+    python -m benchmarks.datos_ev 1m
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utilidades import dataset_ev
+from utilidades.archivos import DIRECTORIO_CACHE, escribir_atomico
+
+DIRECTORIO = DIRECTORIO_CACHE / "benchmarks" / "datos"
+TAMANOS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+FILAS_POR_BLOQUE = 250_000
+SEMILLA = 2025
+RUTA_REAL = dataset_ev.RAIZ / "static" / "datasets" / "registros_carros_electricos.csv"
+
+
+def _frecuencias(serie):
+    conteo = serie.value_counts(normalize=True).sort_index()
+    return conteo.index.to_numpy(dtype=object), conteo.to_numpy()
+
+
+def _modelo_base(ruta_csv=RUTA_REAL):
+    """Distribuciones de cada columna sacadas del CSV real."""
+    real = pd.read_csv(ruta_csv)
+    partes = real["nombre"].str.split()
+    return {
+        "nombres": partes.str[0].unique(),
+        "apellidos": partes.str[1:].explode().dropna().unique(),
+        "lugar_registro": _frecuencias(real["lugar_registro"]),
+        "marca_modelo": _frecuencias(real["marca_auto"] + "|" + real["modelo_auto"]),
+        "tipo_carga": _frecuencias(real["tipo_carga"]),
+        "baterias_recicladas": _frecuencias(real["baterias_recicladas"]),
+        "fechas": pd.to_datetime(real["fecha_registro"]),
+    }
+
+
+def _bloque(rng, base, filas):
+    def elegir(clave):
+        valores, probabilidades = base[clave]
+        return valores[rng.choice(len(valores), size=filas, p=probabilidades)]
+
+    nombres = base["nombres"][rng.integers(len(base["nombres"]), size=filas)]
+    apellido1 = base["apellidos"][rng.integers(len(base["apellidos"]), size=filas)]
+    apellido2 = base["apellidos"][rng.integers(len(base["apellidos"]), size=filas)]
+    marca_modelo = pd.Series(elegir("marca_modelo")).str.split("|", n=1, expand=True)
+    desde, hasta = base["fechas"].min(), base["fechas"].max()
+    dias = rng.integers((hasta - desde).days + 1, size=filas)
+    version = rng.integers([1, 0, 0], [11, 10, 10], size=(filas, 3))
+    return pd.DataFrame({
+        "nombre": pd.Series(nombres, dtype=object) + " " + apellido1 + " " + apellido2,
+        "edad": rng.integers(18, 81, size=filas),
+        "lugar_registro": elegir("lugar_registro"),
+        "marca_auto": marca_modelo[0],
+        "modelo_auto": marca_modelo[1],
+        "año_modelo": rng.integers(2018, 2026, size=filas),
+        "autonomia_km": rng.integers(150, 601, size=filas),
+        "tipo_carga": elegir("tipo_carga"),
+        "fecha_registro": (desde + pd.to_timedelta(dias, unit="D")).strftime("%Y-%m-%d"),
+        "version_software": [f"{a}.{b}.{c}" for a, b, c in version],
+        "baterias_recicladas": elegir("baterias_recicladas"),
+    })
+
+
+def generar(filas, ruta=None, semilla=SEMILLA):
+    """Escribe un CSV de `filas` registros (si no existe ya) y devuelve su ruta."""
+    ruta = Path(ruta) if ruta else DIRECTORIO / f"registros_ev_{filas}.csv"
+    if ruta.exists():
+        return ruta
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    base = _modelo_base()
+
+    def escribir(temporal):
+        with open(temporal, "w", encoding="utf-8", newline="") as archivo:
+            for inicio in range(0, filas, FILAS_POR_BLOQUE):
+                bloque = _bloque(rng, base, min(FILAS_POR_BLOQUE, filas - inicio))
+                bloque.to_csv(archivo, index=False, header=inicio == 0)
+
+    escribir_atomico(ruta, escribir)
+    return ruta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tamanos", nargs="+", choices=list(TAMANOS))
+    for tamano in parser.parse_args().tamanos:
+        print(generar(TAMANOS[tamano]))
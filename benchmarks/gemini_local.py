@@ -0,0 +1,155 @@
+"""Sustituto local de la API de Gemini para los benchmarks y las pruebas de Moto-Chat.
+
+Responde a `generateContent` y a `streamGenerateContent?alt=sse` con el mismo
+formato que la API real, así que el `genai.Client` de `chat_gemini` funciona
+sin cambios apuntando MIPROYECTO_GEMINI_URL a este servidor. La respuesta es
+un texto de relleno que depende de la pregunta, partido en `trozos`, con una
+latencia configurable antes del primer trozo y entre trozos.
+
+Con `cuota` simula el límite de peticiones por minuto de la API real: las que
+lo superan reciben un 429 RESOURCE_EXHAUSTED.
+
+Cuenta las peticiones que recibe (para comprobar qué preguntas salen de la
+caché o se agrupan sin llegar a la API), las rechazadas por cuota y el máximo
+de peticiones simultáneas.
+
+    python -m benchmarks.gemini_local --primer-trozo 0.8 --entre-trozos 0.05 --cuota 15
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+PALABRAS = (
+    "La moto naked deja el motor a la vista y prioriza una postura erguida y cómoda, "
+    "mientras que la sport lleva carenado completo, semimanillares y una posición más "
+    "agresiva pensada para la velocidad y el circuito."
+).split()
+
+
+class GeminiLocal:
+    """Servidor HTTP en un hilo con los endpoints de generación de contenido."""
+
+    def __init__(self, trozos=20, primer_trozo=0.0, entre_trozos=0.0, cuota=None, puerto=0):
+        self.trozos = trozos
+        self.primer_trozo = primer_trozo
+        self.entre_trozos = entre_trozos
+        self.cuota = cuota  # Peticiones por minuto, o None para no limitar
+        self.peticiones = 0
+        self.rechazadas = 0
+        self.simultaneas_max = 0
+        self._simultaneas = 0
+        self._ultimas = deque()  # Instantes de las peticiones aceptadas en el último minuto
+        self._lock = threading.Lock()
+        gemini = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                gemini._responder(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", puerto), Manejador)
+        self.servidor.daemon_threads = True
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def texto(self, pregunta):
+        """Trozos de la respuesta a `pregunta` (siempre los mismos para la misma pregunta)."""
+        inicio = sum(map(ord, pregunta)) % len(PALABRAS)
+        palabras = [PALABRAS[(inicio + i) % len(PALABRAS)] for i in range(self.trozos * 3)]
+        return [" ".join(palabras[i:i + 3]) + " " for i in range(0, len(palabras), 3)]
+
+    @staticmethod
+    def _parte(texto):
+        return {"candidates": [{"content": {"parts": [{"text": texto}], "role": "model"}, "index": 0}]}
+
+    def _admitir(self):
+        # False si la petición supera la cuota del último minuto
+        with self._lock:
+            self.peticiones += 1
+            ahora = time.monotonic()
+            while self._ultimas and ahora - self._ultimas[0] >= 60:
+                self._ultimas.popleft()
+            if self.cuota is not None and len(self._ultimas) >= self.cuota:
+                self.rechazadas += 1
+                return False
+            self._ultimas.append(ahora)
+            self._simultaneas += 1
+            self.simultaneas_max = max(self.simultaneas_max, self._simultaneas)
+            return True
+
+    def _responder(self, peticion):
+        cuerpo = json.loads(peticion.rfile.read(int(peticion.headers.get("Content-Length", 0))) or b"{}")
+        if not self._admitir():
+            error = {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}
+            respuesta = json.dumps(error).encode("utf-8")
+            peticion.send_response(429)
+            peticion.send_header("Content-Type", "application/json")
+            peticion.send_header("Content-Length", str(len(respuesta)))
+            peticion.end_headers()
+            peticion.wfile.write(respuesta)
+            return
+        try:
+            self._generar(peticion, cuerpo)
+        finally:
+            with self._lock:
+                self._simultaneas -= 1
+
+    def _generar(self, peticion, cuerpo):
+        url = urlparse(peticion.path)
+        pregunta = " ".join(
+            parte.get("text", "") for contenido in cuerpo.get("contents", []) for parte in contenido.get("parts", [])
+        )
+        trozos = self.texto(pregunta)
+        time.sleep(self.primer_trozo)
+        if url.path.endswith(":streamGenerateContent"):
+            peticion.send_response(200)
+            peticion.send_header("Content-Type", "text/event-stream")
+            peticion.end_headers()
+            for numero, trozo in enumerate(trozos):
+                if numero:
+                    time.sleep(self.entre_trozos)
+                peticion.wfile.write(f"data: {json.dumps(self._parte(trozo))}\r\n\r\n".encode("utf-8"))
+                peticion.wfile.flush()
+            return
+        time.sleep(self.entre_trozos * (len(trozos) - 1))
+        respuesta = json.dumps(self._parte("".join(trozos))).encode("utf-8")
+        peticion.send_response(200)
+        peticion.send_header("Content-Type", "application/json")
+        peticion.send_header("Content-Length", str(len(respuesta)))
+        peticion.end_headers()
+        peticion.wfile.write(respuesta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trozos", type=int, default=20)
+    parser.add_argument("--primer-trozo", type=float, default=0.0, help="segundos hasta el primer trozo")
+    parser.add_argument("--entre-trozos", type=float, default=0.0, help="segundos entre trozos")
+    parser.add_argument("--cuota", type=int, help="peticiones por minuto antes de responder 429")
+    parser.add_argument("--puerto", type=int, default=8766)
+    argumentos = parser.parse_args()
+    gemini = GeminiLocal(
+        argumentos.trozos, argumentos.primer_trozo, argumentos.entre_trozos, argumentos.cuota, argumentos.puerto
+    )
+    print(f"Gemini local en {gemini.url} (Ctrl+C para salir)")
+    try:
+        gemini.servidor.serve_forever()
+    except KeyboardInterrupt:
+        gemini.servidor.server_close()
@@ -0,0 +1,323 @@
+"""Arnés de benchmarks de las páginas de Streamlit.
+
+Cada escenario ejecuta una página sin navegador (`streamlit.testing.v1.AppTest`)
+en un proceso hijo, con su propia caché en disco vacía, y registra:
+
+- arranque: segundos de la primera ejecución completa (caché fría, proceso nuevo
+  sin pandas ni las demás librerías pesadas importadas),
+- primer_pintado e importar: del tramo del mismo nombre de esa primera
+  ejecución (ver `trazas.primer_pintado`); el primer pintado se compara con
+  `trazas.PRESUPUESTO_PRIMER_PINTADO`,
+- reruns: segundos de cada interacción (p. ej. cambiar un filtro), repetida,
+- rss_pico: memoria residente máxima del proceso hijo,
+- bytes_pagina: tamaño de los elementos que la página envía al navegador,
+- bytes_api: bytes servidos por la API local (solo en la página de eventos),
+- peticiones_gemini: preguntas que llegan al Gemini local (solo en Moto-Chat).
+
+Las páginas leen los datos generados y las APIs locales a través de las
+variables de entorno MIPROYECTO_CSV_EV, MIPROYECTO_API_EVENTOS,
+MIPROYECTO_GEMINI_URL y MIPROYECTO_CACHE.
+
+    python -m benchmarks.medir                       # todos los escenarios, tamaños pequeños
+    python -m benchmarks.medir datos --tamanos 10k 1m
+    python -m benchmarks.medir --comparar base.json  # sale con error si algo empeora
+
+También sale con error si alguna página supera el presupuesto de primer pintado.
+
+Los resultados se guardan en JSON (por defecto en .cache/benchmarks/) para
+poder compararlos con una ejecución anterior.
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Tuple
+
+# Solo librerías ligeras: el proceso hijo mide el arranque en frío de la página, y los módulos con
+# pandas o numpy (datos_ev, api_local...) se importan en el proceso principal, dentro de `medir`
+from utilidades import trazas
+from utilidades.archivos import DIRECTORIO_CACHE
+
+RAIZ = Path(__file__).resolve().parent.parent
+DIRECTORIO = DIRECTORIO_CACHE / "benchmarks"
+FILAS_API = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+TAMANOS_EV = ("10k", "1m", "10m")  # Claves de datos_ev.TAMANOS
+TIMEOUT_PAGINA = 600  # Segundos máximos por ejecución de la página
+TOLERANCIA = 0.25  # Empeoramiento relativo a partir del cual se marca una regresión
+
+
+class Escenario(NamedTuple):
+    pagina: str
+    tamanos: Tuple[str, ...]  # El primero es el que se usa por defecto
+    acciones: List[Tuple[str, Callable]]  # (nombre, acción sobre el AppTest antes del rerun)
+
+
+def _elegir_opciones(widget, cuantas):
+    return widget.set_value(list(widget.options)[:cuantas])
+
+
+def _tabla(nombre):
+    return lambda at: at.sidebar.selectbox[0].select(nombre)
+
+
+def _preguntar(preguntas):
+    def aplicar(at):
+        at.text_input[0].set_value(next(preguntas))
+        at.button[0].click()
+    return aplicar
+
+
+ESCENARIOS = {
+    "inicio": Escenario("inicio.py", ("-",), [("rerun", lambda at: None)]),
+    "descripcion": Escenario("pages/2_DescripciónData.py", ("-",), [("rerun", lambda at: None)]),
+    "datos": Escenario(
+        "pages/3_Data.py",
+        TAMANOS_EV,
+        [
+            ("rerun", lambda at: None),
+            ("lugares", lambda at: _elegir_opciones(at.sidebar.multiselect[0], 10)),
+            ("marcas", lambda at: _elegir_opciones(at.sidebar.multiselect[1], 9)),
+            ("edad", lambda at: at.sidebar.slider[1].set_value((30, 50))),
+        ],
+    ),
+    "eventos": Escenario(
+        "pages/1_Proyecto Integrador.py",
+        tuple(FILAS_API),
+        [
+            ("rerun", lambda at: None),
+            ("eventos", _tabla("Eventos")),
+            ("participantes", _tabla("Participantes")),
+            ("asistencia", _tabla("Asistencia Eventos")),
+            ("analitica", _tabla("Analítica de Eventos")),
+            ("estudiantes", _tabla("Estudiantes")),
+        ],
+    ),
+    "chat": Escenario(
+        "pages/4_ChatGemini.py",
+        ("-",),
+        [
+            ("pregunta_nueva", _preguntar(f"¿Qué moto recomiendas para la ruta {i}?" for i in itertools.count())),
+            ("pregunta_repetida", _preguntar(itertools.cycle(["¿Diferencia entre naked y sport?", "diferencia entre NAKED y sport"]))),
+        ],
+    ),
+}
+
+
+def _bytes_elementos(nodo):
+    proto = getattr(nodo, "proto", None)
+    total = proto.ByteSize() if proto is not None else 0
+    for hijo in getattr(nodo, "children", {}).values():
+        total += _bytes_elementos(hijo)
+    return total
+
+
+def _rss_pico():
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def _tramos_primer_rerun():
+    # Segundos por tramo del primer rerun, leídos del log de trazas de la caché del hijo
+    segundos = {}
+    try:
+        lineas = (trazas.DIRECTORIO / "trazas.jsonl").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return segundos
+    for linea in lineas:
+        registro = json.loads(linea)
+        if registro.get("rerun") == 1:
+            segundos.setdefault(registro["tramo"], registro["segundos"])
+    return segundos
+
+
+def medir_pagina(nombre, repeticiones):
+    """Se ejecuta en el proceso hijo: corre la página y devuelve las medidas."""
+    from streamlit.testing.v1 import AppTest
+
+    escenario = ESCENARIOS[nombre]
+    at = AppTest.from_file(str(RAIZ / escenario.pagina), default_timeout=TIMEOUT_PAGINA)
+    inicio = time.perf_counter()
+    at.run()
+    medidas = {
+        "arranque": time.perf_counter() - inicio,
+        "bytes_pagina": _bytes_elementos(at._tree),
+        "errores": [str(excepcion.message) for excepcion in at.exception],
+        "reruns": {},
+    }
+    tramos = _tramos_primer_rerun()
+    for tramo in ("primer_pintado", "importar"):
+        if tramo in tramos:
+            medidas[tramo] = tramos[tramo]
+    for accion, aplicar in escenario.acciones:
+        tiempos = []
+        for _ in range(repeticiones):
+            aplicar(at)
+            inicio = time.perf_counter()
+            at.run()
+            tiempos.append(time.perf_counter() - inicio)
+        medidas["reruns"][accion] = {
+            "mediana": statistics.median(tiempos),
+            "maximo": max(tiempos),
+            "bytes_pagina": _bytes_elementos(at._tree),
+        }
+        medidas["errores"] += [str(excepcion.message) for excepcion in at.exception]
+    medidas["rss_pico"] = _rss_pico()
+    return medidas
+
+
+def _ejecutar_hijo(nombre, entorno, repeticiones):
+    comando = [sys.executable, "-m", "benchmarks.medir", "--hijo", nombre, "--repeticiones", str(repeticiones)]
+    try:
+        proceso = subprocess.run(
+            comando, cwd=RAIZ, env={**os.environ, **entorno}, capture_output=True, text=True, timeout=TIMEOUT_PAGINA * 10
+        )
+    except subprocess.TimeoutExpired:
+        return {"errores": ["tiempo agotado"]}
+    if proceso.returncode != 0:
+        return {"errores": [proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else f"código {proceso.returncode}"]}
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def medir(nombre, tamano, repeticiones=3, latencia=0.0):
+    """Mide un escenario en un proceso nuevo con la caché en disco vacía."""
+    from benchmarks import datos_ev
+    from benchmarks.api_local import ApiLocal
+    from benchmarks.gemini_local import GeminiLocal
+
+    cache = DIRECTORIO / "cache" / f"{nombre}-{tamano}"
+    shutil.rmtree(cache, ignore_errors=True)
+    cache.mkdir(parents=True)
+    entorno = {"MIPROYECTO_CACHE": str(cache)}
+    api = gemini = None
+    if nombre == "datos":
+        entorno["MIPROYECTO_CSV_EV"] = str(datos_ev.generar(datos_ev.TAMANOS[tamano]))
+    elif nombre == "eventos":
+        api = ApiLocal(FILAS_API[tamano], latencia).iniciar()
+        entorno["MIPROYECTO_API_EVENTOS"] = api.url
+    elif nombre == "chat":
+        gemini = GeminiLocal(primer_trozo=latencia, entre_trozos=latencia / 20).iniciar()
+        entorno.update({"MIPROYECTO_GEMINI_URL": gemini.url, "GEMINI_API_KEY": "local"})
+    try:
+        medidas = _ejecutar_hijo(nombre, entorno, repeticiones)
+    finally:
+        for servidor in (api, gemini):
+            if servidor is not None:
+                servidor.detener()
+        shutil.rmtree(cache, ignore_errors=True)
+    if api is not None:
+        medidas["bytes_api"] = api.bytes_enviados
+    if gemini is not None:
+        medidas["peticiones_gemini"] = gemini.peticiones
+    return {"escenario": nombre, "tamano": tamano, **medidas}
+
+
+def _metricas(resultado):
+    """Medidas comparables entre ejecuciones: nombre -> valor (mayor es peor)."""
+    metricas = {
+        "arranque": resultado.get("arranque"),
+        "primer_pintado": resultado.get("primer_pintado"),
+        "rss_pico": resultado.get("rss_pico"),
+    }
+    for accion, medidas in resultado.get("reruns", {}).items():
+        metricas[f"rerun:{accion}"] = medidas["mediana"]
+    return {clave: valor for clave, valor in metricas.items() if valor is not None}
+
+
+def regresiones(actuales, base, tolerancia=TOLERANCIA):
+    """Lista de (escenario, tamaño, métrica, antes, ahora) que empeoran más de la tolerancia."""
+    anteriores = {(r["escenario"], r["tamano"]): _metricas(r) for r in base}
+    peores = []
+    for resultado in actuales:
+        antes = anteriores.get((resultado["escenario"], resultado["tamano"]), {})
+        for metrica, ahora in _metricas(resultado).items():
+            if metrica in antes and ahora > antes[metrica] * (1 + tolerancia):
+                peores.append((resultado["escenario"], resultado["tamano"], metrica, antes[metrica], ahora))
+    return peores
+
+
+def fuera_de_presupuesto(resultados, presupuesto):
+    """Lista de (escenario, tamaño, primer pintado) que superan `presupuesto` segundos."""
+    return [
+        (resultado["escenario"], resultado["tamano"], resultado["primer_pintado"])
+        for resultado in resultados
+        if resultado.get("primer_pintado") is not None and resultado["primer_pintado"] > presupuesto
+    ]
+
+
+def _resumen(resultado):
+    if "arranque" not in resultado:
+        return f"{resultado['escenario']:<12} {resultado['tamano']:>5}  ERROR {resultado['errores']}"
+    reruns = ", ".join(f"{accion} {medidas['mediana'] * 1000:.0f} ms" for accion, medidas in resultado["reruns"].items())
+    linea = (
+        f"{resultado['escenario']:<12} {resultado['tamano']:>5}  arranque {resultado['arranque']:.2f} s  "
+        f"RSS {resultado['rss_pico'] / 1024 ** 2:.0f} MiB  página {resultado['bytes_pagina'] / 1024:.0f} KiB"
+    )
+    if "primer_pintado" in resultado:
+        linea += f"  primer pintado {resultado['primer_pintado'] * 1000:.0f} ms"
+    if "importar" in resultado:
+        linea += f" (importar {resultado['importar'] * 1000:.0f} ms)"
+    if "bytes_api" in resultado:
+        linea += f"  API {resultado['bytes_api'] / 1024:.0f} KiB"
+    if "peticiones_gemini" in resultado:
+        linea += f"  Gemini {resultado['peticiones_gemini']} peticiones"
+    if resultado["errores"]:
+        linea += f"  ERRORES {len(resultado['errores'])}"
+    return f"{linea}\n{'':<19}{reruns}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("escenarios", nargs="*", help=f"{', '.join(ESCENARIOS)} (por defecto, todos)")
+    parser.add_argument("--tamanos", nargs="+", help="tamaños por escenario (10k/1m/10m o 1k/10k/100k)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--latencia", type=float, default=0.0, help="latencia de las APIs locales en segundos")
+    parser.add_argument("--salida", type=Path)
+    parser.add_argument("--comparar", type=Path, help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args(argv)
+    desconocidos = set(argumentos.escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    if argumentos.hijo:
+        print(json.dumps(medir_pagina(argumentos.hijo, argumentos.repeticiones)))
+        return 0
+
+    resultados = []
+    for nombre in argumentos.escenarios or list(ESCENARIOS):
+        escenario = ESCENARIOS[nombre]
+        tamanos = [t for t in argumentos.tamanos or escenario.tamanos[:1] if t in escenario.tamanos] or escenario.tamanos[:1]
+        for tamano in tamanos:
+            resultado = medir(nombre, tamano, argumentos.repeticiones, argumentos.latencia)
+            print(_resumen(resultado), flush=True)
+            resultados.append(resultado)
+
+    salida = argumentos.salida or DIRECTORIO / f"resultados-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados en {salida}")
+
+    codigo = 0
+    for nombre, tamano, segundos in fuera_de_presupuesto(resultados, trazas.PRESUPUESTO_PRIMER_PINTADO):
+        print(f"PRESUPUESTO {nombre} {tamano} primer pintado: {segundos:.3g} s > {trazas.PRESUPUESTO_PRIMER_PINTADO:.3g} s")
+        codigo = 1
+    if argumentos.comparar:
+        peores = regresiones(resultados, json.loads(argumentos.comparar.read_text(encoding="utf-8")), argumentos.tolerancia)
+        for nombre, tamano, metrica, antes, ahora in peores:
+            print(f"REGRESIÓN {nombre} {tamano} {metrica}: {antes:.3g} -> {ahora:.3g}")
+        if peores:
+            codigo = 1
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # inicio.py
 import streamlit as st
 
+from utilidades import arranque, trazas
+
 # Configuración de la página de Streamlit
 # Ancho de la página y título
 st.set_page_config(
@@ -8,6 +10,7 @@ st.set_page_config(
     layout="centered", # 'centered' o 'wide'
     initial_sidebar_state="collapsed" # Oculta la barra lateral por defecto
 )
+trazas.iniciar("inicio")
 
 # Estilo personalizado para el fondo degradado y la fuente
 # Streamlit permite inyectar CSS directamente
@@ -83,6 +86,7 @@ st.markdown(
 
 # Título del Proyecto
 st.title("Proyecto Integrador")
+trazas.primer_pintado()
 
 # Breve Descripción del Proyecto
 st.markdown(
@@ -121,3 +125,8 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+# Con la portada ya pintada, se precargan en segundo plano las librerías y los datos de las demás páginas
+arranque.precargar()
+
+trazas.cerrar()
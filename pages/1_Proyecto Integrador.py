@@ -1,119 +1,132 @@
+import inspect
+import threading
 import streamlit as st
-import requests
-import pandas as pd
 from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utilidades import trazas
 
 # Configuración de la página
 st.set_page_config(page_title="Gestión de Eventos Escolares", layout="wide")
+trazas.iniciar("eventos")
 st.title("🏫 Gestión de Eventos Escolares")
+trazas.primer_pintado()
+
+# pandas, requests y los módulos de datos se importan con el título ya pintado
+with trazas.importaciones():
+    import requests
+    import pandas as pd
+    from utilidades import api_eventos, busqueda, esquemas, exportacion, indices_eventos, refresco, snapshots
+    from utilidades.indices_eventos import TABLAS, version_tabla
+    from utilidades.paginacion import tabla_paginada
+    from utilidades.relacional import AlmacenEventos
+    from utilidades.api_eventos import API_ENDPOINTS
 
-# URLs de la API (DEBEN ser consistentes con los nombres usados en cargar_datos)
-API_ENDPOINTS = {
-    "estudiantes": "https://eventos-25.onrender.com/api/estudiantes",
-    "asistenciaeventos": "https://eventos-25.onrender.com/api/asistenciaeventos",
-    "eventos": "https://eventos-25.onrender.com/api/eventos",
-    "categoriaevento": "https://eventos-25.onrender.com/api/categoriasevento", # <-- ¡CORRECCIÓN AQUÍ! Mantenemos "categoriaevento" (singular)
-    "participantes": "https://eventos-25.onrender.com/api/participantes",
-    "profesores" : "https://eventos-25.onrender.com/api/profesores",
-}
-
-@st.cache_data(ttl=300)  # Cache de 5 minutos
+# Las tablas las mantiene al día el hilo de refresco en segundo plano (utilidades.refresco): un único
+# DataFrame por proceso para todas las sesiones, respaldado por un archivo Arrow mapeado en memoria que
+# comparten los procesos del servidor, y que se sustituye entero al refrescarse (sin esperar a que caduque)
 def cargar_datos(tipo):
-    try:
-        response = requests.get(API_ENDPOINTS[tipo], timeout=30)
-        response.raise_for_status() # Lanza un error para códigos de estado HTTP 4xx/5xx
-        data = response.json()
-        return pd.DataFrame(data)
-    except requests.exceptions.RequestException as e:
+    # Los errores se propagan; se muestran en mostrar_error_carga
+    return refresco.tabla(tipo)
+
+def cargar_datos_medido(tipo):
+    # Se ejecuta en los hilos de carga, que llevan el contexto de la sesión
+    with trazas.tramo("cargar_datos", cacheado=True, endpoint=tipo) as tramo:
+        df = cargar_datos(tipo)
+        tramo.filas_salida = len(df)
+        tramo.bytes = trazas.bytes_de(df)
+        tramo.extra["origen"] = df.attrs.get("snapshot", {}).get("origen")
+    return df
+
+def mostrar_error_carga(tipo, e):
+    if isinstance(e, TimeoutError):
+        st.error(f"Tiempo de espera agotado al cargar {tipo}: {str(e)}")
+    elif isinstance(e, requests.exceptions.RequestException):
         st.error(f"Error de red o API al cargar {tipo}: {str(e)}")
-        return pd.DataFrame()
-    except ValueError as e: # Para errores si la respuesta no es JSON
+    elif isinstance(e, ValueError): # Para errores si la respuesta no es JSON
         st.error(f"Error al decodificar JSON para {tipo}: {str(e)}. La API podría no estar devolviendo JSON válido.")
-        return pd.DataFrame()
-    except KeyError as e: # Específicamente para el error de clave no encontrada
+    elif isinstance(e, KeyError): # Específicamente para el error de clave no encontrada
         st.error(f"Error: La clave '{tipo}' no se encontró en API_ENDPOINTS. Revise la consistencia de los nombres. Detalle: {e}")
-        return pd.DataFrame()
-    except Exception as e:
+    else:
         st.error(f"Error inesperado al cargar {tipo}: {str(e)}")
-        return pd.DataFrame()
 
 # Mostrar el código de la función cargar_datos si el usuario lo desea
 with st.expander("📄 Ver código de la función cargar_datos", expanded=False):
     # Ya no es necesario el if st.button("Mostrar código fuente"):
     # ya que el código se muestra cuando el expander está abierto.
-    st.code('''import streamlit as st
-import requests
-import pandas as pd
-from datetime import datetime
-@st.cache_data(ttl=300)  # Cache de 5 minutos
-def cargar_datos(tipo):
-    try:
-        response = requests.get(API_ENDPOINTS[tipo], timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data)
-    except Exception as e: # Una excepción más general para captura, pero las específicas son mejores
-        st.error(f"Error al cargar {tipo}: {str(e)}")
-        return pd.DataFrame()''', language='python')
-
-
-# Cargar todos los datos
-with st.spinner("Cargando datos del evento..."):
-    # ¡CORRECCIÓN AQUÍ! Llamada ahora es "categoriaevento" (singular)
-    estudiantes_df = cargar_datos("estudiantes")
-    asistenciaeventos_df = cargar_datos("asistenciaeventos")
-    eventos_df = cargar_datos("eventos")
-    categoriaevento_df = cargar_datos("categoriaevento") # <--- ¡CORREGIDO AQUI!
-    participantes_df = cargar_datos("participantes")
-    profesores_df = cargar_datos("profesores")
+    # Se muestra el código real: cargar_datos y lo que usa de utilidades.refresco
+    fuentes = [cargar_datos, refresco.tabla, refresco.obtener]
+    st.code("\n\n".join(inspect.getsource(funcion) for funcion in fuentes), language='python')
+
+
+# Vista que cruza todas las tablas a través del almacén relacional
+VISTA_ANALITICA = "Analítica de Eventos"
 
 # Sidebar con selección de tabla principal
 st.sidebar.header("🔍 Filtros Principales")
 tabla_seleccionada = st.sidebar.selectbox(
     "Seleccionar tabla para visualizar",
-    options=["Estudiantes", "Eventos", "Profesores", "Asistencia Eventos", "Categoria Evento", "Participantes"],
+    options=list(TABLAS) + [VISTA_ANALITICA],
     index=0
 )
 
+# Exportaciones generadas bajo demanda (los bytes no se copian entre reruns)
+@st.cache_resource(max_entries=8, show_spinner="Generando exportación...")
+def exportar_tabla(titulo, version, clave_filtros, formato, _df):
+    trazas.fallo_cache()
+    return exportacion.exportar(_df, formato)
+
 # Función para mostrar tabla con filtros
-def mostrar_tabla(titulo, df, columnas_filtro):
+# Los índices de filtros, búsqueda y orden se construyen una vez por tabla y versión de los datos, compartidos
+# entre sesiones (utilidades.indices_eventos); el hilo de refresco los prepara antes de publicar cada versión.
+# La tabla es un fragmento: sus filtros y su búsqueda solo vuelven a ejecutar la tabla (no la carga de
+# los endpoints ni la barra lateral), y la paginación y la exportación son fragmentos anidados dentro
+@st.fragment
+def mostrar_tabla(titulo, tipo, df):
+    with trazas.fragmento("mostrar_tabla"):
+        _mostrar_tabla(titulo, tipo, df)
+
+def _mostrar_tabla(titulo, tipo, df):
     st.header(f"📋 {titulo}")
     
     if df.empty:
         st.warning(f"No hay datos de {titulo.lower()} disponibles o hubo un error al cargarlos.")
         return
     
-    # Filtros dinámicos
-    df_filtrado = df.copy()
+    # Filtros dinámicos: opciones y rangos salen del índice, sin recorrer la tabla
+    with trazas.tramo("construir_indices", cacheado=True, filas_entrada=len(df)):
+        indices = indices_eventos.indices(tipo, df)
+    version, indice = indices.version, indices.filtros
+    columnas_desplegables, columnas_busqueda = indices.columnas_filtro, indices.columnas_busqueda
+    # Búsqueda por nombre, apellido o correo: se responde desde el índice, sin listar todos los valores
+    consulta = ""
+    if columnas_busqueda:
+        consulta = st.text_input(
+            f"🔎 Buscar por {', '.join(columnas_busqueda)}",
+            key=f"buscar_{titulo}",
+            placeholder="Escribe el inicio o parte de un nombre, apellido o correo (sin importar tildes)",
+        )
     with st.expander("⚙️ Filtros Avanzados", expanded=False):
         # Aumentar el número de columnas para los filtros para evitar desbordamiento
         # y usar el mínimo entre el número de filtros y un número fijo (ej. 4)
-        cols = st.columns(min(len(columnas_filtro), 4))
+        cols = st.columns(min(len(columnas_desplegables), 4))
         filtros = {}
         
-        for i, col in enumerate(columnas_filtro):
+        for i, col in enumerate(columnas_desplegables):
             if col in df.columns:
                 with cols[i % len(cols)]: # Distribuye los filtros equitativamente
                     # Asegúrate de que cada selectbox/slider/date_input tenga una clave única
                     widget_key = f"{titulo}_{col}_{i}" 
                     
-                    if pd.api.types.is_object_dtype(df[col]): # Cadenas/categorías
-                        options = ['Todos'] + sorted(df[col].dropna().unique().tolist())
+                    if col in indice.categoricas: # Cadenas/categorías
+                        options = ['Todos'] + indice.opciones(col)
                         seleccion = st.selectbox(f"Filtrar por {col}", options, key=f"sb_{widget_key}")
                         if seleccion != 'Todos':
                             filtros[col] = seleccion
-                    elif pd.api.types.is_numeric_dtype(df[col]): # Números
-                        min_val = float(df[col].min())
-                        max_val = float(df[col].max())
-                        seleccion = st.slider(f"Rango de {col}", min_val, max_val, (min_val, max_val), key=f"sl_{widget_key}")
-                        filtros[col] = seleccion
-                    elif pd.api.types.is_datetime64_any_dtype(df[col]): # Fechas
-                        # Asegurarse de que la columna es de tipo datetime
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
-                        df_valid_dates = df.dropna(subset=[col])
-                        if not df_valid_dates.empty:
-                            min_date = df_valid_dates[col].min().date()
-                            max_date = df_valid_dates[col].max().date()
+                    elif col in indice.rangos and indice.extremos(col) is not None:
+                        minimo, maximo = indice.extremos(col)
+                        if indice.es_fecha(col): # Fechas
+                            min_date, max_date = minimo.date(), maximo.date()
                             date_range = st.date_input(f"Rango de fechas para {col}", 
                                                       value=(min_date, max_date), 
                                                       min_value=min_date, 
@@ -121,18 +134,35 @@ def mostrar_tabla(titulo, df, columnas_filtro):
                                                       key=f"dt_{widget_key}")
                             if len(date_range) == 2:
                                 filtros[col] = (pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]).replace(hour=23, minute=59, second=59))
+                        elif minimo < maximo: # Números (con un solo valor no hay rango que filtrar)
+                            seleccion = st.slider(f"Rango de {col}", minimo, maximo, (minimo, maximo), key=f"sl_{widget_key}")
+                            filtros[col] = seleccion
             else:
                 st.warning(f"La columna de filtro '{col}' no existe en la tabla '{titulo}'.")
     
-    # Aplicar filtros
-    for col, val in filtros.items():
-        if isinstance(val, tuple) and (pd.api.types.is_numeric_dtype(df_filtrado[col]) or pd.api.types.is_datetime64_any_dtype(df_filtrado[col])):
-            df_filtrado = df_filtrado[(df_filtrado[col] >= val[0]) & (df_filtrado[col] <= val[1])]
-        else:
-            df_filtrado = df_filtrado[df_filtrado[col] == val]
+    # Aplicar filtros (memorizado por estado de los filtros, sin copias completas)
+    with trazas.tramo("filtrar", filas_entrada=len(df), filtros=len(filtros)) as tramo:
+        df_filtrado = indice.filtrar(filtros)
+        tramo.filas_salida = len(df_filtrado)
+    
+    # Buscar dentro de las filas filtradas: se muestran las más relevantes
+    resultado_busqueda = None
+    if consulta:
+        with trazas.tramo("buscar", filas_entrada=len(df_filtrado)) as tramo:
+            resultado_busqueda = indices.busqueda.buscar(consulta, dentro=indice.filas(filtros))
+            if resultado_busqueda is not None:
+                df_filtrado = df.take(resultado_busqueda.filas)
+                tramo.filas_salida = len(df_filtrado)
+                tramo.extra["coincidencias"] = resultado_busqueda.total
+        if resultado_busqueda is None:
+            st.caption(f"Escribe al menos {busqueda.MIN_CARACTERES} letras para buscar.")
+        elif resultado_busqueda.total > len(resultado_busqueda.filas):
+            st.caption(
+                f"{resultado_busqueda.total} coincidencias: se muestran las {len(resultado_busqueda.filas)} más relevantes."
+            )
     
-    # Mostrar datos
-    st.dataframe(df_filtrado, height=500, use_container_width=True)
+    # Mostrar datos: solo la página visible viaja al navegador
+    tabla_paginada(df_filtrado, titulo, indice_orden=indices.orden, altura=500)
     
     # Estadísticas
     st.subheader("📊 Estadísticas")
@@ -153,65 +183,202 @@ def mostrar_tabla(titulo, df, columnas_filtro):
         else:
             st.metric("Fecha Más Reciente", "N/A (No hay columna de fecha)")
     
-    # Exportar
     if not df_filtrado.empty:
-        csv = df_filtrado.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            f"⬇️ Exportar {titulo} como CSV",
-            data=csv,
-            file_name=f"{titulo.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        clave_filtros = indice.clave(filtros)
+        if resultado_busqueda is not None:
+            clave_filtros += (("búsqueda", tuple(busqueda.terminos(consulta))),)
+        mostrar_exportacion(titulo, version, clave_filtros, df_filtrado)
     else:
         st.info("No hay datos filtrados para exportar.")
 
+# Exportar: el archivo solo se genera cuando se pide y queda en caché por
+# tabla, estado de los filtros y formato. Fragmento: lee las filas filtradas y su
+# clave, y elegir el formato o prepararla no vuelve a filtrar la tabla
+@st.fragment
+def mostrar_exportacion(titulo, version, clave_filtros, df_filtrado):
+    with trazas.fragmento("exportacion"):
+        col_formato, col_exportar = st.columns([1, 3])
+        with col_formato:
+            formato = st.selectbox("Formato", list(exportacion.FORMATOS), key=f"fmt_{titulo}", label_visibility="collapsed")
+        clave_exportacion = (titulo, version, clave_filtros, formato)
+        with col_exportar:
+            if st.session_state.get(f"export_{titulo}") != clave_exportacion:
+                # El botón solo se pulsa en reruns del propio fragmento
+                if st.button(f"📦 Preparar exportación de {titulo} ({formato})", key=f"prep_{titulo}"):
+                    st.session_state[f"export_{titulo}"] = clave_exportacion
+                    st.rerun(scope="fragment")
+            else:
+                extension, mime = exportacion.FORMATOS[formato]
+                with trazas.tramo("exportar", cacheado=True, filas_entrada=len(df_filtrado), formato=formato) as tramo:
+                    datos_exportacion = exportar_tabla(*clave_exportacion, df_filtrado)
+                    tramo.bytes = len(datos_exportacion)
+                st.download_button(
+                    f"⬇️ Exportar {titulo} como {formato}",
+                    data=datos_exportacion,
+                    file_name=f"{titulo.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                    mime=mime
+                )
 
-# Visualización según selección
-if tabla_seleccionada == "Estudiantes":
-    mostrar_tabla(
-        "Estudiantes",
-        estudiantes_df,
-        ["nombre", "apellido", "correo", "carrera", "semestre", "grado", "grupo", "fechaNacimiento"]
-    )
 
-elif tabla_seleccionada == "Eventos":
-    mostrar_tabla(
-        "Eventos",
-        eventos_df,
-        ["nombre_evento", "fecha_evento", "ubicacion", "id_categoria_evento", "cupo_maximo", "fecha_inicio", "fecha_fin" , "categoria_evento"]
-    )
+# Almacén relacional: se construye una vez por versión de los datos y se comparte
+def version_datos(datos):
+    return tuple((tipo, version_tabla(df)) for tipo, df in sorted(datos.items()))
 
-elif tabla_seleccionada == "Profesores":
-    mostrar_tabla(
-        "Profesores",
-        profesores_df,
-        ["nombre", "apellido", "email", "departamento", "especialidad"]
-    )
+@st.cache_resource(max_entries=1, show_spinner="Indexando tablas de eventos...")
+def construir_almacen(version, _datos):
+    trazas.fallo_cache()
+    return AlmacenEventos(_datos)
 
-elif tabla_seleccionada == "Asistencia Eventos":
-    mostrar_tabla(
-        "Asistencia a Eventos",
-        asistenciaeventos_df,
-        ["id_evento", "id_participante", "fecha_asistencia"]
-    )
+# Vista de analítica servida desde el almacén relacional
+def mostrar_analitica(almacen):
+    st.header(f"📈 {VISTA_ANALITICA}")
+    resumen_eventos = almacen.resumen_eventos
+    if resumen_eventos.empty:
+        st.warning("No hay datos de eventos disponibles para la analítica.")
+        return
 
-elif tabla_seleccionada == "Categoria Evento":
-    mostrar_tabla(
-        "Categoria de Evento",
-        categoriaevento_df, # <--- ¡CORREGIDO AQUI! La variable ahora es 'categoriaevento_df'
-        ["nombre_categoria", "descripcion"]
-    )
+    col1, col2, col3, col4 = st.columns(4)
+    inscritos = int(resumen_eventos["inscritos"].sum())
+    asistencias = int(resumen_eventos["asistencias"].sum())
+    with col1:
+        st.metric("Eventos", len(resumen_eventos))
+    with col2:
+        st.metric("Inscritos", inscritos)
+    with col3:
+        st.metric("Asistencias", asistencias)
+    with col4:
+        st.metric("Tasa de Asistencia", f"{asistencias / inscritos:.0%}" if inscritos else "N/A")
+
+    st.subheader("📊 Asistencia por Categoría")
+    resumen_categorias = almacen.resumen_categorias
+    if not resumen_categorias.empty:
+        etiqueta = "nombre_categoria" if "nombre_categoria" in resumen_categorias.columns else "id_categoria_evento"
+        st.bar_chart(resumen_categorias.set_index(etiqueta)[["inscritos", "asistencias"]])
+        st.dataframe(resumen_categorias, use_container_width=True)
+    else:
+        st.info("Los eventos no tienen categoría asociada.")
+
+    st.subheader("🗓️ Resumen por Evento")
+    st.dataframe(resumen_eventos, use_container_width=True)
+
+    mostrar_ausentes(almacen)
+
+# Fragmento: elegir otro evento solo vuelve a calcular esta lista
+@st.fragment
+def mostrar_ausentes(almacen):
+    with trazas.fragmento("ausentes"):
+        _mostrar_ausentes(almacen)
+
+def _mostrar_ausentes(almacen):
+    resumen_eventos = almacen.resumen_eventos
+    st.subheader("🚫 Inscritos que no Asistieron")
+    if "id_evento" in resumen_eventos.columns:
+        nombres = (
+            dict(zip(resumen_eventos["id_evento"], resumen_eventos["nombre_evento"]))
+            if "nombre_evento" in resumen_eventos.columns
+            else {}
+        )
+        evento = st.selectbox(
+            "Evento",
+            options=[None] + resumen_eventos["id_evento"].tolist(),
+            format_func=lambda id_evento: "Todos" if id_evento is None else f"{nombres.get(id_evento, id_evento)} (#{id_evento})",
+            key="analitica_evento",
+        )
+        ausentes = almacen.ausentes(evento)
+    else:
+        ausentes = almacen.ausentes()
+    st.metric("Inscritos sin asistencia", len(ausentes))
+    # Crece con los participantes: solo la página visible viaja al navegador
+    tabla_paginada(ausentes, "ausentes", altura=400)
 
-elif tabla_seleccionada == "Participantes":
-    mostrar_tabla(
-        "Participantes",
-        participantes_df,
-        ["id_evento", "id_estudiante", "rol", "fecha_registro"]
+
+# Cargar todos los datos en paralelo: la tabla seleccionada se muestra en cuanto
+# llega y el resto se sigue cargando detrás (quedan en caché para la siguiente selección)
+if tabla_seleccionada in TABLAS:
+    titulo, tipo_seleccionado, _ = TABLAS[tabla_seleccionada]
+else:
+    # La analítica necesita todas las tablas: ninguna tiene prioridad
+    titulo, tipo_seleccionado = VISTA_ANALITICA, None
+datos = {}
+fallidos = []
+ctx = get_script_run_ctx()
+estado_carga = st.sidebar.status("Cargando datos del evento...", expanded=False)
+
+def registrar_resultado(resultado):
+    if resultado.error is None:
+        datos[resultado.tipo] = resultado.df
+        origen = resultado.df.attrs.get("snapshot", {}).get("origen")
+        icono = {"no_modificado": "♻️", "incremental": "➕"}.get(origen, "✅")
+        memoria = resultado.df.attrs.get("memoria")
+        detalle_memoria = (
+            f", {esquemas.formatear_bytes(memoria['antes'])} → {esquemas.formatear_bytes(memoria['despues'])}"
+            if memoria else ""
+        )
+        estado_carga.write(f"{icono} {resultado.tipo} ({len(resultado.df)} filas, {resultado.segundos:.1f} s{detalle_memoria})")
+        return
+    fallidos.append(resultado.tipo)
+    df_respaldo = api_eventos.respaldo(resultado.tipo)
+    if df_respaldo is not None:
+        # La API no respondió: se sirve la última copia local buena
+        datos[resultado.tipo] = df_respaldo
+        estado_carga.write(f"💾 {resultado.tipo} (copia local de hace {snapshots.edad(df_respaldo)})")
+        if resultado.tipo == tipo_seleccionado:
+            st.warning(
+                f"La API no respondió al cargar {resultado.tipo} ({resultado.error}). "
+                f"Mostrando la copia local de hace {snapshots.edad(df_respaldo)}."
+            )
+        return
+    datos[resultado.tipo] = pd.DataFrame()
+    estado_carga.write(f"❌ {resultado.tipo} ({resultado.segundos:.1f} s)")
+    mostrar_error_carga(resultado.tipo, resultado.error)
+
+with st.spinner(f"Cargando {titulo.lower()}..."):
+    cargas = api_eventos.cargar_concurrente(
+        cargar_datos_medido,
+        API_ENDPOINTS,
+        prioridad=tipo_seleccionado,
+        inicializador=lambda: add_script_run_ctx(threading.current_thread(), ctx),
     )
+    for resultado in cargas:
+        registrar_resultado(resultado)
+        if resultado.tipo == tipo_seleccionado:
+            break
 
-# Actualización manual de datos
-if st.sidebar.button("🔄 Actualizar Todos los Datos"):
-    st.cache_data.clear()
+# Visualización según selección
+if tipo_seleccionado is not None:
+    mostrar_tabla(titulo, tipo_seleccionado, datos[tipo_seleccionado])
+
+# Terminar de cargar el resto de tablas
+for resultado in cargas:
+    registrar_resultado(resultado)
+
+if tipo_seleccionado is None:
+    with trazas.tramo("construir_almacen", cacheado=True, filas_entrada=sum(len(df) for df in datos.values())):
+        almacen = construir_almacen(version_datos(datos), datos)
+    with trazas.tramo("analitica"):
+        mostrar_analitica(almacen)
+estado_carga.update(
+    label="Datos cargados" if not fallidos else f"Datos cargados ({len(fallidos)} sin respuesta de la API)",
+    state="complete" if not fallidos else "error",
+)
+
+# Actualización manual: solo de la tabla que se está viendo (la analítica usa todas las de la API)
+tipos_vista = [tipo_seleccionado] if tipo_seleccionado is not None else list(API_ENDPOINTS)
+if st.sidebar.button(f"🔄 Actualizar {titulo}"):
+    with st.spinner(f"Actualizando {titulo.lower()}..."):
+        errores = refresco.refrescar(*tipos_vista)
+    if errores:
+        st.session_state["errores_refresco"] = {tipo: str(error) for tipo, error in errores.items()}
     st.rerun()
+for tipo, error in st.session_state.pop("errores_refresco", {}).items():
+    st.sidebar.error(f"No se pudo actualizar {tipo}: {error}")
+
+estados = [refresco.estado(tipo) for tipo in tipos_vista]
+edades = [estado["edad"] for estado in estados if estado["edad"] is not None]
+if edades:
+    st.sidebar.markdown(f"Última actualización: hace {snapshots.formatear_segundos(max(edades))}")
+proximos = [estado["proximo"] for estado in estados if estado["proximo"] is not None]
+if proximos:
+    st.sidebar.caption(f"Próximo refresco automático en {snapshots.formatear_segundos(min(proximos))}")
 
-st.sidebar.markdown(f"Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
\ No newline at end of file
+trazas.cerrar()
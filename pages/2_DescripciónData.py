@@ -1,6 +1,11 @@
 import streamlit as st
 
+from utilidades import arranque, trazas
+
+trazas.iniciar("descripcion")
+
 st.title("Guía del Dashboard de Autos Eléctricos 🚗⚡")
+trazas.primer_pintado()
 st.markdown("""
 <style>
 .big-font {font-size: 1.4em;}
@@ -28,16 +33,19 @@ st.markdown("""
 """)
 
 st.subheader("Columnas de la base de datos")
-st.table([
-    ["fecha_registro", "Fecha de registro del auto (datetime)"],
-    ["lugar_registro", "Ciudad/región del registro (texto)"],
-    ["marca_auto", "Marca del auto eléctrico (texto)"],
-    ["año_modelo", "Año del modelo (entero)"],
-    ["edad", "Edad del propietario (entero)"],
-    ["autonomia_km", "Autonomía máxima (km) (número)"],
-    ["tipo_carga", "Tipo de carga compatible (texto)"],
-    ["baterias_recicladas", "¿Usa baterías recicladas? (Sí/No)"]
-])
+# Tabla en Markdown: st.table necesitaría importar pandas y pyarrow solo para estas ocho filas
+st.markdown("""
+| Columna | Descripción |
+|---|---|
+| fecha_registro | Fecha de registro del auto (datetime) |
+| lugar_registro | Ciudad/región del registro (texto) |
+| marca_auto | Marca del auto eléctrico (texto) |
+| año_modelo | Año del modelo (entero) |
+| edad | Edad del propietario (entero) |
+| autonomia_km | Autonomía máxima (km) (número) |
+| tipo_carga | Tipo de carga compatible (texto) |
+| baterias_recicladas | ¿Usa baterías recicladas? (Sí/No) |
+""")
 
 st.subheader("¿Qué puedes visualizar?")
 st.markdown("""
@@ -49,4 +57,8 @@ st.markdown("""
 - **Tabla:** Datos filtrados en detalle.
 """)
 
-st.info("¡Explora los filtros y descubre tendencias interesantes del mercado de autos eléctricos!")
\ No newline at end of file
+st.info("¡Explora los filtros y descubre tendencias interesantes del mercado de autos eléctricos!")
+
+arranque.precargar()
+
+trazas.cerrar()
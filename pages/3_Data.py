@@ -1,12 +1,10 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import uuid
+
+from utilidades import trazas
 
 # Configuración de la página
 st.set_page_config(page_title="Tablero de Registro de Carros Eléctricos", layout="wide")
+trazas.iniciar("datos")
 
 # CSS personalizado para estilos
 st.markdown("""
@@ -20,109 +18,293 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Cargar el dataset
-@st.cache_data
-def load_data():
-    df = pd.read_csv("static/datasets/registros_carros_electricos.csv")
-    df["fecha_registro"] = pd.to_datetime(df["fecha_registro"])
-    return df
+# Contenido principal: se pinta antes de importar pandas, plotly y los datos
+st.title("Tablero de Registro de Carros Eléctricos")
+st.markdown("Explora y analiza los registros de carros eléctricos con filtros y visualizaciones interactivas.")
+trazas.primer_pintado()
+
+with trazas.importaciones():
+    from utilidades import aproximado_ev, busqueda, dependencias, derivados_ev, graficos_ev, particiones_ev, refresco
+    from utilidades.paginacion import tabla_paginada
 
-df = load_data()
+# DataFrame, cubo, índices, dataset particionado y estimador: uno por versión del CSV, compartidos por
+# el proceso (utilidades.derivados_ev); el hilo de refresco los prepara antes de publicar cada versión
+
+# Modo particionado: el registro se consulta en disco por particiones, sin cargarlo entero
+# (las consultas las memoriza el grafo de dependencias; aquí solo las primeras filas para la tabla)
+@st.cache_data(max_entries=16, show_spinner=False)
+def muestra_particiones(version, *filtros):
+    trazas.fallo_cache()
+    return derivados_ev.particiones(version).muestra(*filtros)
+
+
+# Mientras se calcula el resultado exacto se comprueba cada segundo si ya está, y entonces se repinta la página
+@st.fragment(run_every=1.0)
+def esperar_exacto(clave):
+    if aproximado_ev.terminado(clave):
+        st.rerun()
+    st.caption("⏳ Calculando el resultado exacto...")
 
 # Barra lateral para filtros
 st.sidebar.header("Opciones de Filtro")
 
+modo_particionado = st.sidebar.toggle(
+    "Modo particionado (fuera de memoria)",
+    value=particiones_ev.recomendado(),
+    help="Consulta el registro en disco por lugar de registro, sin cargarlo en memoria. "
+    "Viene activado por defecto cuando el CSV es muy grande.",
+)
+modo_aproximado = st.sidebar.toggle(
+    "Modo aproximado (muestra estratificada)",
+    value=False,
+    disabled=not modo_particionado,
+    help="Mientras mueves los filtros, métricas y gráficas se estiman con una muestra del registro, con su "
+    "margen de error, y el resultado exacto se calcula en cuanto dejas de moverlos. Solo en el modo "
+    "particionado: en memoria el cubo ya responde al instante con el resultado exacto.",
+) and modo_particionado
+# Versión del CSV ya preparada por el hilo de refresco: si el CSV cambia, la nueva (caché en disco,
+# cubo e índices incluidos) se prepara en segundo plano y mientras tanto se sigue sirviendo esta
+with trazas.tramo("refresco", cacheado=True):
+    version = refresco.obtener("carros").version
+if modo_particionado:
+    with trazas.tramo("abrir_particiones", cacheado=True), st.spinner("Preparando dataset particionado..."):
+        fuente = derivados_ev.particiones(version)
+    if modo_aproximado:
+        with trazas.tramo("abrir_estimador", cacheado=True), st.spinner("Preparando muestra estratificada..."):
+            estimador = derivados_ev.estimador(version)
+else:
+    with trazas.tramo("load_data", cacheado=True) as tramo:
+        df = derivados_ev.datos(version)
+        tramo.filas_salida = len(df)
+        tramo.bytes = trazas.bytes_de(df)
+    with trazas.tramo("construir_cubo", cacheado=True, filas_entrada=len(df)) as tramo, st.spinner("Preparando agregados..."):
+        fuente = derivados_ev.cubo(version)
+        tramo.extra["celdas"] = len(fuente)
+    with trazas.tramo("construir_indice_busqueda", cacheado=True, filas_entrada=len(df)), st.spinner("Indexando nombres..."):
+        indice_busqueda = derivados_ev.indice_busqueda(version)
+
 # Filtro por lugar
-lugares = sorted(df["lugar_registro"].unique())
+lugares = fuente.valores["lugar_registro"]
 selected_lugares = st.sidebar.multiselect("Selecciona Lugar(es)", lugares, default=lugares[:3])
 
 # Filtro por marca de auto
-marcas = sorted(df["marca_auto"].unique())
+marcas = fuente.valores["marca_auto"]
 selected_marcas = st.sidebar.multiselect("Selecciona Marca(s) de Auto", marcas, default=marcas[:3])
 
 # Filtro por año de modelo
-min_year, max_year = int(df["año_modelo"].min()), int(df["año_modelo"].max())
+min_year, max_year = (int(valor) for valor in fuente.extremos["año_modelo"])
 selected_years = st.sidebar.slider("Selecciona Rango de Año de Modelo", min_year, max_year, (min_year, max_year))
 
 # Filtro por edad
-min_age, max_age = int(df["edad"].min()), int(df["edad"].max())
+min_age, max_age = (int(valor) for valor in fuente.extremos["edad"])
 selected_age = st.sidebar.slider("Selecciona Rango de Edad", min_age, max_age, (min_age, max_age))
 
 # Filtro por autonomía
-min_autonomy, max_autonomy = int(df["autonomia_km"].min()), int(df["autonomia_km"].max())
+min_autonomy, max_autonomy = (int(valor) for valor in fuente.extremos["autonomia_km"])
 selected_autonomy = st.sidebar.slider("Selecciona Rango de Autonomía (km)", min_autonomy, max_autonomy, (min_autonomy, max_autonomy))
 
 # Filtro por tipo de carga
-tipos_carga = sorted(df["tipo_carga"].unique())
+tipos_carga = fuente.valores["tipo_carga"]
 selected_tipos_carga = st.sidebar.multiselect("Selecciona Tipo(s) de Carga", tipos_carga, default=tipos_carga)
 
 # Filtro por baterías recicladas
-baterias = df["baterias_recicladas"].unique()
+baterias = fuente.valores["baterias_recicladas"]
 selected_baterias = st.sidebar.multiselect("Baterías Recicladas", baterias, default=baterias)
 
-# Aplicar filtros
-filtered_df = df[
-    (df["lugar_registro"].isin(selected_lugares)) &
-    (df["marca_auto"].isin(selected_marcas)) &
-    (df["año_modelo"].between(selected_years[0], selected_years[1])) &
-    (df["edad"].between(selected_age[0], selected_age[1])) &
-    (df["autonomia_km"].between(selected_autonomy[0], selected_autonomy[1])) &
-    (df["tipo_carga"].isin(selected_tipos_carga)) &
-    (df["baterias_recicladas"].isin(selected_baterias))
-]
-
-# Contenido principal
-st.title("Tablero de Registro de Carros Eléctricos")
-st.markdown("Explora y analiza los registros de carros eléctricos con filtros y visualizaciones interactivas.")
+# Aplicar filtros sobre el cubo o sobre las particiones
+filtros = tuple(
+    tuple(seleccion)
+    for seleccion in (
+        selected_lugares,
+        selected_marcas,
+        selected_years,
+        selected_age,
+        selected_autonomy,
+        selected_tipos_carga,
+        selected_baterias,
+    )
+)
+clave_filtros = (version,) + filtros
+error_exacto = None
+if modo_aproximado:
+    # El exacto se lanza en segundo plano cuando los filtros dejan de cambiar; hasta entonces, la estimación
+    canal = st.session_state.setdefault("canal_exacto", aproximado_ev.Canal())
+    futuro = aproximado_ev.exacto(canal, clave_filtros, lambda: fuente.consultar(*filtros))
+    # Un exacto cancelado (lo descartó la sesión que lo lanzó) cuenta como no lanzado
+    acabado = futuro is not None and futuro.done() and not futuro.cancelled()
+    if acabado and futuro.exception() is None:
+        origen = "exacto"
+    else:
+        error_exacto = futuro.exception() if acabado else None
+        origen = "aproximado"
+else:
+    origen = "particiones" if modo_particionado else "cubo"
+
+# Grafo de dependencias: cada componente declara lo que lee y solo se recalcula cuando cambia;
+# si un rerun no toca los filtros (p. ej. el panel de tiempos), consulta y figuras salen memorizadas
+grafo = dependencias.grafo("datos")
+estado = {"version": version, "origen": origen, "filtros": filtros}
+
+
+# El grafo es del proceso: los nodos solo usan lo que leen (la fuente y el estimador salen de la versión),
+# nunca variables de la sesión que los registró
+@grafo.nodo("consultar", lee=("version", "origen", "filtros"), maximo=64)
+def consultar_filtros(version, origen, filtros):
+    # (resultado, estimación o None); el resultado tiene la misma forma en los cuatro orígenes
+    if origen == "aproximado":
+        estimacion = derivados_ev.estimador(version).consultar(*filtros)
+        return estimacion.resultado, estimacion
+    if origen == "exacto":
+        exacto = aproximado_ev.resultado((version,) + filtros)
+        if exacto is not None:
+            return exacto, None
+        # Descartado de la caché de exactos entre la comprobación y este cálculo: se consulta otra vez
+    if origen in ("exacto", "particiones"):
+        with st.spinner("Consultando particiones..."):
+            return derivados_ev.particiones(version).consultar(*filtros), None
+    return derivados_ev.cubo(version).consultar(*filtros), None
+
+
+# Las figuras se construyen con datos agregados (las estimadas aparte de las exactas, por el origen)
+@grafo.nodo("figura:pastel", lee=("consultar",))
+def figura_pastel(consultar):
+    return graficos_ev.pastel_marcas(consultar[0].por_marca)
+
+
+@grafo.nodo("figura:histograma", lee=("consultar",))
+def figura_histograma(consultar):
+    return graficos_ev.histograma_edad(consultar[0].por_edad)
+
+
+@grafo.nodo("figura:barras", lee=("consultar",))
+def figura_barras(consultar):
+    return graficos_ev.barras_autonomia(consultar[0].por_marca)
+
+
+@grafo.nodo("figura:linea", lee=("consultar",))
+def figura_linea(consultar):
+    return graficos_ev.linea_registros(consultar[0].por_mes)
+
+
+resultado, estimacion = grafo.valor("consultar", estado)
 
 # Métricas clave
 col1, col2, col3 = st.columns(3)
-col1.metric("Total de Registros", len(filtered_df))
-col2.metric("Autonomía Promedio (km)", round(filtered_df["autonomia_km"].mean(), 1))
-col3.metric("Edad Promedio", round(filtered_df["edad"].mean(), 1))
+if estimacion is None:
+    col1.metric("Total de Registros", resultado.registros)
+    col2.metric("Autonomía Promedio (km)", round(resultado.autonomia_promedio, 1))
+    col3.metric("Edad Promedio", round(resultado.edad_promedio, 1))
+else:
+    col1.metric("Total de Registros (≈)", f"{resultado.registros:,} ± {estimacion.error_registros:,.0f}")
+    col2.metric("Autonomía Promedio (km) (≈)", f"{resultado.autonomia_promedio:.1f} ± {estimacion.error_autonomia:.1f}")
+    col3.metric("Edad Promedio (≈)", f"{resultado.edad_promedio:.1f} ± {estimacion.error_edad:.1f}")
+    distintos = estimador.distintos(selected_lugares)
+    col4, col5 = st.columns(2)
+    for columna, (nombre, etiqueta) in zip((col4, col5), (("modelo_auto", "Modelos Distintos"), ("version_software", "Versiones de Software Distintas"))):
+        valor, error = distintos[nombre]
+        columna.metric(f"{etiqueta} (≈)", f"{valor:,.0f} ± {error:,.0f}")
+    st.caption(
+        f"≈ Estimado con las {estimacion.filas_muestra:,} filas de la muestra estratificada "
+        f"({len(estimador):,} en total) que cumplen los filtros; ± es el margen al 95 %. "
+        "Los distintos se cuentan en todos los registros de los lugares seleccionados."
+    )
+    if not estimacion.fiable:
+        st.warning("Pocas filas de la muestra cumplen los filtros: la estimación es poco fiable.")
+    if error_exacto is not None:
+        st.warning(f"No se pudo calcular el resultado exacto: {error_exacto}")
+    else:
+        esperar_exacto(clave_filtros)
 
 # Visualizaciones
 st.subheader("Visualizaciones de Datos")
 
 # Gráfico de pastel: Distribución de marcas de autos
-fig_pie = px.pie(filtered_df, names="marca_auto", title="Distribución de marcas de autos eléctricos",
-                 color_discrete_sequence=px.colors.qualitative.Bold)
-fig_pie.update_layout(font_size=12)
-st.plotly_chart(fig_pie, use_container_width=True)
+fig_pie = grafo.valor("figura:pastel", estado)
+with trazas.tramo("plotly_chart:pastel"):
+    st.plotly_chart(fig_pie, use_container_width=True)
 
-# Histograma: Distribución de edades
-fig_hist = px.histogram(filtered_df, x="edad", nbins=20, title="Distribución de edades de los propietarios",
-                        color_discrete_sequence=["#ff7f0e"])
-fig_hist.update_layout(font_size=12, xaxis_title="Edad", yaxis_title="Cantidad")
-st.plotly_chart(fig_hist, use_container_width=True)
+# Histograma: Distribución de edades (tramos calculados en el servidor)
+fig_hist = grafo.valor("figura:histograma", estado)
+with trazas.tramo("plotly_chart:histograma"):
+    st.plotly_chart(fig_hist, use_container_width=True)
 
 # Gráfico de barras: Autonomía promedio por marca
-avg_autonomy = filtered_df.groupby("marca_auto")["autonomia_km"].mean().reset_index()
-fig_bar = px.bar(
-    avg_autonomy,
-    x="marca_auto",
-    y="autonomia_km",
-    title="Autonomía promedio por marca",
-    color="marca_auto",
-    color_discrete_sequence=px.colors.qualitative.Set2,
-    labels={"marca_auto": "Marca", "autonomia_km": "Autonomía promedio (km)"}
-)
-fig_bar.update_layout(font_size=12, xaxis_title="Marca", yaxis_title="Autonomía promedio (km)")
-st.plotly_chart(fig_bar, use_container_width=True)
+fig_bar = grafo.valor("figura:barras", estado)
+with trazas.tramo("plotly_chart:barras"):
+    st.plotly_chart(fig_bar, use_container_width=True)
 
 # Gráfico de líneas: Registros a lo largo del tiempo
-filtered_df["year_month"] = filtered_df["fecha_registro"].dt.to_period("M").astype(str)
-registrations_over_time = filtered_df.groupby("year_month").size().reset_index(name="count")
-fig_line = px.line(registrations_over_time, x="year_month", y="count", title="Registros a lo largo del tiempo",
-                   markers=True, color_discrete_sequence=["#2ca02c"])
-fig_line.update_layout(font_size=12, xaxis_title="Año-Mes", yaxis_title="Número de registros")
-st.plotly_chart(fig_line, use_container_width=True)
-
-# Tabla de datos
+fig_line = grafo.valor("figura:linea", estado)
+with trazas.tramo("plotly_chart:linea"):
+    st.plotly_chart(fig_line, use_container_width=True)
+
+
+# Tabla de datos: fragmento que lee el resultado de la consulta y sus propios widgets (búsqueda, y orden
+# y página en tabla_paginada), así que escribir en la búsqueda no vuelve a ejecutar consulta ni gráficas
+@st.fragment
+def tabla_carros(resultado, filtros):
+    with trazas.fragmento("tabla_carros"):
+        consulta = st.text_input(
+            "🔎 Buscar propietario por nombre",
+            key="buscar_carros",
+            placeholder="Escribe el inicio o parte de un nombre o apellido (sin importar tildes)",
+            disabled=modo_particionado,
+            help="La búsqueda por nombre no está disponible en el modo particionado." if modo_particionado else None,
+        )
+        if modo_particionado:
+            # Solo se traen las primeras filas que cumplen los filtros
+            with trazas.tramo("muestra_particiones", cacheado=True) as tramo:
+                filtered_df = muestra_particiones(version, *filtros)
+                tramo.filas_salida = len(filtered_df)
+            if len(filtered_df) < resultado.registros:
+                st.caption(f"Se muestran los primeros {len(filtered_df):,} de {resultado.registros:,} registros.")
+            tabla_paginada(filtered_df, "carros", altura=400)
+            return
+        # Las filas se localizan a partir de las celdas seleccionadas
+        with trazas.tramo("filas_filtradas", filas_entrada=len(df)) as tramo:
+            filas = fuente.filas(resultado)
+            tramo.filas_salida = len(filas)
+        # La búsqueda se hace dentro de las filas filtradas y devuelve las más relevantes
+        if consulta:
+            with trazas.tramo("buscar", filas_entrada=len(filas)) as tramo:
+                encontrados = indice_busqueda.buscar(consulta, dentro=filas)
+                if encontrados is not None:
+                    filas = encontrados.filas
+                    tramo.filas_salida = len(filas)
+                    tramo.extra["coincidencias"] = encontrados.total
+            if encontrados is None:
+                st.caption(f"Escribe al menos {busqueda.MIN_CARACTERES} letras para buscar.")
+            elif encontrados.total > len(filas):
+                st.caption(f"{encontrados.total:,} coincidencias: se muestran las {len(filas)} más relevantes.")
+        filtered_df = df.take(filas)
+        with trazas.tramo("construir_indice_orden", cacheado=True):
+            indice_orden = derivados_ev.indice_orden(version)
+        tabla_paginada(filtered_df, "carros", indice_orden=indice_orden, altura=400)
+
+
 st.subheader("Tabla de Datos Filtrados")
-st.dataframe(filtered_df.drop(columns=["year_month"] if "year_month" in filtered_df.columns else []), height=400)
+tabla_carros(resultado, filtros)
+
+# Recarga manual solo de este dataset: las tablas de la API y sus cachés no se tocan
+if st.sidebar.button("🔄 Recargar registro de carros"):
+    derivados_ev.olvidar()
+    muestra_particiones.clear()
+    grafo.limpiar()
+    with st.spinner("Recargando registro de carros..."):
+        errores = refresco.refrescar("carros")
+    if errores:
+        st.sidebar.error(f"No se pudo recargar el registro: {errores['carros']}")
+    else:
+        st.rerun()
 
 # Dato interesante
 st.subheader("Dato Interesante")
-most_common_brand = filtered_df["marca_auto"].mode()[0]
-st.markdown(f"La marca de auto más popular en el conjunto de datos filtrado es **{most_common_brand}**, ¡lo que refleja su fuerte presencia en el mercado de vehículos eléctricos en las regiones seleccionadas!")
\ No newline at end of file
+most_common_brand = resultado.marca_mas_comun
+if most_common_brand is not None:
+    st.markdown(f"La marca de auto más popular en el conjunto de datos filtrado es **{most_common_brand}**, ¡lo que refleja su fuerte presencia en el mercado de vehículos eléctricos en las regiones seleccionadas!")
+    if estimacion is not None and estimacion.empatadas:
+        st.caption(f"≈ Con la muestra no se distingue de {', '.join(estimacion.empatadas)}: se confirmará con el resultado exacto.")
+else:
+    st.info("No hay registros con los filtros seleccionados.")
+
+trazas.cerrar()
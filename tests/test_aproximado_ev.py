@@ -0,0 +1,55 @@
+"""Lanzamiento y descarte de los resultados exactos del modo aproximado entre sesiones."""
+import threading
+import time
+
+from utilidades import aproximado_ev
+from utilidades.aproximado_ev import Canal
+
+
+def pedir(canal, clave, calcular):
+    """Pide el exacto de `clave` hasta que queda lanzado (sin la demora de la página)."""
+    while (futuro := aproximado_ev.exacto(canal, clave, calcular, demora=0)) is None:
+        time.sleep(0.01)
+    return futuro
+
+
+def ocupar_ejecutor(clave):
+    """Lanza un exacto que no acaba hasta soltarlo, para que los siguientes esperen en cola."""
+    soltar = threading.Event()
+    pedir(Canal(), clave, lambda: soltar.wait(5))
+    return soltar
+
+
+def test_no_cancela_un_exacto_que_espera_otra_sesion():
+    soltar = ocupar_ejecutor("ocupado-1")
+    sesion_a, sesion_b = Canal(), Canal()
+    futuro = pedir(sesion_a, "compartido", lambda: "exacto")
+    assert pedir(sesion_b, "compartido", lambda: "otro") is futuro
+
+    # La sesión A cambia de filtros: B sigue esperando el mismo exacto
+    pedir(sesion_a, "otra-a", lambda: "otro")
+    soltar.set()
+    assert futuro.result(timeout=5) == "exacto"
+    assert aproximado_ev.terminado("compartido")
+    assert aproximado_ev.resultado("compartido") == "exacto"
+
+
+def test_cancela_el_exacto_en_cola_que_nadie_mas_espera():
+    soltar = ocupar_ejecutor("ocupado-2")
+    sesion = Canal()
+    futuro = pedir(sesion, "solo-a", lambda: "exacto")
+    pedir(sesion, "otra-b", lambda: "otro")
+    soltar.set()
+    assert futuro.cancelled()
+    assert aproximado_ev.resultado("solo-a") is None
+    # Descartado y sin relanzar: quien aún lo muestre repinta y lo vuelve a pedir
+    assert aproximado_ev.terminado("solo-a")
+    assert pedir(sesion, "solo-a", lambda: "de nuevo").result(timeout=5) == "de nuevo"
+
+
+def test_no_repinta_mientras_esta_programado():
+    sesion = Canal()
+    assert aproximado_ev.exacto(sesion, "programado", lambda: "exacto", demora=0.3) is None
+    assert not aproximado_ev.terminado("programado")
+    time.sleep(0.5)
+    assert pedir(sesion, "programado", lambda: "otro").result(timeout=5) == "exacto"
@@ -0,0 +1,128 @@
+"""`IndiceBusqueda` frente a la misma búsqueda hecha palabra a palabra en Python."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utilidades import busqueda, compartido
+from utilidades.busqueda import IndiceBusqueda
+
+NOMBRES = ["José", "Jose", "María", "Ángela", "Osvaldo", "Baldomero", "Peña", "Ana", "Anabel", "Iñaki", "Zoë"]
+APELLIDOS = ["Muñoz", "Pena", "García-López", "Álvarez", "Aldana", "de la Fuente", "Núñez", "Calderón"]
+COLUMNAS = ["nombre", "apellido", "correo"]
+
+
+def tabla(rng, filas=600):
+    nombre = rng.choice(NOMBRES, filas) + np.where(rng.random(filas) < 0.3, " " + rng.choice(NOMBRES, filas), "")
+    apellido = pd.Series(rng.choice(APELLIDOS, filas), dtype=object)
+    apellido[rng.random(filas) < 0.05] = None
+    correo = [f"{n.split()[0].lower()}.{i}@universidad.edu.co" for i, n in enumerate(nombre)]
+    return pd.DataFrame({"nombre": nombre, "apellido": apellido, "correo": correo, "semestre": rng.integers(1, 11, filas)})
+
+
+def palabras_por_fila(df):
+    return [
+        [palabra for col in COLUMNAS if isinstance(df[col].iloc[i], str) for palabra in busqueda.terminos(df[col].iloc[i])]
+        for i in range(len(df))
+    ]
+
+
+def a_mano(palabras_fila, consulta, limite=busqueda.LIMITE, dentro=None):
+    """(filas, puntuaciones, total) puntuando cada fila con las palabras de sus celdas."""
+    encontradas = []
+    for fila, palabras in enumerate(palabras_fila):
+        if dentro is not None and fila not in dentro:
+            continue
+        puntuacion = 0
+        for termino in dict.fromkeys(busqueda.terminos(consulta)):
+            peso = max(
+                (
+                    busqueda.PESO_EXACTO if palabra == termino
+                    else busqueda.PESO_PREFIJO if palabra.startswith(termino)
+                    else busqueda.PESO_INFIJO if len(termino) >= busqueda.N_GRAMA and termino in palabra
+                    else 0
+                    for palabra in palabras
+                ),
+                default=0,
+            )
+            if not peso:
+                break
+            puntuacion += peso
+        else:
+            encontradas.append((-puntuacion, fila))
+    encontradas.sort()
+    return [fila for _, fila in encontradas[:limite]], [-p for p, _ in encontradas[:limite]], len(encontradas)
+
+
+def consultas(rng, df, n=60):
+    """Palabras enteras, prefijos e infijos de celdas al azar, con tildes y mayúsculas cambiadas."""
+    for _ in range(n):
+        texto = df[COLUMNAS[rng.integers(len(COLUMNAS))]].iloc[rng.integers(len(df))]
+        if not isinstance(texto, str):
+            continue
+        palabra = busqueda.terminos(texto)[0]
+        desde = int(rng.integers(0, max(1, len(palabra) - 2)))
+        hasta = int(rng.integers(desde + 2, len(palabra) + 1)) if len(palabra) > desde + 2 else len(palabra)
+        yield palabra[desde:hasta].upper() if rng.random() < 0.5 else palabra[desde:hasta]
+    yield "peña"
+    yield "PENA munoz"
+    yield "ald"
+    yield "universidad"
+    yield "xyz"
+    yield "a"
+
+
+def comprobar(indice, palabras_fila, consulta, **opciones):
+    resultado = indice.buscar(consulta, **opciones)
+    if sum(len(termino) for termino in busqueda.terminos(consulta)) < busqueda.MIN_CARACTERES:
+        assert resultado is None
+        return
+    filas, puntuaciones, total = a_mano(palabras_fila, consulta, **opciones)
+    assert resultado.total == total, consulta
+    assert resultado.filas.tolist() == filas, consulta
+    assert resultado.puntuaciones.tolist() == puntuaciones, consulta
+
+
+@pytest.mark.parametrize("semilla", range(3))
+def test_buscar_equivale_a_recorrer_las_palabras(semilla):
+    rng = np.random.default_rng(semilla)
+    df = tabla(rng)
+    indice, palabras = IndiceBusqueda(df, COLUMNAS), palabras_por_fila(df)
+    for consulta in consultas(rng, df):
+        comprobar(indice, palabras, consulta)
+        comprobar(indice, palabras, consulta, limite=5)
+
+
+def test_buscar_dentro_de_las_filas_filtradas():
+    rng = np.random.default_rng(0)
+    df = tabla(rng)
+    indice, palabras = IndiceBusqueda(df, COLUMNAS), palabras_por_fila(df)
+    dentro = np.flatnonzero(df["semestre"].to_numpy() <= 3)
+    for consulta in consultas(rng, df, 20):
+        comprobar(indice, palabras, consulta, dentro=dentro)
+
+
+def test_actualizar_equivale_a_reconstruir():
+    rng = np.random.default_rng(1)
+    df = tabla(rng)
+    indice = IndiceBusqueda(df, COLUMNAS)
+    nuevo = pd.concat([df, tabla(rng, 20)], ignore_index=True)
+    nuevo.loc[[3, 40, 41], "apellido"] = ["Zubizarreta", None, "Peñalosa"]
+    actualizado, palabras = indice.actualizar(nuevo), palabras_por_fila(nuevo)
+    assert actualizado.segmentos == 2
+    for consulta in list(consultas(rng, nuevo)) + ["zubi", "penalosa"]:
+        comprobar(actualizado, palabras, consulta)
+    # El índice anterior sigue respondiendo sobre su versión
+    comprobar(indice, palabras_por_fila(df), "pena")
+
+
+def test_vistas_compartidas_con_varios_lotes():
+    import pyarrow as pa
+
+    df = tabla(np.random.default_rng(2))
+    mitad = len(df) // 2
+    tabla_arrow = pa.concat_tables([pa.Table.from_pandas(parte, preserve_index=False) for parte in (df[:mitad], df[mitad:])])
+    troceado = compartido.vista(tabla_arrow)
+    assert tabla_arrow.column("nombre").num_chunks == 2
+    indice, palabras = IndiceBusqueda(troceado, COLUMNAS), palabras_por_fila(df)
+    for consulta in ("peña", "osv", "ana garcia"):
+        comprobar(indice, palabras, consulta)
@@ -0,0 +1,135 @@
+"""Consultas del tablero de carros eléctricos frente al mismo cálculo hecho con pandas."""
+import numpy as np
+import pytest
+
+from benchmarks import datos_ev
+from utilidades import dataset_ev, particiones_ev
+from utilidades.cubo_ev import CuboRegistros
+
+
+@pytest.fixture(scope="module", params=["real", "sintetico"])
+def registro(request, tmp_path_factory):
+    """(ruta del CSV, directorio de cachés, DataFrame) del registro real y de uno sintético más grande."""
+    directorio = tmp_path_factory.mktemp(request.param)
+    if request.param == "real":
+        ruta = datos_ev.RUTA_REAL
+    else:
+        ruta = datos_ev.generar(20_000, directorio / "registros_ev_20000.csv")
+    return ruta, directorio, dataset_ev.cargar(ruta, directorio)
+
+
+def filtros_al_azar(rng, df):
+    def algunos(col):
+        valores = sorted(df[col].dropna().unique())
+        return list(rng.choice(valores, rng.integers(1, len(valores) + 1), replace=False))
+
+    def rango(col):
+        minimo, maximo = int(df[col].min()), int(df[col].max())
+        return tuple(sorted(int(valor) for valor in rng.integers(minimo, maximo + 1, 2)))
+
+    return (
+        algunos("lugar_registro"),
+        algunos("marca_auto"),
+        rango("año_modelo"),
+        rango("edad"),
+        rango("autonomia_km"),
+        algunos("tipo_carga"),
+        algunos("baterias_recicladas"),
+    )
+
+
+def a_mano(df, lugares, marcas, años, edades, autonomias, tipos_carga, baterias):
+    """Máscara de las filas que cumplen los filtros, como la aplicaba la página fila a fila."""
+    return (
+        df["lugar_registro"].isin(lugares)
+        & df["marca_auto"].isin(marcas)
+        & df["año_modelo"].between(*años)
+        & df["edad"].between(*edades)
+        & df["autonomia_km"].between(*autonomias)
+        & df["tipo_carga"].isin(tipos_carga)
+        & df["baterias_recicladas"].isin(baterias)
+    ).to_numpy()
+
+
+def comprobar(resultado, filtrado):
+    assert resultado.registros == len(filtrado)
+    assert resultado.suma_edad == pytest.approx(filtrado["edad"].sum())
+    assert resultado.suma_autonomia == pytest.approx(filtrado["autonomia_km"].sum())
+    assert resultado.suma_cuadrados_autonomia == pytest.approx((filtrado["autonomia_km"].astype(float) ** 2).sum())
+
+    por_marca = filtrado.groupby("marca_auto", observed=True)["autonomia_km"].agg(["size", "mean"])
+    obtenido = resultado.por_marca.set_index("marca_auto").sort_index()
+    assert list(obtenido.index) == sorted(por_marca.index)
+    assert obtenido["registros"].tolist() == por_marca.sort_index()["size"].tolist()
+    assert obtenido["autonomia_promedio"].to_numpy() == pytest.approx(por_marca.sort_index()["mean"].to_numpy())
+
+    por_edad = filtrado["edad"].value_counts().sort_index()
+    assert resultado.por_edad["edad"].tolist() == [float(edad) for edad in por_edad.index]
+    assert resultado.por_edad["registros"].tolist() == por_edad.tolist()
+
+    por_mes = filtrado["fecha_registro"].dropna().dt.strftime("%Y-%m").value_counts().sort_index()
+    assert resultado.por_mes["year_month"].tolist() == por_mes.index.tolist()
+    assert resultado.por_mes["count"].tolist() == por_mes.tolist()
+    if len(filtrado):
+        assert resultado.marca_mas_comun == filtrado["marca_auto"].astype(object).mode()[0]
+
+
+def test_cubo_equivale_a_pandas(registro):
+    _, _, df = registro
+    cubo = CuboRegistros(df)
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        filtros = filtros_al_azar(rng, df)
+        cumple = a_mano(df, *filtros)
+        resultado = cubo.consultar(*filtros)
+        comprobar(resultado, df[cumple])
+        assert cubo.filas(resultado).tolist() == np.flatnonzero(cumple).tolist()
+
+
+def test_cubo_sin_filtros(registro):
+    _, _, df = registro
+    cubo = CuboRegistros(df)
+    filtros = (
+        df["lugar_registro"].unique(),
+        df["marca_auto"].unique(),
+        cubo.extremos["año_modelo"],
+        cubo.extremos["edad"],
+        cubo.extremos["autonomia_km"],
+        df["tipo_carga"].unique(),
+        df["baterias_recicladas"].unique(),
+    )
+    comprobar(cubo.consultar(*filtros), df[a_mano(df, *filtros)])
+
+
+def test_particiones_equivalen_a_pandas(registro):
+    ruta, directorio, df = registro
+    particionado = particiones_ev.abrir(ruta, directorio)
+    # Lotes pequeños para que cada consulta combine muchos parciales
+    particionado.filas_por_lote = 500
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        filtros = filtros_al_azar(rng, df)
+        cumple = a_mano(df, *filtros)
+        comprobar(particionado.consultar(*filtros), df[cumple])
+        muestra = particionado.muestra(*filtros, limite=50)
+        assert len(muestra) == min(50, cumple.sum())
+        assert a_mano(muestra, *filtros).all()
+
+
+def test_particiones_por_lugar(registro):
+    import pyarrow.dataset as ds
+
+    ruta, directorio, df = registro
+    particionado = particiones_ev.abrir(ruta, directorio)
+    assert len(particionado) == len(df)
+
+    def lugares(fragmentos):
+        return {ds.get_partition_keys(fragmento.partition_expression)["lugar_registro"] for fragmento in fragmentos}
+
+    # Un solo nivel de partición: cada archivo es de un lugar
+    assert lugares(particionado.dataset.get_fragments()) == set(df["lugar_registro"].unique())
+    assert all(archivo.parent.parent == particionado.ruta for archivo in particionado.ruta.rglob("*.parquet"))
+    # El filtro de lugar descarta las demás particiones sin abrirlas
+    lugar = df["lugar_registro"].iloc[0]
+    particion, _ = particionado.expresiones([lugar], [], (0, 0), (0, 0), (0, 0), [], [])
+    assert lugares(particionado.dataset.get_fragments(filter=particion)) == {lugar}
@@ -0,0 +1,136 @@
+"""Agrupación, reintentos y plazos del despachador compartido."""
+import threading
+import time
+
+import pytest
+
+from utilidades.despacho import CuboTokens, Despachador
+
+
+class Transitorio(Exception):
+    pass
+
+
+def despachador(**opciones):
+    opciones = {"por_minuto": 6_000, "concurrencia": 4, "espera_maxima": 0.01, **opciones}
+    return Despachador(reintentable=lambda error: isinstance(error, Transitorio), **opciones)
+
+
+def test_agrupa_las_peticiones_identicas():
+    soltar = threading.Event()
+    llamadas = []
+    terminadas = []
+
+    def producir():
+        llamadas.append(1)
+        yield "Hola"
+        soltar.wait(5)
+        yield " mundo"
+
+    despacho = despachador()
+    primero, agrupada_primero = despacho.pedir("pregunta", producir, terminadas.append)
+    segundo, agrupada_segundo = despacho.pedir("pregunta", producir)
+    assert (agrupada_primero, agrupada_segundo) == (False, True)
+    assert segundo is primero
+
+    lector = primero.leer(timeout=5)
+    assert next(lector) == "Hola"
+    soltar.set()
+    assert list(lector) == [" mundo"]
+    # Quien se une tarde recibe también los trozos que ya habían llegado
+    assert list(segundo.leer(timeout=5)) == ["Hola", " mundo"]
+    assert len(llamadas) == 1
+    assert terminadas == [["Hola", " mundo"]]
+    metricas = despacho.metricas()
+    assert (metricas["pedidas"], metricas["agrupadas"], metricas["intentos"]) == (2, 1, 1)
+
+    # Terminado el vuelo, la misma clave abre uno nuevo
+    _, agrupada = despacho.pedir("pregunta", producir)
+    assert not agrupada
+
+
+def test_reintenta_los_errores_transitorios_antes_del_primer_trozo():
+    fallos = [Transitorio("429"), Transitorio("503")]
+
+    def producir():
+        if fallos:
+            raise fallos.pop(0)
+        yield "respuesta"
+
+    despacho = despachador(intentos=4)
+    vuelo, _ = despacho.pedir("pregunta", producir)
+    assert list(vuelo.leer(timeout=5)) == ["respuesta"]
+    assert vuelo.intentos == 3
+    assert despacho.metricas()["reintentos"] == 2
+
+
+def test_no_reintenta_a_mitad_de_respuesta_ni_errores_permanentes():
+    llamadas = []
+
+    def a_medias():
+        llamadas.append(1)
+        yield "Ho"
+        raise Transitorio("se cortó")
+
+    despacho = despachador()
+    vuelo, _ = despacho.pedir("a medias", a_medias)
+    lector = vuelo.leer(timeout=5)
+    assert next(lector) == "Ho"
+    with pytest.raises(Transitorio):
+        next(lector)
+    assert len(llamadas) == 1
+
+    def permanente():
+        raise ValueError("prompt bloqueado")
+        yield
+
+    vuelo, _ = despacho.pedir("permanente", permanente)
+    with pytest.raises(ValueError):
+        list(vuelo.leer(timeout=5))
+    assert vuelo.intentos == 1
+    assert despacho.metricas()["errores"] == 2
+
+
+def test_se_agotan_los_intentos():
+    def producir():
+        raise Transitorio("429")
+        yield
+
+    vuelo, _ = despachador(intentos=3).pedir("pregunta", producir)
+    with pytest.raises(Transitorio):
+        list(vuelo.leer(timeout=5))
+    assert vuelo.intentos == 3
+
+
+def test_la_espera_en_la_cola_del_pool_no_cuenta_para_el_plazo():
+    def lenta():
+        time.sleep(0.6)
+        yield "primera"
+
+    despacho = despachador(concurrencia=1)
+    despacho.pedir("primera", lenta)
+    vuelo, _ = despacho.pedir("segunda", lambda: iter(["segunda"]))
+    assert list(vuelo.leer(timeout=0.2)) == ["segunda"]
+    assert vuelo.espera >= 0.3
+
+
+def test_la_espera_de_cuota_no_cuenta_para_el_plazo():
+    despacho = despachador()
+    despacho._cubo = CuboTokens(120, rafaga=1)  # Una ficha cada 0,5 s
+    vuelos = [despacho.pedir(f"pregunta {i}", lambda i=i: iter([str(i)]))[0] for i in range(3)]
+    assert [list(vuelo.leer(timeout=0.2)) for vuelo in vuelos] == [["0"], ["1"], ["2"]]
+    assert vuelos[-1].espera_cuota >= 0.5
+
+
+def test_el_plazo_corre_mientras_se_ejecuta():
+    soltar = threading.Event()
+
+    def colgada():
+        soltar.wait(5)
+        yield "tarde"
+
+    vuelo, _ = despachador().pedir("pregunta", colgada)
+    with pytest.raises(TimeoutError):
+        list(vuelo.leer(timeout=0.2))
+    soltar.set()
+    assert list(vuelo.leer(timeout=5)) == ["tarde"]
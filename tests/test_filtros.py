@@ -0,0 +1,71 @@
+"""`IndiceFiltros` frente al mismo filtrado hecho fila a fila con pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utilidades.filtros import IndiceFiltros
+
+
+def tabla(rng, filas=2_000):
+    fechas = pd.Series(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 400, filas), unit="D"))
+    fechas[rng.random(filas) < 0.05] = pd.NaT
+    semestre = rng.integers(1, 11, filas).astype(float)
+    semestre[rng.random(filas) < 0.05] = np.nan
+    carrera = rng.choice(np.array(["Sistemas", "Civil", "Derecho", "Medicina", None], dtype=object), filas)
+    return pd.DataFrame({
+        "carrera": carrera,
+        "rol": pd.Categorical(rng.choice(["asistente", "ponente", "organizador"], filas)),
+        "semestre": semestre,
+        "cupo": rng.integers(20, 500, filas),
+        "fecha": fechas,
+    })
+
+
+def filtros_al_azar(rng, df, indice):
+    filtros = {}
+    for col in rng.permutation(df.columns)[: rng.integers(1, len(df.columns) + 1)]:
+        if col in indice.categoricas:
+            opciones = indice.opciones(col) + ["(sin filas)"]
+            filtros[col] = opciones[rng.integers(len(opciones))]
+        else:
+            validos = df[col].dropna().to_numpy()
+            desde, hasta = sorted(rng.choice(validos, 2))
+            filtros[col] = (desde, hasta)
+    return filtros
+
+
+def a_mano(df, filtros):
+    cumple = pd.Series(True, index=df.index)
+    for col, valor in filtros.items():
+        if isinstance(valor, tuple):
+            cumple &= df[col].between(*valor)
+        else:
+            cumple &= df[col] == valor
+    return df[cumple]
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_filtrar_equivale_a_pandas(semilla):
+    rng = np.random.default_rng(semilla)
+    df = tabla(rng)
+    indice = IndiceFiltros(df, list(df.columns))
+    for _ in range(50):
+        filtros = filtros_al_azar(rng, df, indice)
+        esperado = a_mano(df, filtros)
+        assert indice.filtrar(filtros).index.tolist() == esperado.index.tolist(), filtros
+        # La segunda vez sale de la memoria de estados
+        assert indice.filtrar(filtros).index.tolist() == esperado.index.tolist(), filtros
+
+
+def test_opciones_y_extremos():
+    df = tabla(np.random.default_rng(0))
+    indice = IndiceFiltros(df, list(df.columns))
+    assert indice.opciones("carrera") == sorted(df["carrera"].dropna().unique())
+    assert indice.extremos("semestre") == (df["semestre"].min(), df["semestre"].max())
+    assert indice.extremos("fecha") == (df["fecha"].min(), df["fecha"].max())
+
+
+def test_sin_filtros_activos_devuelve_la_tabla():
+    df = tabla(np.random.default_rng(0))
+    indice = IndiceFiltros(df, list(df.columns))
+    assert indice.filtrar({"cupo": (df["cupo"].min(), df["cupo"].max())}) is df
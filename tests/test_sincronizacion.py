@@ -0,0 +1,117 @@
+"""Sincronización incremental contra la API local de los benchmarks."""
+import json
+
+import pandas as pd
+import pytest
+
+from benchmarks.api_local import ApiLocal
+from utilidades import api_eventos, snapshots
+from utilidades.sincronizacion import PARAMETRO_DESDE_ID, sincronizar
+
+TIPO = "asistenciaeventos"
+ID = "id_asistencia"
+
+
+def asistencias(ids, fechas=None):
+    fechas = fechas or {}
+    return [
+        {"id_asistencia": i, "id_evento": 1, "id_participante": i, "fecha_asistencia": fechas.get(i, "2025-01-01")}
+        for i in ids
+    ]
+
+
+class ApiConCambios(ApiLocal):
+    """Devuelve, junto a los registros nuevos, los anteriores que se modificaron (`cambiados`)."""
+
+    cambiados = ()
+
+    def _cuerpo(self, tipo, consulta):
+        cuerpo, etag = super()._cuerpo(tipo, consulta)
+        if tipo != TIPO or PARAMETRO_DESDE_ID not in consulta or not self.cambiados:
+            return cuerpo, etag
+        anteriores = [registro for registro in self.datos[tipo] if registro[ID] in self.cambiados]
+        return self._serializar(anteriores + json.loads(cuerpo))
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """Arranca una API local y apunta a ella los endpoints, con la memoria de `api_eventos` vacía."""
+    servidores = []
+
+    def arrancar(clase=ApiLocal, **opciones):
+        api = clase(filas=10, **opciones).iniciar()
+        servidores.append(api)
+        for tipo, url in list(api_eventos.API_ENDPOINTS.items()):
+            monkeypatch.setitem(api_eventos.API_ENDPOINTS, tipo, f"{api.url}/{url.rsplit('/', 1)[-1]}")
+        monkeypatch.setattr(api_eventos, "_en_memoria", {})
+        return api
+
+    yield arrancar
+    for api in servidores:
+        api.detener()
+
+
+def ids(df):
+    return sorted(df[ID].tolist())
+
+
+def test_agrega_las_filas_nuevas_como_parte(servidor, tmp_path):
+    api = servidor()
+    api.publicar(TIPO, asistencias(range(1, 6)))
+    assert ids(sincronizar(TIPO, directorio=tmp_path)) == [1, 2, 3, 4, 5]
+    etag_completo = snapshots.leer_metadatos(TIPO, tmp_path)["etag"]
+
+    api.publicar(TIPO, asistencias(range(1, 8)))
+    df = sincronizar(TIPO, directorio=tmp_path)
+    assert ids(df) == list(range(1, 8))
+    assert df.attrs["snapshot"]["origen"] == "incremental"
+    metadatos = snapshots.leer_metadatos(TIPO, tmp_path)
+    assert len(metadatos["partes"]) == 1
+    assert metadatos["marca_valor"] == 7
+    assert "filtro_ignorado_en" not in metadatos
+    # Los validadores son los de la respuesta incremental, no los del snapshot completo anterior
+    assert metadatos["etag"] not in (None, etag_completo)
+
+    assert sincronizar(TIPO, directorio=tmp_path).attrs["snapshot"]["origen"] == "no_modificado"
+    assert ids(snapshots.cargar(TIPO, tmp_path)) == list(range(1, 8))
+
+
+def test_delta_mayor_que_la_base_no_pierde_filas(servidor, tmp_path):
+    api = servidor()
+    api.publicar(TIPO, asistencias(range(1, 6)))
+    sincronizar(TIPO, directorio=tmp_path)
+
+    api.publicar(TIPO, asistencias(range(1, 15)))
+    assert ids(sincronizar(TIPO, directorio=tmp_path)) == list(range(1, 15))
+    assert ids(snapshots.cargar(TIPO, tmp_path)) == list(range(1, 15))
+    assert "filtro_ignorado_en" not in snapshots.leer_metadatos(TIPO, tmp_path)
+
+
+def test_sustituye_las_filas_cambiadas(servidor, tmp_path):
+    api = servidor(ApiConCambios)
+    api.publicar(TIPO, asistencias(range(1, 6)))
+    sincronizar(TIPO, directorio=tmp_path)
+
+    api.cambiados = (3,)
+    api.publicar(TIPO, asistencias(range(1, 7), {3: "2025-02-01"}))
+    df = sincronizar(TIPO, directorio=tmp_path)
+    assert ids(df) == list(range(1, 7))
+    assert df.loc[df[ID] == 3, "fecha_asistencia"].tolist() == [pd.Timestamp("2025-02-01")]
+    assert "filtro_ignorado_en" not in snapshots.leer_metadatos(TIPO, tmp_path)
+
+
+def test_servidor_que_ignora_el_filtro(servidor, tmp_path):
+    api = servidor(incremental=False)
+    api.publicar(TIPO, asistencias(range(1, 6)))
+    sincronizar(TIPO, directorio=tmp_path)
+
+    api.publicar(TIPO, asistencias(range(1, 8), {2: "2025-03-01"}))
+    df = sincronizar(TIPO, directorio=tmp_path)
+    assert ids(df) == list(range(1, 8))
+    assert df.loc[df[ID] == 2, "fecha_asistencia"].tolist() == [pd.Timestamp("2025-03-01")]
+    metadatos = snapshots.leer_metadatos(TIPO, tmp_path)
+    assert metadatos["filtro_ignorado_en"] is not None
+    assert metadatos["partes"] == []
+
+    # Con el filtro ignorado se revalida la colección completa, que no ha cambiado
+    assert sincronizar(TIPO, directorio=tmp_path).attrs["snapshot"]["origen"] == "no_modificado"
@@ -0,0 +1 @@
+"""Módulos auxiliares compartidos por las páginas del proyecto."""
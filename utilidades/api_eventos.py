@@ -0,0 +1,185 @@
+"""Acceso a la API de eventos escolares (eventos-25 en Render).
+
+Todas las descargas comparten una única sesión HTTP con keep-alive y un pool
+de conexiones del tamaño del número de endpoints, de modo que la carga
+concurrente reutiliza las conexiones TLS en lugar de abrir una por petición.
+
+Cada respuesta se guarda como snapshot local (ver `snapshots`) y las descargas
+siguientes son peticiones condicionales: un 304 reutiliza el último DataFrame
+sin volver a decodificar JSON. Los tipos de cada endpoint se fijan al cargarlo
+con `esquemas.aplicar`, y el snapshot los conserva.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import NamedTuple, Optional
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from utilidades import esquemas, snapshots
+
+# MIPROYECTO_API_EVENTOS permite usar otra instancia de la API (p. ej. la local de los benchmarks)
+API_BASE = os.environ.get("MIPROYECTO_API_EVENTOS") or "https://eventos-25.onrender.com/api"
+
+# URLs de la API (DEBEN ser consistentes con los nombres usados en cargar_datos)
+API_ENDPOINTS = {
+    "estudiantes": f"{API_BASE}/estudiantes",
+    "asistenciaeventos": f"{API_BASE}/asistenciaeventos",
+    "eventos": f"{API_BASE}/eventos",
+    "categoriaevento": f"{API_BASE}/categoriasevento",  # La clave es singular, la ruta es plural
+    "participantes": f"{API_BASE}/participantes",
+    "profesores": f"{API_BASE}/profesores",
+}
+
+TIMEOUT_ENDPOINT = 30  # Segundos máximos por endpoint
+TIMEOUT_CON_SNAPSHOT = 10  # Con copia local disponible no merece la pena esperar más
+PRESUPUESTO_PAGINA = 45  # Segundos máximos para cargar todos los endpoints
+
+_sesion = None
+_sesion_lock = threading.Lock()
+
+# Último DataFrame bueno por endpoint, para reutilizarlo tal cual en un 304
+_en_memoria = {}
+_en_memoria_lock = threading.Lock()
+
+
+class ResultadoCarga(NamedTuple):
+    tipo: str
+    df: Optional[pd.DataFrame]
+    error: Optional[BaseException]
+    segundos: float
+
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP del proceso, creándola la primera vez."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=len(API_ENDPOINTS))
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            sesion.headers.update({"Accept": "application/json"})
+            _sesion = sesion
+        return _sesion
+
+
+def con_origen(df, origen, guardado_en):
+    """Vista superficial de `df` anotada con su procedencia en `attrs`."""
+    # Vista superficial para no tocar los attrs del DataFrame compartido
+    vista = df.copy(deep=False)
+    vista.attrs = {**df.attrs, "snapshot": {"origen": origen, "guardado_en": guardado_en}}
+    return vista
+
+
+def recordar(tipo, df):
+    """Guarda `df` como último DataFrame bueno de `tipo` en este proceso."""
+    with _en_memoria_lock:
+        _en_memoria[tipo] = df
+
+
+def ultimo_bueno(tipo, directorio=snapshots.DIRECTORIO):
+    """Último DataFrame bueno de `tipo` (memoria o snapshot), o None."""
+    with _en_memoria_lock:
+        df = _en_memoria.get(tipo)
+    if df is None:
+        df = snapshots.cargar(tipo, directorio)
+        if df is not None:
+            df = esquemas.aplicar(tipo, df)
+            recordar(tipo, df)
+    return df
+
+
+def descargar(tipo, timeout=None, directorio=snapshots.DIRECTORIO):
+    """Descarga un endpoint y lo devuelve como DataFrame.
+
+    Si hay snapshot local se hace una petición condicional; con un 304 se
+    devuelve el snapshot sin descargar ni decodificar nada. No captura
+    excepciones: quien llama decide cómo mostrarlas (ver `respaldo`).
+    """
+    metadatos = snapshots.leer_metadatos(tipo, directorio)
+    if timeout is None:
+        timeout = TIMEOUT_CON_SNAPSHOT if metadatos else TIMEOUT_ENDPOINT
+    url = API_ENDPOINTS[tipo]
+    response = obtener_sesion().get(url, headers=snapshots.cabeceras_condicionales(metadatos), timeout=timeout)
+    if response.status_code == 304:
+        df = ultimo_bueno(tipo, directorio)
+        if df is not None:
+            snapshots.marcar_validado(tipo, directorio)
+            return con_origen(df, "no_modificado", time.time())
+        # El snapshot desapareció entre la lectura de metadatos y la respuesta
+        response = obtener_sesion().get(url, timeout=timeout)
+    response.raise_for_status()  # Lanza un error para códigos de estado HTTP 4xx/5xx
+    df = esquemas.aplicar(tipo, pd.DataFrame(response.json()))
+    snapshots.guardar(
+        tipo,
+        df,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        directorio=directorio,
+    )
+    recordar(tipo, df)
+    return con_origen(df, "api", time.time())
+
+
+def respaldo(tipo, directorio=snapshots.DIRECTORIO):
+    """Último snapshot bueno de `tipo` para servir cuando la API falla, o None."""
+    df = ultimo_bueno(tipo, directorio)
+    if df is None:
+        return None
+    guardado_en = snapshots.leer_metadatos(tipo, directorio).get("guardado_en")
+    return con_origen(df, "respaldo", guardado_en)
+
+
+def cargar_concurrente(cargar, tipos, prioridad=None, presupuesto=PRESUPUESTO_PAGINA, inicializador=None):
+    """Ejecuta `cargar(tipo)` para todos los `tipos` en paralelo.
+
+    Produce un `ResultadoCarga` por endpoint a medida que van llegando. El
+    endpoint `prioridad` se lanza primero y se entrega antes que el resto,
+    para que la página pueda mostrarlo sin esperar a los demás. Los endpoints
+    que no terminan dentro de `presupuesto` segundos se entregan con un
+    `TimeoutError`.
+    """
+    tipos = sorted(tipos, key=lambda tipo: tipo != prioridad)
+    if not tipos:
+        return
+    inicio = time.monotonic()
+    limite = inicio + presupuesto
+    executor = ThreadPoolExecutor(
+        max_workers=len(tipos), thread_name_prefix="cargar_datos", initializer=inicializador
+    )
+    futuros = {executor.submit(cargar, tipo): tipo for tipo in tipos}
+    pendientes = set(futuros)
+
+    def _resultado(futuro):
+        pendientes.discard(futuro)
+        tipo = futuros[futuro]
+        segundos = time.monotonic() - inicio
+        error = futuro.exception()
+        return ResultadoCarga(tipo, None if error else futuro.result(), error, segundos)
+
+    try:
+        primero = next(iter(futuros))
+        if futuros[primero] == prioridad:
+            wait([primero], timeout=max(0.0, limite - time.monotonic()))
+            if primero.done():
+                yield _resultado(primero)
+        try:
+            for futuro in as_completed(list(pendientes), timeout=max(0.0, limite - time.monotonic())):
+                yield _resultado(futuro)
+        except FuturesTimeoutError:
+            pass
+        for futuro in list(pendientes):
+            pendientes.discard(futuro)
+            yield ResultadoCarga(
+                futuros[futuro],
+                None,
+                TimeoutError(f"se superó el presupuesto de {presupuesto} s"),
+                time.monotonic() - inicio,
+            )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
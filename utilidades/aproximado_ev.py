@@ -0,0 +1,445 @@
+"""Modo aproximado del registro de carros eléctricos (sobre el modo particionado).
+
+Con millones de filas, cada cambio de un filtro en el modo particionado recorre
+todos los grupos de filas que lo cumplen. Para explorar basta con una
+estimación, así que al preparar el dataset particionado se guardan también:
+
+- una muestra estratificada: cada archivo de cada partición (lugar de
+  registro) es un estrato del que se guarda el `FRACCION` de sus filas, con un
+  mínimo de `MIN_POR_ESTRATO` (o todas, si tiene menos). Cada fila de la
+  muestra pesa `filas del estrato / filas de su muestra`,
+- un boceto HyperLogLog por estrato de `modelo_auto` y `version_software`,
+  para contar valores distintos uniendo los de los lugares seleccionados.
+
+`Estimador.consultar` aplica los filtros del tablero a la muestra y devuelve
+una `Estimacion`: un `ResultadoCubo` con los totales ya escalados (la página lo
+usa igual que el exacto) y la mitad del ancho del intervalo de confianza al 95 %
+de cada métrica, conteo por marca, tramo de edad y mes (varianza del muestreo
+estratificado sin reposición; las medias, como cociente de totales). Si pocas
+filas de la muestra cumplen los filtros, la estimación no es fiable.
+
+El resultado exacto se calcula en segundo plano cuando el usuario deja de mover
+los filtros: `exacto()` lo programa y solo lo lanza si, pasados
+`DEMORA_EXACTO` segundos, la sesión sigue con los mismos filtros. Los exactos
+se calculan de uno en uno (cada consulta ya usa un pool de hilos) y los que
+esperan en cola se descartan si la sesión que los lanzó pide otros filtros y
+ninguna otra sesión sigue esperándolos.
+
+Para generarlo a mano::
+
+    python -m utilidades.aproximado_ev [ruta.csv]
+"""
+import json
+import math
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utilidades import dataset_ev, particiones_ev
+from utilidades.archivos import escribir_atomico
+from utilidades.cubo_ev import ResultadoCubo
+
+COLUMNAS_MUESTRA = ["marca_auto", "año_modelo", "edad", "autonomia_km", "tipo_carga", "baterias_recicladas", "fecha_registro"]
+COLUMNAS_DISTINTOS = ["modelo_auto", "version_software"]
+
+FRACCION = 0.01  # Parte de cada estrato que entra en la muestra
+MIN_POR_ESTRATO = 200
+BITS_HLL = 12  # 4096 registros por boceto: error típico de 1.04 / 64 ≈ 1.6 %
+Z = 1.96  # Intervalos al 95 %
+MIN_FILAS_FIABLE = 30  # Con menos filas de la muestra que cumplan los filtros, la estimación no es fiable
+SEMILLA = 2025
+
+DEMORA_EXACTO = 1.0  # Segundos sin cambiar los filtros antes de lanzar el cálculo exacto
+MAX_EXACTOS = 64  # Resultados exactos en caché por proceso
+
+FORMATO = 1  # Se incrementa al cambiar cómo se construye la muestra, para forzar su reconstrucción
+
+_lock = threading.Lock()
+_exactos = OrderedDict()
+_lectores = {}  # Clave -> canales que han pedido su exacto (solo cuentan los que siguen en esa clave)
+_programados = {}  # Clave -> lanzamientos programados que aún no se han decidido
+_exactos_lock = threading.Lock()
+_ejecutor = None
+
+
+def _rutas(ruta_csv, directorio):
+    nombre = Path(ruta_csv).stem
+    return tuple(Path(directorio) / f"{nombre}.aproximado.{extension}" for extension in ("arrow", "npz", "json"))
+
+
+def _agregar_hll(registros, columna):
+    """Añade los valores de `columna` al boceto `registros` (basta con los distintos del lote)."""
+    import pyarrow.compute as pc
+
+    valores = pc.unique(columna).drop_null().to_numpy(zero_copy_only=False)
+    if not len(valores):
+        return
+    hashes = pd.util.hash_array(valores.astype(object))
+    indices = (hashes >> np.uint64(64 - BITS_HLL)).astype(np.int64)
+    # Los bits restantes caben en la mantisa de un float64, así que frexp da su posición más alta exacta
+    _, exponente = np.frexp((hashes & np.uint64((1 << (64 - BITS_HLL)) - 1)).astype(np.float64))
+    np.maximum.at(registros, indices, (64 - BITS_HLL + 1 - exponente).astype(np.uint8))
+
+
+def _estimar_hll(registros):
+    """Valores distintos estimados a partir de un boceto (con la corrección para pocos valores)."""
+    m = len(registros)
+    estimacion = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registros.astype(np.int64)))
+    vacios = int(np.count_nonzero(registros == 0))
+    if estimacion <= 2.5 * m and vacios:
+        estimacion = m * math.log(m / vacios)
+    return float(estimacion)
+
+
+def _resumir(fragmento, semilla):
+    """Muestra y bocetos de un archivo del dataset particionado."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    claves = ds.get_partition_keys(fragmento.partition_expression)
+    filas = fragmento.count_rows()
+    tamano = min(filas, max(MIN_POR_ESTRATO, math.ceil(FRACCION * filas)))
+    elegidas = np.sort(np.random.default_rng(semilla).choice(filas, tamano, replace=False))
+    registros = {col: np.zeros(1 << BITS_HLL, dtype=np.uint8) for col in COLUMNAS_DISTINTOS}
+    partes, desplazamiento = [], 0
+    for lote in fragmento.to_batches(
+        columns=COLUMNAS_MUESTRA + COLUMNAS_DISTINTOS, batch_size=particiones_ev.FILAS_POR_LOTE, use_threads=False
+    ):
+        desde, hasta = np.searchsorted(elegidas, [desplazamiento, desplazamiento + lote.num_rows])
+        if hasta > desde:
+            partes.append(lote.select(COLUMNAS_MUESTRA).take(pa.array(elegidas[desde:hasta] - desplazamiento)))
+        for col in COLUMNAS_DISTINTOS:
+            _agregar_hll(registros[col], lote.column(col))
+        desplazamiento += lote.num_rows
+    return claves, filas, partes, registros
+
+
+def construir(particionado, ruta_csv=dataset_ev.RUTA_CSV, directorio=dataset_ev.DIRECTORIO):
+    """Genera la muestra estratificada y los bocetos de `particionado` (un `RegistrosParticionados`)."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    ruta_muestra, ruta_bocetos, ruta_meta = _rutas(ruta_csv, directorio)
+    fragmentos = list(particionado.dataset.get_fragments())
+    with ThreadPoolExecutor(max_workers=max(1, min(particiones_ev.TRABAJADORES, len(fragmentos)))) as pool:
+        resumenes = list(pool.map(lambda par: _resumir(par[1], [SEMILLA, par[0]]), enumerate(fragmentos)))
+
+    esquema = particionado.dataset.schema
+    esquema = pa.schema([esquema.field(col) for col in COLUMNAS_MUESTRA])
+    lotes, estratos = [], {"lugar_registro": [], "filas": [], "muestra": []}
+    for estrato, (claves, filas, partes, _) in enumerate(resumenes):
+        muestra = pa.Table.from_batches(partes, schema=esquema) if partes else esquema.empty_table()
+        lotes.append(muestra.append_column("estrato", pa.array(np.full(muestra.num_rows, estrato, dtype=np.int32))))
+        estratos["lugar_registro"].append(claves.get("lugar_registro"))
+        estratos["filas"].append(filas)
+        estratos["muestra"].append(muestra.num_rows)
+    muestra = pa.concat_tables(lotes) if lotes else esquema.empty_table().append_column("estrato", pa.array([], pa.int32()))
+    bocetos = {
+        col: np.stack([registros[col] for *_, registros in resumenes]) if resumenes
+        else np.zeros((0, 1 << BITS_HLL), dtype=np.uint8)
+        for col in COLUMNAS_DISTINTOS
+    }
+
+    def guardar_bocetos(ruta):
+        with open(ruta, "wb") as archivo:
+            np.savez(archivo, **bocetos)
+
+    metadatos = {
+        "formato": FORMATO,
+        "formato_particiones": particiones_ev.FORMATO,  # Los estratos son los archivos del dataset particionado
+        "sha256": particionado.metadatos["sha256"],
+        "estratos": estratos,
+    }
+    # Como en el dataset particionado: sin metadatos, los archivos a medio cambiar no se dan por vigentes
+    ruta_meta.unlink(missing_ok=True)
+    escribir_atomico(ruta_muestra, lambda ruta: feather.write_feather(muestra, ruta, compression="zstd"))
+    escribir_atomico(ruta_bocetos, guardar_bocetos)
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+    return ruta_muestra
+
+
+def _metadatos_vigentes(particionado, ruta_csv, directorio):
+    ruta_muestra, ruta_bocetos, ruta_meta = _rutas(ruta_csv, directorio)
+    if not (ruta_muestra.exists() and ruta_bocetos.exists() and ruta_meta.exists()):
+        return None
+    try:
+        metadatos = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (metadatos.get("formato"), metadatos.get("formato_particiones"), metadatos.get("sha256")) != (
+        FORMATO, particiones_ev.FORMATO, particionado.metadatos["sha256"]
+    ):
+        return None
+    return metadatos
+
+
+def abrir(ruta_csv=dataset_ev.RUTA_CSV, directorio=dataset_ev.DIRECTORIO):
+    """El `Estimador` del registro, preparando antes el dataset particionado y la muestra si hace falta."""
+    import pyarrow.feather as feather
+
+    particionado = particiones_ev.abrir(ruta_csv, directorio)
+    with _lock:
+        metadatos = _metadatos_vigentes(particionado, ruta_csv, directorio)
+        if metadatos is None:
+            construir(particionado, ruta_csv, directorio)
+            metadatos = _metadatos_vigentes(particionado, ruta_csv, directorio)
+    ruta_muestra, ruta_bocetos, _ = _rutas(ruta_csv, directorio)
+    with np.load(ruta_bocetos) as archivo:
+        bocetos = {col: archivo[col] for col in COLUMNAS_DISTINTOS}
+    return Estimador(feather.read_table(ruta_muestra).to_pandas(), pd.DataFrame(metadatos["estratos"]), bocetos)
+
+
+class Estimacion(NamedTuple):
+    resultado: ResultadoCubo  # Totales escalados; por_marca, por_edad y por_mes llevan además la columna "error"
+    error_registros: float  # Mitad del ancho del intervalo al 95 %
+    error_edad: float
+    error_autonomia: float
+    filas_muestra: int  # Filas de la muestra que cumplen los filtros
+
+    @property
+    def fiable(self):
+        return self.filas_muestra >= MIN_FILAS_FIABLE
+
+    @property
+    def empatadas(self):
+        """Marcas cuyo intervalo se solapa con el de la más común: con la muestra no se puede decir cuál gana."""
+        por_marca, marca = self.resultado.por_marca, self.resultado.marca_mas_comun
+        if marca is None:
+            return []
+        primera = por_marca.loc[por_marca["marca_auto"] == marca].iloc[0]
+        otras = por_marca.loc[
+            (por_marca["marca_auto"] != marca)
+            & (por_marca["registros"] + por_marca["error"] >= primera["registros"] - primera["error"])
+        ]
+        return list(otras["marca_auto"])
+
+
+class Estimador:
+    """Consultas del tablero respondidas con la muestra estratificada, con la misma interfaz que `CuboRegistros`."""
+
+    def __init__(self, muestra, estratos, bocetos):
+        self.estrato = muestra["estrato"].to_numpy(dtype=np.int64)
+        self.filas_estrato = estratos["filas"].to_numpy(dtype=float)
+        self.muestra_estrato = estratos["muestra"].to_numpy(dtype=float)
+        self.bocetos = bocetos
+        self.filas_muestra = len(muestra)
+        self.valores = {}
+        self.codigos = {}
+        codigos_lugar, lugares = pd.factorize(estratos["lugar_registro"], sort=True)
+        self.lugar_estrato = codigos_lugar
+        self.valores["lugar_registro"] = list(lugares)
+        self.codigos["lugar_registro"] = codigos_lugar[self.estrato]
+        for col in ("marca_auto", "tipo_carga", "baterias_recicladas"):
+            self.codigos[col], valores = pd.factorize(muestra[col], sort=True)
+            self.valores[col] = list(valores)
+        self.numeros = {col: muestra[col].to_numpy(dtype=float) for col in ("año_modelo", "edad", "autonomia_km")}
+        self.codigos["edad"], edades = pd.factorize(muestra["edad"], sort=True)
+        self.valores["edad"] = edades.to_numpy(dtype=float)
+        meses = pd.Series(muestra["fecha_registro"].to_numpy().astype("datetime64[M]"))
+        self.codigos["mes"], meses = pd.factorize(meses, sort=True)
+        self.valores["mes"] = [mes.strftime("%Y-%m") for mes in meses]
+
+    def __len__(self):
+        return self.filas_muestra
+
+    def _en(self, col, seleccion):
+        elegidos = set(seleccion)
+        return np.isin(self.codigos[col], [i for i, valor in enumerate(self.valores[col]) if valor in elegidos])
+
+    def _total(self, valores, grupos=None, n_grupos=1):
+        """Total estimado de `valores` en el registro (por grupo) y la mitad del ancho de su intervalo.
+
+        Varianza del estimador estratificado: suma en los estratos de
+        N² (1 - n/N) s² / n, con s² la cuasivarianza de los valores de la muestra del estrato.
+        """
+        if grupos is None:
+            grupos = np.zeros(len(valores), dtype=np.int64)
+        validos = grupos >= 0
+        valores = np.where(validos, valores, 0.0)
+        celdas = self.estrato * n_grupos + np.where(validos, grupos, 0)
+        tamano = len(self.filas_estrato) * n_grupos
+        suma = np.bincount(celdas, valores, minlength=tamano).reshape(-1, n_grupos)
+        suma_cuadrados = np.bincount(celdas, valores ** 2, minlength=tamano).reshape(-1, n_grupos)
+        filas = self.filas_estrato[:, None]
+        muestra = np.maximum(self.muestra_estrato[:, None], 1)
+        total = (filas / muestra * suma).sum(axis=0)
+        cuasivarianza = np.where(
+            muestra > 1, np.maximum(suma_cuadrados - suma ** 2 / muestra, 0) / np.maximum(muestra - 1, 1), 0.0
+        )
+        varianza = (filas ** 2 * (1 - muestra / np.maximum(filas, 1)) * cuasivarianza / muestra).sum(axis=0)
+        return total, Z * np.sqrt(varianza)
+
+    def _media(self, x, y, grupos=None, n_grupos=1):
+        """Media de `x` en las filas con `y` = 1 (por grupo) y la mitad del ancho de su intervalo."""
+        x = np.where(y > 0, x, 0.0)
+        conteo, _ = self._total(y, grupos, n_grupos)
+        suma, _ = self._total(y * x, grupos, n_grupos)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = suma / conteo
+            residuo = y * (x - media[0 if grupos is None else np.maximum(grupos, 0)])
+            _, error = self._total(np.nan_to_num(residuo), grupos, n_grupos)
+            return media, error / conteo
+
+    def consultar(self, lugares, marcas, años, edades, autonomias, tipos_carga, baterias):
+        """`Estimacion` de los agregados de las filas que cumplen los filtros del tablero."""
+        cumple = (
+            self._en("lugar_registro", lugares)
+            & self._en("marca_auto", marcas)
+            & self._en("tipo_carga", tipos_carga)
+            & self._en("baterias_recicladas", baterias)
+        )
+        for col, (desde, hasta) in (("año_modelo", años), ("edad", edades), ("autonomia_km", autonomias)):
+            cumple &= (self.numeros[col] >= desde) & (self.numeros[col] <= hasta)
+        y = cumple.astype(float)
+        edad, autonomia = self.numeros["edad"], self.numeros["autonomia_km"]
+
+        total, error_total = self._total(y)
+        registros = int(round(total[0]))
+        media_edad, error_edad = self._media(edad, y)
+        media_autonomia, error_autonomia = self._media(autonomia, y)
+        cuadrados_edad, _ = self._total(y * np.where(cumple, edad, 0.0) ** 2)
+        cuadrados_autonomia, _ = self._total(y * np.where(cumple, autonomia, 0.0) ** 2)
+
+        def conteos(col, nombre_valor, nombre_conteo, valores):
+            n = len(self.valores[col])
+            estimados, errores = self._total(y, self.codigos[col], n)
+            presentes = np.flatnonzero(np.bincount(np.maximum(self.codigos[col], 0), cumple & (self.codigos[col] >= 0), minlength=n))
+            return pd.DataFrame({
+                nombre_valor: valores[presentes] if isinstance(valores, np.ndarray) else [valores[i] for i in presentes],
+                nombre_conteo: np.rint(estimados[presentes]).astype(np.int64),
+                "error": errores[presentes],
+            }), presentes
+
+        por_marca, marcas_presentes = conteos("marca_auto", "marca_auto", "registros", self.valores["marca_auto"])
+        medias_marca, errores_marca = self._media(autonomia, y, self.codigos["marca_auto"], len(self.valores["marca_auto"]))
+        por_marca.insert(2, "autonomia_promedio", medias_marca[marcas_presentes])
+        por_marca["error_autonomia"] = errores_marca[marcas_presentes]
+        por_edad, _ = conteos("edad", "edad", "registros", self.valores["edad"])
+        por_mes, _ = conteos("mes", "year_month", "count", self.valores["mes"])
+
+        def promedio(media):
+            return float(media[0]) * registros if registros else 0.0
+
+        resultado = ResultadoCubo(
+            registros=registros,
+            suma_edad=promedio(media_edad),
+            suma_cuadrados_edad=float(cuadrados_edad[0]),
+            suma_autonomia=promedio(media_autonomia),
+            suma_cuadrados_autonomia=float(cuadrados_autonomia[0]),
+            por_marca=por_marca,
+            por_edad=por_edad,
+            por_mes=por_mes,
+            celdas=np.empty(0, dtype=np.int64),
+            filas_parciales=np.empty(0, dtype=np.int64),
+        )
+        return Estimacion(
+            resultado,
+            float(error_total[0]),
+            float(error_edad[0]),
+            float(error_autonomia[0]),
+            int(cumple.sum()),
+        )
+
+    def distintos(self, lugares):
+        """Valores distintos de cada columna de `COLUMNAS_DISTINTOS` en los lugares elegidos: (estimación, error al 95 %).
+
+        Los bocetos se guardan por estrato, así que solo tienen en cuenta el filtro de lugar.
+        """
+        elegidos = np.isin(self.lugar_estrato, [i for i, lugar in enumerate(self.valores["lugar_registro"]) if lugar in set(lugares)])
+        resultado = {}
+        for col, bocetos in self.bocetos.items():
+            if not elegidos.any():
+                resultado[col] = (0.0, 0.0)
+                continue
+            estimacion = _estimar_hll(bocetos[elegidos].max(axis=0))
+            resultado[col] = (estimacion, Z * 1.04 / math.sqrt(bocetos.shape[1]) * estimacion)
+        return resultado
+
+
+class Canal:
+    """Filtros que pidió por última vez una sesión, para saber si el usuario sigue moviéndolos."""
+
+    def __init__(self):
+        self.clave = None
+        self.encolado = None  # Future del último exacto que lanzó la sesión
+
+
+def exacto(canal, clave, calcular, demora=DEMORA_EXACTO):
+    """Future con el resultado exacto de `clave`, o None si todavía no se ha lanzado.
+
+    La primera vez que se pide una clave solo se programa: `calcular()` se lanza
+    pasados `demora` segundos si para entonces `canal` sigue en la misma clave.
+    """
+    with _exactos_lock:
+        canal.clave = clave
+        futuro = _exactos.get(clave)
+        if futuro is not None:
+            _exactos.move_to_end(clave)
+            _lectores[clave].add(canal)
+            return futuro
+        _programados[clave] = _programados.get(clave, 0) + 1
+    temporizador = threading.Timer(demora, _lanzar, (canal, clave, calcular))
+    temporizador.daemon = True
+    temporizador.start()
+    return None
+
+
+def terminado(clave):
+    """True si hay que volver a pintar la página: el exacto de `clave` ya acabó (bien o con error) o se
+    descartó sin que haya otro lanzamiento programado (al volver a pedirlo con `exacto` se programa).
+    """
+    with _exactos_lock:
+        futuro = _exactos.get(clave)
+        if futuro is None:
+            return clave not in _programados
+    return futuro.done()
+
+
+def resultado(clave):
+    """Resultado exacto de `clave` si ya acabó bien, o None (sin lanzar, acabado con error o descartado)."""
+    with _exactos_lock:
+        futuro = _exactos.get(clave)
+    if futuro is None or not futuro.done() or futuro.cancelled() or futuro.exception() is not None:
+        return None
+    return futuro.result()
+
+
+def _lanzar(canal, clave, calcular):
+    global _ejecutor
+    with _exactos_lock:
+        _programados[clave] -= 1
+        if not _programados[clave]:
+            del _programados[clave]
+        if canal.clave != clave:
+            return  # El usuario siguió moviendo los filtros
+        if clave in _exactos:
+            _lectores[clave].add(canal)  # Otra sesión ya lo lanzó
+            return
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(1, thread_name_prefix="exacto")
+        # El exacto anterior de la sesión se descarta si aún no empezó y nadie más lo espera
+        anterior = next((otra for otra, futuro in _exactos.items() if futuro is canal.encolado), None)
+        if anterior is not None and not any(otro.clave == anterior for otro in _lectores[anterior]):
+            if _exactos[anterior].cancel():
+                del _exactos[anterior], _lectores[anterior]
+        canal.encolado = _exactos[clave] = _ejecutor.submit(calcular)
+        _lectores[clave] = weakref.WeakSet([canal])
+        while len(_exactos) > MAX_EXACTOS:
+            descartada, _ = _exactos.popitem(last=False)
+            del _lectores[descartada]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        estimador = abrir(sys.argv[1])
+    else:
+        estimador = abrir()
+    print(f"Muestra estratificada de {len(estimador):,} filas en {len(estimador.filas_estrato)} estratos")
@@ -0,0 +1,21 @@
+"""Utilidades de escritura de archivos compartidas por las cachés en disco."""
+import os
+import threading
+from pathlib import Path
+
+# Raíz de las cachés en disco; MIPROYECTO_CACHE permite apartarlas (p. ej. en los benchmarks)
+DIRECTORIO_CACHE = Path(os.environ.get("MIPROYECTO_CACHE") or Path(__file__).resolve().parent.parent / ".cache")
+
+
+def escribir_atomico(ruta, escribir):
+    """Llama a `escribir(temporal)` y renombra el temporal a `ruta`.
+
+    Así otros procesos nunca ven un archivo a medio escribir.
+    """
+    temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if temporal.exists():
+            temporal.unlink()
@@ -0,0 +1,75 @@
+"""Precarga en segundo plano para el arranque en frío.
+
+Las páginas importan las librerías pesadas (pandas, pyarrow, plotly, requests,
+google-genai...) solo en la ruta de código que las usa, así que la portada se
+pinta sin cargarlas. Después de pintarla, `precargar()` arranca (una vez por
+proceso) un hilo que:
+
+- pone en marcha el refresco de datos (`refresco.iniciar`), que ya necesita
+  pandas y requests,
+- importa `MODULOS`, para que la primera visita a las demás páginas no pague
+  el coste de importarlos.
+
+Cada importación se mide y la precarga completa se anota en el log de trazas
+(tramo "precarga", con los segundos por módulo). Importar en otro hilo es
+seguro: si una página pide un módulo a medias, espera a que termine de
+cargarse. MIPROYECTO_PRECARGA=0 desactiva la precarga (los módulos se
+importan entonces al usarlos por primera vez).
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+MODULOS = (
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "pyarrow.compute",
+    "requests",
+    "plotly.express",
+    "tenacity",
+    "google.genai",
+    "utilidades.busqueda",
+    "utilidades.cubo_ev",
+    "utilidades.despacho",
+    "utilidades.filtros",
+    "utilidades.graficos_ev",
+    "utilidades.paginacion",
+    "utilidades.relacional",
+)
+ACTIVA = os.environ.get("MIPROYECTO_PRECARGA", "1") != "0"
+
+tiempos = {}  # módulo -> segundos que tardó en importarse desde la precarga
+_hilo = None
+_lock = threading.Lock()
+
+
+def precargar():
+    """Arranca el hilo de precarga del proceso (solo la primera vez). Devuelve el hilo, o None si está desactivada."""
+    global _hilo
+    if not ACTIVA:
+        return None
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_precargar, name="precarga", daemon=True)
+            _hilo.start()
+    return _hilo
+
+
+def _precargar():
+    from utilidades import refresco, trazas
+
+    inicio = time.perf_counter()
+    refresco.iniciar()
+    for nombre in MODULOS:
+        if nombre in sys.modules:
+            continue
+        antes = time.perf_counter()
+        try:
+            importlib.import_module(nombre)
+        except ImportError:
+            continue  # Dependencia opcional no instalada: la página que la use mostrará el error
+        tiempos[nombre] = time.perf_counter() - antes
+    trazas.anotar("precarga", time.perf_counter() - inicio, modulos=tiempos)
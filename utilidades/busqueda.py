@@ -0,0 +1,315 @@
+"""Índice de búsqueda de personas por nombre, apellido o correo.
+
+Se construye una vez por carga de datos y responde cada consulta sin recorrer
+la tabla:
+
+- El texto de las columnas indexadas se normaliza sin tildes ni mayúsculas
+  ("Peña" -> "pena") y se parte en palabras (en los correos, también por
+  puntos y arrobas). Todo con `pyarrow.compute`, sin bucles de Python por fila.
+- Las palabras distintas forman un vocabulario ordenado y, por cada palabra,
+  la lista de filas que la contienen (listas de posiciones tipo CSR, como en
+  `filtros`). Como el vocabulario está ordenado, las palabras que empiezan por
+  un prefijo son un rango contiguo y sus filas, un único corte.
+- Un índice de trigramas sobre el vocabulario encuentra las palabras que
+  contienen el término en medio ("ald" -> "osvaldo", "baldomero").
+
+Cada término de la consulta puntúa por fila según cómo coincide (palabra
+exacta > prefijo > trigramas); una fila tiene que coincidir con todos los
+términos y se devuelven las `limite` de más puntuación.
+
+Al refrescar los datos (`actualizar`) solo se indexan las filas nuevas o
+modificadas, detectadas por el hash de las columnas indexadas, en un segmento
+aparte; cuando hay demasiados segmentos o cambia gran parte de la tabla se
+reconstruye entero. Los segmentos no se modifican nunca, así que el índice
+anterior sigue siendo válido para las sesiones que aún lo estén usando.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+LIMITE = 50  # Resultados por consulta
+MIN_CARACTERES = 2  # Una consulta más corta casaría con casi toda la tabla
+N_GRAMA = 3
+MAX_SEGMENTOS = 4  # Segmentos incrementales antes de reconstruir el índice
+FRACCION_RECONSTRUIR = 0.25  # Si cambia más de esta fracción de filas se reconstruye
+PESO_EXACTO, PESO_PREFIJO, PESO_INFIJO = 3, 2, 1
+
+_SEPARADORES = re.compile(r"[\W_]+")
+_FIN = "\U0010ffff"  # Mayor que cualquier carácter: cierra el rango de un prefijo
+
+_indices = {}  # nombre -> último IndiceBusqueda construido (para actualizarlo al refrescar)
+_indices_lock = threading.Lock()
+
+
+class Resultado(NamedTuple):
+    filas: np.ndarray  # Posiciones en la tabla, de más a menos relevante
+    puntuaciones: np.ndarray
+    total: int  # Filas que coinciden antes de cortar en `limite`
+
+
+def terminos(consulta):
+    """Palabras normalizadas (sin tildes, en minúsculas) de una consulta."""
+    texto = unicodedata.normalize("NFKD", consulta or "")
+    texto = "".join(caracter for caracter in texto if unicodedata.category(caracter) != "Mn").lower()
+    return [termino for termino in _SEPARADORES.split(texto) if termino]
+
+
+def _normalizar(vocabulario):
+    # (piezas, origen): palabras sin tildes ni mayúsculas de cada entrada, partidas por
+    # signos (correos, guiones, puntos...), y la entrada de la que sale cada una
+    import pyarrow.compute as pc
+
+    texto = pc.utf8_lower(vocabulario)
+    texto = pc.replace_substring_regex(pc.utf8_normalize(texto, "NFKD"), r"\p{Mn}+", "")
+    partes = pc.split_pattern_regex(texto, r"[^\p{L}\p{N}]+")
+    piezas = pc.list_flatten(partes)
+    no_vacias = pc.greater(pc.utf8_length(piezas), 0)
+    return piezas.filter(no_vacias), pc.list_parent_indices(partes).filter(no_vacias).to_numpy()
+
+
+def _palabras(df, columnas):
+    # (palabras, filas): una entrada por cada palabra de cada celda indexada. Se normalizan
+    # las palabras distintas, no las celdas: suele haber muchas menos
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    palabras, filas = [], []
+    for col in columnas:
+        texto = pa.array(df[col].astype(pd.StringDtype("pyarrow")))
+        if isinstance(texto, pa.ChunkedArray):
+            texto = texto.combine_chunks()  # Columnas de las vistas compartidas con varios lotes
+        listas = pc.utf8_split_whitespace(texto)
+        crudas = pc.list_flatten(listas).dictionary_encode()
+        piezas, origen = _normalizar(crudas.dictionary)
+        limites = np.concatenate(([0], np.cumsum(np.bincount(origen, minlength=len(crudas.dictionary)))))
+        codigos = crudas.indices.to_numpy()
+        palabras.append(piezas.take(_expandir(limites, codigos)))
+        filas.append(np.repeat(pc.list_parent_indices(listas).to_numpy(), limites[codigos + 1] - limites[codigos]))
+    if not palabras:
+        return pa.array([], type=pa.string()), np.empty(0, dtype=np.int64)
+    return pa.concat_arrays(palabras), np.concatenate(filas).astype(np.int64)
+
+
+def _huellas(df, columnas):
+    # Un hash por fila de las columnas indexadas, para saber qué filas cambian al refrescar
+    if not columnas:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+
+
+def _expandir(limites, ids):
+    # Posiciones de todas las listas `ids` de un CSR, concatenadas, sin bucles de Python
+    inicios = limites[ids]
+    largos = limites[ids + 1] - inicios
+    total = int(largos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    desplazamiento = np.repeat(inicios - np.concatenate(([0], np.cumsum(largos)[:-1])), largos)
+    return desplazamiento + np.arange(total)
+
+
+def _csr(codigos, n):
+    # (orden, límites): las entradas de cada código, en su orden original
+    # Con vocabularios pequeños los códigos caben en 16 bits y NumPy los ordena por radix
+    orden = np.argsort(codigos.astype(np.min_scalar_type(max(n - 1, 0)), copy=False), kind="stable")
+    limites = np.concatenate(([0], np.cumsum(np.bincount(codigos, minlength=n))))
+    return orden, limites
+
+
+class _Segmento:
+    """Vocabulario, listas de filas y trigramas de un conjunto de filas. Inmutable."""
+
+    def __init__(self, palabras, filas):
+        import pyarrow.compute as pc
+
+        codificadas = palabras.dictionary_encode()
+        vocabulario = codificadas.dictionary
+        orden_vocabulario = pc.array_sort_indices(vocabulario).to_numpy()  # Orden de bytes UTF-8 = orden de str
+        rango = np.empty(len(vocabulario), dtype=np.int64)
+        rango[orden_vocabulario] = np.arange(len(vocabulario))
+        vocabulario = vocabulario.take(orden_vocabulario)
+        codigos = rango[codificadas.indices.to_numpy()]
+        orden, self.limites = _csr(codigos, len(vocabulario))
+        self.filas = filas[orden]
+        self.vocabulario = vocabulario.to_pylist()
+        self._indexar_trigramas(vocabulario)
+
+    def _indexar_trigramas(self, vocabulario):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        longitudes = pc.utf8_length(vocabulario).to_numpy()
+        gramas, palabras = [], []
+        for inicio in range(int(longitudes.max(initial=0)) - N_GRAMA + 1):
+            ids = np.flatnonzero(longitudes >= inicio + N_GRAMA)
+            gramas.append(pc.utf8_slice_codeunits(vocabulario.take(ids), inicio, inicio + N_GRAMA))
+            palabras.append(ids)
+        if not gramas:
+            self.gramas, self.palabras_grama, self.limites_grama = {}, np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)
+            return
+        codificados = pa.concat_arrays(gramas).dictionary_encode()
+        # Pares (trigrama, palabra) sin repetir, ordenados: cada lista queda ordenada y sin duplicados
+        pares = np.unique(codificados.indices.to_numpy().astype(np.int64) * len(vocabulario) + np.concatenate(palabras))
+        self.palabras_grama = pares % len(vocabulario)
+        self.limites_grama = np.concatenate(
+            ([0], np.cumsum(np.bincount(pares // len(vocabulario), minlength=len(codificados.dictionary))))
+        )
+        self.gramas = {grama: codigo for codigo, grama in enumerate(codificados.dictionary.to_pylist())}
+
+    def _infijos(self, termino):
+        # Palabras que contienen `termino`: intersección de las listas de sus trigramas
+        codigos = [self.gramas.get(termino[inicio:inicio + N_GRAMA]) for inicio in range(len(termino) - N_GRAMA + 1)]
+        if None in codigos:
+            return np.empty(0, dtype=np.int64)
+        candidatas = None
+        # Empezando por el trigrama menos frecuente, las intersecciones son más pequeñas
+        for codigo in sorted(set(codigos), key=lambda codigo: self.limites_grama[codigo + 1] - self.limites_grama[codigo]):
+            palabras = self.palabras_grama[self.limites_grama[codigo]:self.limites_grama[codigo + 1]]
+            candidatas = palabras if candidatas is None else np.intersect1d(candidatas, palabras, assume_unique=True)
+            if len(candidatas) == 0:
+                return candidatas
+        if len(termino) > N_GRAMA:
+            # Tener todos los trigramas no garantiza tenerlos seguidos
+            candidatas = np.array([i for i in candidatas if termino in self.vocabulario[i]], dtype=np.int64)
+        return candidatas
+
+    def coincidencias(self, termino):
+        """(filas, pesos) de las filas con alguna palabra que coincide con `termino`."""
+        desde = bisect.bisect_left(self.vocabulario, termino)
+        hasta = bisect.bisect_left(self.vocabulario, termino + _FIN, lo=desde)
+        filas, pesos = [], []
+        if desde < hasta and self.vocabulario[desde] == termino:
+            exactas = self.filas[self.limites[desde]:self.limites[desde + 1]]
+            filas.append(exactas)
+            pesos.append(np.full(len(exactas), PESO_EXACTO))
+        if desde < hasta:
+            prefijos = self.filas[self.limites[desde]:self.limites[hasta]]
+            filas.append(prefijos)
+            pesos.append(np.full(len(prefijos), PESO_PREFIJO))
+        if len(termino) >= N_GRAMA:
+            ids = self._infijos(termino)
+            ids = ids[(ids < desde) | (ids >= hasta)]  # Los prefijos ya están contados
+            infijas = self.filas[_expandir(self.limites, ids)]
+            filas.append(infijas)
+            pesos.append(np.full(len(infijas), PESO_INFIJO))
+        if not filas:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(filas), np.concatenate(pesos)
+
+
+def _mejor_por_fila(filas, pesos):
+    # Filas sin repetir (ordenadas), cada una con su mejor peso
+    orden = np.lexsort((-pesos, filas))
+    filas, pesos = filas[orden], pesos[orden]
+    primeras = np.concatenate(([True], filas[1:] != filas[:-1])) if len(filas) else np.empty(0, dtype=bool)
+    return filas[primeras], pesos[primeras]
+
+
+class IndiceBusqueda:
+    """Índice de búsqueda de una tabla, construido una vez por carga."""
+
+    def __init__(self, df, columnas):
+        self.df = df
+        self.columnas = [col for col in columnas if col in df.columns]
+        self._huellas = None  # Se calculan al actualizar por primera vez
+        self._segmentos = [_Segmento(*_palabras(df, self.columnas))]
+        self._dueno = np.zeros(len(df), dtype=np.int8)  # Segmento vigente de cada fila
+
+    def actualizar(self, df):
+        """Índice de una versión nueva de la tabla, reindexando solo las filas nuevas o modificadas."""
+        if [col for col in self.columnas if col in df.columns] != self.columnas:
+            return IndiceBusqueda(df, self.columnas)
+        if self._huellas is None:
+            self._huellas = _huellas(self.df, self.columnas)
+        huellas = _huellas(df, self.columnas)
+        comunes = min(len(huellas), len(self._huellas))
+        cambiadas = np.concatenate(
+            (np.flatnonzero(huellas[:comunes] != self._huellas[:comunes]), np.arange(comunes, len(huellas)))
+        )
+        if len(cambiadas) > FRACCION_RECONSTRUIR * len(df) or (
+            len(cambiadas) and len(self._segmentos) >= MAX_SEGMENTOS
+        ):
+            return IndiceBusqueda(df, self.columnas)
+        nuevo = object.__new__(IndiceBusqueda)
+        nuevo.df = df
+        nuevo.columnas = self.columnas
+        nuevo._huellas = huellas
+        nuevo._segmentos = list(self._segmentos)
+        nuevo._dueno = np.zeros(len(df), dtype=np.int8)
+        nuevo._dueno[:comunes] = self._dueno[:comunes]
+        if len(cambiadas):
+            palabras, filas = _palabras(df.take(cambiadas), self.columnas)
+            nuevo._segmentos.append(_Segmento(palabras, cambiadas[filas]))
+            nuevo._dueno[cambiadas] = len(nuevo._segmentos) - 1
+        return nuevo
+
+    @property
+    def segmentos(self):
+        return len(self._segmentos)
+
+    def _coincidencias(self, termino):
+        # Se descartan las filas que un segmento posterior ya reindexó (o que ya no existen)
+        filas, pesos = [], []
+        for numero, segmento in enumerate(self._segmentos):
+            filas_segmento, pesos_segmento = segmento.coincidencias(termino)
+            if len(self._segmentos) > 1:
+                vigentes = filas_segmento < len(self._dueno)
+                vigentes[vigentes] = self._dueno[filas_segmento[vigentes]] == numero
+                filas_segmento, pesos_segmento = filas_segmento[vigentes], pesos_segmento[vigentes]
+            filas.append(filas_segmento)
+            pesos.append(pesos_segmento)
+        return _mejor_por_fila(np.concatenate(filas), np.concatenate(pesos))
+
+    def buscar(self, consulta, limite=LIMITE, dentro=None):
+        """Las `limite` filas más relevantes para `consulta`, o None si es demasiado corta.
+
+        `dentro` restringe la búsqueda a esas posiciones (p. ej. las que cumplen
+        los filtros de la tabla).
+        """
+        palabras = terminos(consulta)
+        if sum(len(palabra) for palabra in palabras) < MIN_CARACTERES:
+            return None
+        filas, puntuaciones = None, None
+        for palabra in dict.fromkeys(palabras):
+            filas_palabra, pesos = self._coincidencias(palabra)
+            if filas is None:
+                filas, puntuaciones = filas_palabra, pesos
+            else:
+                filas, en_filas, en_palabra = np.intersect1d(filas, filas_palabra, assume_unique=True, return_indices=True)
+                puntuaciones = puntuaciones[en_filas] + pesos[en_palabra]
+            if len(filas) == 0:
+                break
+        if dentro is not None and len(filas):
+            permitidas = np.zeros(len(self.df), dtype=bool)
+            permitidas[dentro] = True
+            seleccion = permitidas[filas]
+            filas, puntuaciones = filas[seleccion], puntuaciones[seleccion]
+        total = len(filas)
+        # Más puntuación primero y, a igual puntuación, el orden de la tabla
+        claves = -puntuaciones.astype(np.int64) * (len(self.df) + 1) + filas
+        if total > limite:
+            mejores = np.argpartition(claves, limite - 1)[:limite]
+        else:
+            mejores = np.arange(total)
+        mejores = mejores[np.argsort(claves[mejores], kind="stable")]
+        return Resultado(filas[mejores], puntuaciones[mejores], total)
+
+
+def indice(nombre, df, columnas):
+    """Índice de búsqueda de `df`. Si ya se indexó otra versión de `nombre`, la actualiza."""
+    with _indices_lock:
+        anterior = _indices.get(nombre)
+    if anterior is not None and anterior.df is df:
+        return anterior
+    if anterior is None or anterior.columnas != [col for col in columnas if col in df.columns]:
+        nuevo = IndiceBusqueda(df, columnas)
+    else:
+        nuevo = anterior.actualizar(df)
+    with _indices_lock:
+        _indices[nombre] = nuevo
+    return nuevo
@@ -0,0 +1,240 @@
+"""Respuestas de Moto-Chat con Gemini.
+
+- Un único `genai.Client` por proceso, creado la primera vez que se usa: las
+  sesiones comparten su pool de conexiones HTTP en lugar de abrir uno por clic.
+- Las respuestas se guardan por pregunta normalizada (sin tildes, mayúsculas
+  ni signos: "¿Diferencia entre naked y sport?" y "diferencia entre NAKED y
+  sport" son la misma) en memoria, con expulsión LRU, y en disco, un JSON por
+  pregunta en `.cache/chat/`, compartido entre procesos y reinicios. Ambas
+  caducan a los `TTL` segundos.
+- Las preguntas nuevas pasan por un `despacho.Despachador` compartido por
+  todas las sesiones: preguntas iguales en curso se agrupan en una sola
+  llamada, el ritmo se limita a la cuota (MIPROYECTO_GEMINI_RPM peticiones
+  por minuto), como mucho MIPROYECTO_GEMINI_CONCURRENCIA llamadas a la vez, y
+  los errores de cuota (429), 5xx y de red se reintentan con espera
+  exponencial con jitter.
+- Se piden con la API de streaming y los trozos se entregan según llegan; la
+  respuesta solo se guarda si llega completa.
+
+La clave de la API se lee de `st.secrets["GEMINI_API_KEY"]` o de las variables
+de entorno GEMINI_API_KEY / GOOGLE_API_KEY. MIPROYECTO_GEMINI_URL apunta el
+cliente a otro servidor compatible (p. ej. `benchmarks.gemini_local`), y las
+funciones aceptan también un `cliente` ya construido.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utilidades.archivos import DIRECTORIO_CACHE, escribir_atomico
+
+MODELO = "gemini-2.0-flash"
+# Esto no garantiza al 100% que solo hable de motos, pero ayuda a guiarlo
+INSTRUCCION_SISTEMA = (
+    "Eres un experto en motos. Responde únicamente preguntas sobre motos. "
+    "Si la pregunta no es sobre motos, indica amablemente que solo puedes hablar de ese tema."
+)
+DIRECTORIO = DIRECTORIO_CACHE / "chat"
+TTL = 7 * 24 * 3600  # Segundos que se reutiliza una respuesta
+MAX_EN_MEMORIA = 256  # Respuestas en la LRU de cada proceso
+MAX_EN_DISCO = 2000  # Archivos en disco; se borran los usados hace más tiempo
+# MIPROYECTO_GEMINI_URL permite usar otro servidor (p. ej. el local de los benchmarks)
+URL_BASE = os.environ.get("MIPROYECTO_GEMINI_URL")
+# Cuota del plan gratuito de gemini-2.0-flash: 15 peticiones por minuto
+PETICIONES_POR_MINUTO = int(os.environ.get("MIPROYECTO_GEMINI_RPM") or 15)
+CONCURRENCIA = int(os.environ.get("MIPROYECTO_GEMINI_CONCURRENCIA") or 4)
+INTENTOS = 4  # Intentos por pregunta, contando el primero
+ESPERA_MAXIMA = 20  # Segundos máximos entre reintentos
+
+_cliente = None
+_cliente_lock = threading.Lock()
+_despachador = None
+_despachador_lock = threading.Lock()
+
+_respuestas = OrderedDict()  # clave -> (respuesta, creada en)
+_respuestas_lock = threading.Lock()
+
+
+def clave_api():
+    """Clave de la API de Gemini de los secrets de Streamlit o del entorno, o None."""
+    try:
+        import streamlit as st
+
+        clave = st.secrets.get("GEMINI_API_KEY")
+    except FileNotFoundError:
+        clave = None  # Sin .streamlit/secrets.toml
+    return clave or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+
+
+def obtener_cliente():
+    """Devuelve el cliente de Gemini del proceso, creándolo la primera vez.
+
+    Lanza ValueError si no hay clave de API configurada.
+    """
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            from google import genai
+            from google.genai import types
+
+            clave = clave_api()
+            if not clave:
+                raise ValueError(
+                    "No hay clave de API de Gemini: configura GEMINI_API_KEY en .streamlit/secrets.toml "
+                    "o como variable de entorno."
+                )
+            opciones = types.HttpOptions(base_url=URL_BASE) if URL_BASE else None
+            _cliente = genai.Client(api_key=clave, http_options=opciones)
+        return _cliente
+
+
+def reintentable(error):
+    """True si el error es transitorio: cuota agotada, error del servidor o de red."""
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+
+def obtener_despachador():
+    """Devuelve el despachador de peticiones a Gemini del proceso, creándolo la primera vez."""
+    global _despachador
+    from utilidades import despacho
+
+    with _despachador_lock:
+        if _despachador is None:
+            _despachador = despacho.Despachador(
+                PETICIONES_POR_MINUTO,
+                CONCURRENCIA,
+                intentos=INTENTOS,
+                espera_maxima=ESPERA_MAXIMA,
+                reintentable=reintentable,
+                nombre="gemini",
+            )
+        return _despachador
+
+
+def normalizar(pregunta):
+    """Forma canónica de una pregunta: palabras sin tildes, en minúsculas y sin signos."""
+    from utilidades import busqueda
+
+    return " ".join(busqueda.terminos(pregunta))
+
+
+def clave(pregunta, modelo=MODELO):
+    """Clave de caché de una pregunta (cambia también con el modelo o la instrucción)."""
+    texto = f"{modelo}\n{INSTRUCCION_SISTEMA}\n{normalizar(pregunta)}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _ruta(clave_respuesta, directorio):
+    return directorio / f"{clave_respuesta}.json"
+
+
+def _recordar(clave_respuesta, respuesta, creada):
+    with _respuestas_lock:
+        _respuestas[clave_respuesta] = (respuesta, creada)
+        _respuestas.move_to_end(clave_respuesta)
+        while len(_respuestas) > MAX_EN_MEMORIA:
+            _respuestas.popitem(last=False)
+
+
+def en_cache(pregunta, modelo=MODELO, directorio=DIRECTORIO):
+    """Respuesta guardada (y vigente) para `pregunta`, o None."""
+    clave_respuesta = clave(pregunta, modelo)
+    ahora = time.time()
+    with _respuestas_lock:
+        guardada = _respuestas.get(clave_respuesta)
+        if guardada is not None and ahora - guardada[1] < TTL:
+            _respuestas.move_to_end(clave_respuesta)
+            return guardada[0]
+    ruta = _ruta(clave_respuesta, directorio)
+    try:
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if ahora - datos.get("creada", 0) >= TTL:
+        return None
+    try:
+        os.utime(ruta)  # La fecha de modificación hace de "último uso" para la LRU en disco
+    except OSError:
+        pass
+    _recordar(clave_respuesta, datos["respuesta"], datos["creada"])
+    return datos["respuesta"]
+
+
+def _limpiar(directorio):
+    # Borra las respuestas caducadas y, si sobran, las usadas hace más tiempo
+    ahora = time.time()
+    archivos = []
+    for ruta in directorio.glob("*.json"):
+        try:
+            archivos.append((ruta.stat().st_mtime, ruta))
+        except OSError:
+            continue  # Borrado por otro proceso
+    archivos.sort(reverse=True)
+    for posicion, (usada, ruta) in enumerate(archivos):
+        if posicion >= MAX_EN_DISCO or ahora - usada >= TTL:
+            try:
+                ruta.unlink()
+            except OSError:
+                pass
+
+
+def guardar(pregunta, respuesta, modelo=MODELO, directorio=DIRECTORIO):
+    """Guarda la respuesta de `pregunta` en memoria y en disco."""
+    clave_respuesta = clave(pregunta, modelo)
+    creada = time.time()
+    _recordar(clave_respuesta, respuesta, creada)
+    datos = {"pregunta": normalizar(pregunta), "modelo": modelo, "creada": creada, "respuesta": respuesta}
+    try:
+        directorio.mkdir(parents=True, exist_ok=True)
+        escribir_atomico(
+            _ruta(clave_respuesta, directorio),
+            lambda ruta: ruta.write_text(json.dumps(datos, ensure_ascii=False), encoding="utf-8"),
+        )
+        _limpiar(directorio)
+    except OSError:
+        pass  # Sin disco la respuesta queda solo en memoria
+
+
+def _transmitir(pregunta, cliente, modelo):
+    # Una llamada a la API de streaming; solo se ejecuta desde el despachador
+    from google.genai import types
+
+    for parte in (cliente or obtener_cliente()).models.generate_content_stream(
+        model=modelo,
+        contents=pregunta,
+        config=types.GenerateContentConfig(system_instruction=INSTRUCCION_SISTEMA),
+    ):
+        if parte.text:
+            yield parte.text
+
+
+def pedir(pregunta, cliente=None, modelo=MODELO, directorio=DIRECTORIO):
+    """(vuelo, agrupada): la petición de `pregunta` en el despachador compartido.
+
+    Si otra sesión ya está preguntando lo mismo, se devuelve su vuelo
+    (`agrupada` es True). Al terminar, la respuesta completa se guarda en caché.
+    """
+    def al_terminar(trozos):
+        respuesta = "".join(trozos)
+        if respuesta:
+            guardar(pregunta, respuesta, modelo, directorio)
+
+    return obtener_despachador().pedir(
+        clave(pregunta, modelo), lambda: _transmitir(pregunta, cliente, modelo), al_terminar
+    )
+
+
+def generar(pregunta, cliente=None, modelo=MODELO, directorio=DIRECTORIO):
+    """Trozos de texto de la respuesta a `pregunta`, según los va enviando Gemini.
+
+    Los errores (una vez agotados los reintentos) se propagan sin guardar nada.
+    """
+    vuelo, _ = pedir(pregunta, cliente, modelo, directorio)
+    yield from vuelo.leer()
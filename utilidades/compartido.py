@@ -0,0 +1,104 @@
+"""Datasets de solo lectura compartidos entre sesiones y procesos.
+
+`st.cache_data` serializa el resultado y entrega a cada rerun de cada sesión
+una copia nueva. Para las tablas grandes se usa en su lugar un único objeto
+por proceso, construido sobre memoria compartida:
+
+- cada tabla se publica una vez como archivo Arrow IPC sin comprimir en
+  `.cache/compartido/`, con un nombre que depende de su versión, así que los
+  procesos del servidor que sirven la misma versión abren el mismo archivo,
+- el archivo se abre con memory mapping: las páginas viven en la caché del
+  sistema operativo y se comparten entre procesos,
+- `vista` convierte la tabla a DataFrame sin copiar lo que no hace falta:
+  enteros, decimales y fechas sin vacíos quedan como arrays de NumPy de solo
+  lectura apuntando al archivo, y el texto como `string[pyarrow]` sobre los
+  mismos buffers. Solo los códigos de las categorías se copian (son pequeños).
+
+Las vistas se comparten entre sesiones: las páginas nunca las modifican en el
+sitio (filtrar, ordenar y paginar ya devuelven objetos nuevos), y los arrays
+que apuntan al archivo rechazan cualquier escritura.
+
+Quien guarda las vistas en el proceso es `refresco`, sin Streamlit: las de las
+tablas de la API van en la carga que publica el hilo de refresco (solo se
+conserva la vigente) y la del registro de carros en `refresco.por_version`
+(`derivados_ev.datos`), que conserva las `MAX_VERSIONES` más recientes y
+descarta las anteriores. Una vista descartada sigue siendo válida para las
+sesiones que aún la tengan: el mapeo dura lo que el objeto. De los archivos de
+`publicar` se dejan además `VERSIONES_GUARDADAS` anteriores por si otro
+proceso aún los usa.
+"""
+import hashlib
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from utilidades.archivos import DIRECTORIO_CACHE, escribir_atomico
+
+DIRECTORIO = DIRECTORIO_CACHE / "compartido"
+VERSIONES_GUARDADAS = 2  # Versiones anteriores que se dejan por si otro proceso aún las usa
+
+_lock = threading.Lock()
+
+
+def abrir(ruta):
+    """La tabla Arrow del archivo IPC `ruta`, respaldada por memory mapping."""
+    import pyarrow.feather as feather
+
+    return feather.read_table(ruta, memory_map=True)
+
+
+def vista(tabla):
+    """DataFrame de solo lectura sobre `tabla`, sin copiar números, fechas ni texto."""
+    import pyarrow as pa
+
+    tipos = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+    return tabla.to_pandas(split_blocks=True, types_mapper=tipos.get)
+
+
+def _ruta(nombre, version, directorio):
+    huella = hashlib.sha1(repr(version).encode("utf-8")).hexdigest()[:16]
+    return Path(directorio) / f"{nombre}-{huella}.arrow"
+
+
+def _limpiar(nombre, actual, directorio):
+    # En Linux y macOS un archivo borrado sigue accesible para quien ya lo tiene mapeado
+    anteriores = sorted(
+        (ruta for ruta in Path(directorio).glob(f"{nombre}-*.arrow") if ruta != actual),
+        key=lambda ruta: ruta.stat().st_mtime,
+        reverse=True,
+    )
+    for ruta in anteriores[VERSIONES_GUARDADAS:]:
+        try:
+            ruta.unlink()
+        except OSError:
+            pass  # En uso (Windows) o ya borrado por otro proceso
+
+
+def publicar(nombre, df, version, directorio=DIRECTORIO):
+    """Escribe `df` como archivo compartido de (`nombre`, `version`) si no existe. Devuelve la ruta."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    ruta = _ruta(nombre, version, directorio)
+    with _lock:
+        if not ruta.exists():
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            # Sin compresión para que las vistas puedan apuntar directamente al archivo
+            escribir_atomico(ruta, lambda temporal: feather.write_feather(tabla, temporal, compression="uncompressed"))
+            _limpiar(nombre, ruta, directorio)
+    return ruta
+
+
+def compartir(nombre, df, version, directorio=DIRECTORIO):
+    """Vista compartida de `df`: la publica (si hace falta) y la reabre desde el archivo.
+
+    `version` identifica el contenido (p. ej. filas y fecha del snapshot): dos
+    procesos con la misma versión comparten el archivo. Conserva `df.attrs`.
+    """
+    if df.empty:
+        return df
+    compartida = vista(abrir(publicar(nombre, df, version, directorio)))
+    compartida.attrs = dict(df.attrs)
+    return compartida
@@ -0,0 +1,218 @@
+"""Cubo de agregados del registro de carros eléctricos.
+
+Se construye una vez al cargar el dataset. Cada celda es una combinación no
+vacía de (lugar, marca, año del modelo, tipo de carga, baterías recicladas,
+mes de registro, tramo de edad, tramo de autonomía) y guarda el número de
+registros y la suma y suma de cuadrados de `edad` y `autonomia_km`. Todas las
+métricas y gráficas del tablero salen de sumar las celdas que cumplen los
+filtros, así que el coste depende del número de celdas y no de filas.
+
+Los filtros de edad y autonomía son rangos sobre tramos. Las celdas cuyo tramo
+queda completamente dentro del rango se suman tal cual; solo las filas de las
+celdas cuyo tramo corta el rango se revisan una a una (las filas se guardan
+ordenadas por celda para poder localizarlas sin recorrer la tabla).
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONES = ["lugar_registro", "marca_auto", "año_modelo", "tipo_carga", "baterias_recicladas"]
+ANCHO_EDAD = 1  # Edad entera: con tramos de un año el histograma es exacto y el rango nunca corta un tramo
+ANCHO_AUTONOMIA = 10  # km
+
+
+class ResultadoCubo(NamedTuple):
+    registros: int
+    suma_edad: float
+    suma_cuadrados_edad: float
+    suma_autonomia: float
+    suma_cuadrados_autonomia: float
+    por_marca: pd.DataFrame  # marca_auto, registros, autonomia_promedio
+    por_edad: pd.DataFrame  # edad (inicio del tramo), registros
+    por_mes: pd.DataFrame  # year_month, count
+    celdas: np.ndarray  # Celdas completamente dentro de los filtros
+    filas_parciales: np.ndarray  # Filas (posición) de celdas cortadas que cumplen los filtros
+
+    @property
+    def edad_promedio(self):
+        return self.suma_edad / self.registros if self.registros else float("nan")
+
+    @property
+    def autonomia_promedio(self):
+        return self.suma_autonomia / self.registros if self.registros else float("nan")
+
+    @property
+    def marca_mas_comun(self):
+        """Como `Series.mode()[0]`: la más frecuente y, si empatan, la menor. None si no hay filas."""
+        if self.por_marca.empty:
+            return None
+        maximo = self.por_marca["registros"].max()
+        return min(self.por_marca.loc[self.por_marca["registros"] == maximo, "marca_auto"])
+
+
+class CuboRegistros:
+    """Cubo de agregados sobre el DataFrame del registro."""
+
+    def __init__(self, df, ancho_edad=ANCHO_EDAD, ancho_autonomia=ANCHO_AUTONOMIA):
+        self.df = df
+        self.ancho_edad = ancho_edad
+        self.ancho_autonomia = ancho_autonomia
+        self.valores = {}  # dimensión -> valores distintos ordenados
+        codigos = {}
+        for col in DIMENSIONES:
+            codigos[col], valores = pd.factorize(df[col], sort=True)
+            self.valores[col] = list(valores)
+        # Mes: el código 0 se reserva para fechas vacías, que cuentan en los totales pero no en la línea
+        codigos_mes, meses = pd.factorize(df["fecha_registro"].dt.to_period("M"), sort=True)
+        codigos["mes"] = codigos_mes + 1
+        self.valores["mes"] = [None] + [str(mes) for mes in meses]
+
+        edad = df["edad"].to_numpy(dtype=float)
+        autonomia = df["autonomia_km"].to_numpy(dtype=float)
+        validas = np.isfinite(edad) & np.isfinite(autonomia)
+        for col in DIMENSIONES:
+            validas &= codigos[col] >= 0
+        # Filas con vacíos en un filtro nunca pasan isin/between, así que no entran al cubo
+        self.filas_validas = np.flatnonzero(validas)
+        self.edad_minima = float(np.nanmin(edad[validas])) if validas.any() else 0.0
+        self.autonomia_minima = float(np.nanmin(autonomia[validas])) if validas.any() else 0.0
+        codigos["edad"] = ((edad - self.edad_minima) // ancho_edad).astype(np.int64)
+        codigos["autonomia"] = ((autonomia - self.autonomia_minima) // ancho_autonomia).astype(np.int64)
+        self.extremos = {
+            "año_modelo": (min(self.valores["año_modelo"]), max(self.valores["año_modelo"])) if self.valores["año_modelo"] else (0, 0),
+            "edad": (self.edad_minima, float(np.nanmax(edad[validas])) if validas.any() else 0.0),
+            "autonomia_km": (self.autonomia_minima, float(np.nanmax(autonomia[validas])) if validas.any() else 0.0),
+        }
+
+        # Id de celda en base mixta sobre todas las dimensiones
+        self._ejes = DIMENSIONES + ["mes", "edad", "autonomia"]
+        self._tamanos = [max(int(codigos[eje][validas].max()) + 1, 1) if validas.any() else 1 for eje in self._ejes]
+        id_celda = np.zeros(len(self.filas_validas), dtype=np.int64)
+        for eje, tamano in zip(self._ejes, self._tamanos):
+            id_celda = id_celda * tamano + codigos[eje][self.filas_validas]
+        ids, inversa = np.unique(id_celda, return_inverse=True)
+        self.celda = {}
+        resto = ids
+        for eje, tamano in reversed(list(zip(self._ejes, self._tamanos))):
+            resto, self.celda[eje] = np.divmod(resto, tamano)
+
+        self.registros = np.bincount(inversa, minlength=len(ids))
+        edad_validas = edad[self.filas_validas]
+        autonomia_validas = autonomia[self.filas_validas]
+        self.suma_edad = np.bincount(inversa, weights=edad_validas, minlength=len(ids))
+        self.suma_cuadrados_edad = np.bincount(inversa, weights=edad_validas ** 2, minlength=len(ids))
+        self.suma_autonomia = np.bincount(inversa, weights=autonomia_validas, minlength=len(ids))
+        self.suma_cuadrados_autonomia = np.bincount(inversa, weights=autonomia_validas ** 2, minlength=len(ids))
+
+        # Filas ordenadas por celda: las de la celda k son filas_por_celda[inicio[k]:inicio[k + 1]]
+        self.filas_por_celda = self.filas_validas[np.argsort(inversa, kind="stable")]
+        self.inicio = np.concatenate(([0], np.cumsum(self.registros)))
+        self._codigos_filas = codigos  # Para revisar filas de celdas cortadas
+        self._edad = edad
+        self._autonomia = autonomia
+
+    def __len__(self):
+        return len(self.registros)
+
+    def _codigos(self, col, seleccion):
+        posiciones = {valor: codigo for codigo, valor in enumerate(self.valores[col])}
+        return [posiciones[valor] for valor in seleccion if valor in posiciones]
+
+    def _filas_de(self, celdas):
+        # Concatena las filas de varias celdas sin bucles de Python
+        longitudes = self.registros[celdas]
+        if longitudes.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        desplazamiento = np.repeat(self.inicio[celdas] - np.concatenate(([0], np.cumsum(longitudes)[:-1])), longitudes)
+        return self.filas_por_celda[desplazamiento + np.arange(longitudes.sum())]
+
+    def consultar(self, lugares, marcas, años, edades, autonomias, tipos_carga, baterias):
+        """Agregados de las filas que cumplen los filtros del tablero."""
+        celda = self.celda
+        mascara = (
+            np.isin(celda["lugar_registro"], self._codigos("lugar_registro", lugares))
+            & np.isin(celda["marca_auto"], self._codigos("marca_auto", marcas))
+            & np.isin(celda["tipo_carga"], self._codigos("tipo_carga", tipos_carga))
+            & np.isin(celda["baterias_recicladas"], self._codigos("baterias_recicladas", baterias))
+        )
+        valores_año = np.asarray(self.valores["año_modelo"])
+        if len(valores_año):
+            año_celda = valores_año[celda["año_modelo"]]
+            mascara &= (año_celda >= años[0]) & (año_celda <= años[1])
+
+        # Tramos de edad y autonomía: completos (dentro del rango) o cortados por él
+        completas = mascara.copy()
+        tocadas = mascara.copy()
+        for eje, minimo, ancho, (desde, hasta) in (
+            ("edad", self.edad_minima, self.ancho_edad, edades),
+            ("autonomia", self.autonomia_minima, self.ancho_autonomia, autonomias),
+        ):
+            tramo_desde = minimo + celda[eje] * ancho
+            tramo_hasta = tramo_desde + ancho  # Exclusivo
+            completas &= (tramo_desde >= desde) & (tramo_hasta <= hasta + 1)
+            tocadas &= (tramo_hasta > desde) & (tramo_desde <= hasta)
+        cortadas = tocadas & ~completas
+
+        celdas = np.flatnonzero(completas)
+        filas_parciales = self._filas_de(np.flatnonzero(cortadas))
+        if len(filas_parciales):
+            edad_filas = self._edad[filas_parciales]
+            autonomia_filas = self._autonomia[filas_parciales]
+            filas_parciales = filas_parciales[
+                (edad_filas >= edades[0]) & (edad_filas <= edades[1])
+                & (autonomia_filas >= autonomias[0]) & (autonomia_filas <= autonomias[1])
+            ]
+        return self._agregar(celdas, np.sort(filas_parciales))
+
+    def _agregar(self, celdas, filas):
+        edad_filas = self._edad[filas]
+        autonomia_filas = self._autonomia[filas]
+        registros = int(self.registros[celdas].sum()) + len(filas)
+
+        n_marcas = len(self.valores["marca_auto"])
+        marca_celdas = self.celda["marca_auto"][celdas]
+        marca_filas = self._codigos_filas["marca_auto"][filas]
+        conteo_marca = np.bincount(marca_celdas, self.registros[celdas], n_marcas) + np.bincount(marca_filas, None, n_marcas)
+        suma_marca = np.bincount(marca_celdas, self.suma_autonomia[celdas], n_marcas) + np.bincount(marca_filas, autonomia_filas, n_marcas)
+        hay = conteo_marca > 0
+        por_marca = pd.DataFrame({
+            "marca_auto": np.asarray(self.valores["marca_auto"], dtype=object)[hay],
+            "registros": conteo_marca[hay].astype(np.int64),
+            "autonomia_promedio": suma_marca[hay] / conteo_marca[hay],
+        })
+
+        n_edades = self._tamanos[self._ejes.index("edad")]
+        tramo_filas = ((edad_filas - self.edad_minima) // self.ancho_edad).astype(np.int64)
+        conteo_edad = np.bincount(self.celda["edad"][celdas], self.registros[celdas], n_edades) + np.bincount(tramo_filas, None, n_edades)
+        hay = conteo_edad > 0
+        por_edad = pd.DataFrame({
+            "edad": self.edad_minima + np.flatnonzero(hay) * self.ancho_edad,
+            "registros": conteo_edad[hay].astype(np.int64),
+        })
+
+        n_meses = len(self.valores["mes"])
+        conteo_mes = np.bincount(self.celda["mes"][celdas], self.registros[celdas], n_meses) + np.bincount(self._codigos_filas["mes"][filas], None, n_meses)
+        conteo_mes[0] = 0  # Fechas vacías: no aparecen en la línea de tiempo
+        hay = conteo_mes > 0
+        por_mes = pd.DataFrame({
+            "year_month": np.asarray(self.valores["mes"], dtype=object)[hay],
+            "count": conteo_mes[hay].astype(np.int64),
+        })
+
+        return ResultadoCubo(
+            registros=registros,
+            suma_edad=float(self.suma_edad[celdas].sum() + edad_filas.sum()),
+            suma_cuadrados_edad=float(self.suma_cuadrados_edad[celdas].sum() + (edad_filas ** 2).sum()),
+            suma_autonomia=float(self.suma_autonomia[celdas].sum() + autonomia_filas.sum()),
+            suma_cuadrados_autonomia=float(self.suma_cuadrados_autonomia[celdas].sum() + (autonomia_filas ** 2).sum()),
+            por_marca=por_marca,
+            por_edad=por_edad,
+            por_mes=por_mes,
+            celdas=celdas,
+            filas_parciales=filas,
+        )
+
+    def filas(self, resultado):
+        """Posiciones (en orden original) de todas las filas que cumplen los filtros."""
+        return np.sort(np.concatenate((self._filas_de(resultado.celdas), resultado.filas_parciales)))
@@ -0,0 +1,143 @@
+"""Caché columnar del registro de carros eléctricos.
+
+El CSV original se convierte una vez a un archivo Arrow IPC (Feather v2) sin
+comprimir, con las fechas ya tipadas y el texto repetido codificado como
+diccionario (categorías). El archivo se lee con memory mapping, así que la
+carga no vuelve a parsear texto y los procesos que lo abren comparten la
+caché de páginas del sistema operativo.
+
+El archivo se reconstruye solo cuando cambia el CSV: primero se compara
+tamaño y fecha de modificación y, si difieren, el hash del contenido.
+
+Para reconstruirlo a mano::
+
+    python -m utilidades.dataset_ev
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from utilidades import compartido
+from utilidades.archivos import DIRECTORIO_CACHE, escribir_atomico
+
+RAIZ = Path(__file__).resolve().parent.parent
+# MIPROYECTO_CSV_EV permite apuntar el tablero a otro registro (p. ej. los generados para benchmarks)
+RUTA_CSV = Path(os.environ.get("MIPROYECTO_CSV_EV") or RAIZ / "static" / "datasets" / "registros_carros_electricos.csv")
+DIRECTORIO = DIRECTORIO_CACHE / "datasets"
+
+COLUMNAS_CATEGORIA = [
+    "lugar_registro",
+    "marca_auto",
+    "modelo_auto",
+    "tipo_carga",
+    "version_software",
+    "baterias_recicladas",
+]
+COLUMNAS_ENTERAS = {"edad": "int16", "año_modelo": "int16", "autonomia_km": "int32"}
+COLUMNAS_FECHA = ["fecha_registro"]
+
+FORMATO = 2  # Se incrementa al cambiar cómo se construye el archivo, para forzar su reconstrucción
+
+_lock = threading.Lock()
+
+
+def _rutas(ruta_csv, directorio):
+    nombre = Path(ruta_csv).stem
+    return Path(directorio) / f"{nombre}.arrow", Path(directorio) / f"{nombre}.json"
+
+
+def version(ruta_csv=RUTA_CSV):
+    """Huella barata del CSV (tamaño y mtime) para usarla como clave de caché."""
+    estado = Path(ruta_csv).stat()
+    return estado.st_size, estado.st_mtime_ns
+
+
+def hash_csv(ruta_csv):
+    """SHA-256 del CSV, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta_csv, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def construir(ruta_csv=RUTA_CSV, directorio=DIRECTORIO):
+    """Convierte el CSV al archivo columnar y guarda su huella. Devuelve la ruta."""
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.feather as feather
+
+    ruta_arrow, ruta_meta = _rutas(ruta_csv, directorio)
+    tipos = {col: getattr(pa, tipo)() for col, tipo in COLUMNAS_ENTERAS.items()}
+    tipos.update({col: pa.timestamp("ns") for col in COLUMNAS_FECHA})
+    tipos.update({col: pa.dictionary(pa.int32(), pa.string()) for col in COLUMNAS_CATEGORIA})
+    df = pv.read_csv(ruta_csv, convert_options=pv.ConvertOptions(column_types=tipos)).to_pandas()
+    # Categorías en orden alfabético (el lector las deja en orden de aparición), para que
+    # ordenar, agrupar y desempatar se comporte igual que con el texto original
+    for col in COLUMNAS_CATEGORIA:
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    tamano, mtime_ns = version(ruta_csv)
+    metadatos = {
+        "formato": FORMATO,
+        "tamano": tamano,
+        "mtime_ns": mtime_ns,
+        "sha256": hash_csv(ruta_csv),
+        "filas": tabla.num_rows,
+    }
+    ruta_arrow.parent.mkdir(parents=True, exist_ok=True)
+    # Sin compresión para que el memory mapping pueda leer las columnas sin copiarlas
+    escribir_atomico(ruta_arrow, lambda ruta: feather.write_feather(tabla, ruta, compression="uncompressed"))
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+    return ruta_arrow
+
+
+def _vigente(ruta_csv, directorio):
+    ruta_arrow, ruta_meta = _rutas(ruta_csv, directorio)
+    if not ruta_arrow.exists() or not ruta_meta.exists():
+        return False
+    try:
+        metadatos = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if metadatos.get("formato") != FORMATO:
+        return False
+    tamano, mtime_ns = version(ruta_csv)
+    if (metadatos.get("tamano"), metadatos.get("mtime_ns")) == (tamano, mtime_ns):
+        return True
+    if metadatos.get("sha256") != hash_csv(ruta_csv):
+        return False
+    # Mismo contenido con otra fecha (p. ej. tras un checkout): basta con actualizar la huella
+    metadatos.update(tamano=tamano, mtime_ns=mtime_ns)
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+    return True
+
+
+def ruta_columnar(ruta_csv=RUTA_CSV, directorio=DIRECTORIO):
+    """Ruta del archivo columnar, reconstruyéndolo antes si el CSV cambió."""
+    with _lock:
+        if not _vigente(ruta_csv, directorio):
+            construir(ruta_csv, directorio)
+    return _rutas(ruta_csv, directorio)[0]
+
+
+def cargar_tabla(ruta_csv=RUTA_CSV, directorio=DIRECTORIO):
+    """El registro como `pyarrow.Table` respaldada por memory mapping."""
+    import pyarrow.feather as feather
+
+    return feather.read_table(ruta_columnar(ruta_csv, directorio), memory_map=True)
+
+
+def cargar(ruta_csv=RUTA_CSV, directorio=DIRECTORIO):
+    """El registro como DataFrame de solo lectura sobre el archivo mapeado (ver `compartido.vista`)."""
+    return compartido.vista(cargar_tabla(ruta_csv, directorio))
+
+
+if __name__ == "__main__":
+    ruta = construir()
+    print(f"Dataset columnar generado en {ruta}")
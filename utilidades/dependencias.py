@@ -0,0 +1,107 @@
+"""Grafo de dependencias de los componentes de una página.
+
+Cada componente calculado de una página (la consulta, cada figura...) se
+declara como nodo con la parte del estado que lee: valores de widgets, la
+versión de los datos u otros nodos. La clave de un nodo se forma con la de lo
+que lee, así que en cada rerun solo se recalculan los nodos cuyo estado
+cambió; el resto devuelve su salida memorizada (caché LRU por nodo, del
+proceso y compartida entre sesiones)::
+
+    grafo = dependencias.grafo("datos")
+
+    @grafo.nodo("consultar", lee=("version", "filtros"))
+    def consultar(version, filtros):
+        return cubo.consultar(*filtros)
+
+    @grafo.nodo("figura:pastel", lee=("consultar",))
+    def figura_pastel(consultar):
+        return graficos_ev.pastel_marcas(consultar.por_marca)
+
+    fig = grafo.valor("figura:pastel", {"version": version, "filtros": filtros})
+
+La función de un nodo recibe como argumentos los valores que declara en `lee`
+y no debe depender de nada más que no quede determinado por ellos: el grafo es
+del proceso y cada sesión vuelve a registrar sus nodos en cada rerun, así que
+la función que se ejecuta puede ser la que registró otra sesión. No debe usar
+variables de la sesión (la fuente abierta, un futuro, un widget); lo que
+necesite lo obtiene a partir de sus entradas (p. ej. de cachés del proceso por
+versión). Los
+componentes con widgets propios (la tabla con su búsqueda, orden y página, la
+exportación...) van además en un fragmento (`st.fragment`): tocar uno de sus
+widgets solo vuelve a ejecutar ese fragmento y no la página entera.
+"""
+import threading
+from collections import OrderedDict
+
+from utilidades import trazas
+
+MAX_MEMO = 32  # Salidas memorizadas por nodo
+
+_grafos = {}
+_grafos_lock = threading.Lock()
+
+
+class Grafo:
+    """Nodos de una página con lo que lee cada uno y sus salidas memorizadas."""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._nodos = {}  # nombre -> (lee, calcular, maximo)
+        self._memo = {}  # nombre -> OrderedDict(clave -> salida)
+        self._lock = threading.Lock()  # El grafo se comparte entre sesiones
+
+    def nodo(self, nombre, lee, maximo=MAX_MEMO):
+        """Decorador: registra la función como el nodo `nombre`, que lee `lee` (estado u otros nodos).
+
+        Las páginas vuelven a registrar sus nodos en cada rerun (las funciones
+        cambian, las salidas memorizadas se conservan) y gana el último registro,
+        sea de la sesión que sea: `calcular` solo puede usar lo que recibe.
+        """
+        def registrar(calcular):
+            with self._lock:
+                self._nodos[nombre] = (tuple(lee), calcular, maximo)
+                self._memo.setdefault(nombre, OrderedDict())
+            return calcular
+        return registrar
+
+    def clave(self, nombre, estado):
+        """Lo que determina la salida de `nombre`: el valor de cada entrada de estado de las que depende."""
+        lee = self._nodos[nombre][0]
+        return (nombre,) + tuple(
+            self.clave(entrada, estado) if entrada in self._nodos else (entrada, estado[entrada]) for entrada in lee
+        )
+
+    def valor(self, nombre, estado):
+        """Salida de `nombre` para `estado` (dict con las entradas que no son nodos), recalculándola solo si cambió."""
+        lee, calcular, maximo = self._nodos[nombre]
+        clave = self.clave(nombre, estado)
+        memo = self._memo[nombre]
+        with trazas.tramo(nombre, cacheado=True):
+            with self._lock:
+                if clave in memo:
+                    memo.move_to_end(clave)
+                    return memo[clave]
+            entradas = {
+                entrada: self.valor(entrada, estado) if entrada in self._nodos else estado[entrada] for entrada in lee
+            }
+            trazas.fallo_cache()
+            salida = calcular(**entradas)
+            with self._lock:
+                memo[clave] = salida
+                while len(memo) > maximo:
+                    memo.popitem(last=False)
+        return salida
+
+    def limpiar(self):
+        """Olvida todas las salidas memorizadas (p. ej. al recargar los datos a mano)."""
+        with self._lock:
+            for memo in self._memo.values():
+                memo.clear()
+
+
+def grafo(nombre):
+    """El `Grafo` del proceso para la página `nombre`."""
+    with _grafos_lock:
+        if nombre not in _grafos:
+            _grafos[nombre] = Grafo(nombre)
+        return _grafos[nombre]
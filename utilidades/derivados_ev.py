@@ -0,0 +1,76 @@
+"""Objetos derivados del registro de carros eléctricos, uno por versión del CSV.
+
+El DataFrame, el cubo de agregados, los índices de búsqueda y de orden, el
+dataset particionado y el estimador del modo aproximado se construyen una vez
+por versión (`refresco.obtener("carros").version`) y se comparten entre las
+sesiones del proceso (`refresco.por_version`).
+
+Al importarse, el módulo registra en `refresco` la preparación de cada versión
+nueva, que se hace en el hilo de refresco antes de publicarla: el dataset
+particionado y el estimador si el CSV es grande (`particiones_ev.recomendado()`,
+el modo con el que se abre la página) y, si no, el cubo y el índice de
+búsqueda. Lo demás se construye la primera vez que una página lo pide (p. ej.
+el cubo si una sesión desactiva el modo particionado).
+"""
+from utilidades import refresco
+
+
+def datos(version):
+    """DataFrame de solo lectura del registro, sobre la caché columnar mapeada en memoria."""
+    from utilidades import dataset_ev
+
+    return refresco.por_version("carros:datos", version, dataset_ev.cargar)
+
+
+def cubo(version):
+    """Cubo de agregados: métricas y gráficas se responden sumando celdas, sin recorrer filas."""
+    from utilidades.cubo_ev import CuboRegistros
+
+    return refresco.por_version("carros:cubo", version, lambda: CuboRegistros(datos(version)))
+
+
+def indice_busqueda(version):
+    """Índice de búsqueda por nombre del propietario; al cambiar el CSV solo se indexan las filas nuevas o cambiadas."""
+    from utilidades import busqueda
+
+    return refresco.por_version("carros:busqueda", version, lambda: busqueda.indice("carros", datos(version), ["nombre"]))
+
+
+def indice_orden(version):
+    """Rangos de ordenación para la tabla paginada."""
+    from utilidades.paginacion import IndiceOrden
+
+    return refresco.por_version("carros:orden", version, lambda: IndiceOrden(datos(version)))
+
+
+def particiones(version):
+    """El registro como dataset particionado en disco (modo fuera de memoria)."""
+    from utilidades import particiones_ev
+
+    return refresco.por_version("carros:particiones", version, particiones_ev.abrir)
+
+
+def estimador(version):
+    """Muestra estratificada y bocetos del modo aproximado."""
+    from utilidades import aproximado_ev
+
+    return refresco.por_version("carros:estimador", version, aproximado_ev.abrir)
+
+
+def olvidar():
+    """Descarta todo lo construido (recarga manual del registro)."""
+    refresco.olvidar(*(f"carros:{nombre}" for nombre in ("datos", "cubo", "busqueda", "orden", "particiones", "estimador")))
+
+
+def _preparar(carga):
+    from utilidades import particiones_ev
+
+    if particiones_ev.recomendado():
+        particiones(carga.version)
+        estimador(carga.version)
+    else:
+        cubo(carga.version)
+        indice_busqueda(carga.version)
+
+
+refresco.derivado("carros", "tablero", _preparar)
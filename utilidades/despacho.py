@@ -0,0 +1,232 @@
+"""Despachador compartido de peticiones a una API con cuota.
+
+Todas las sesiones del proceso piden a través del mismo `Despachador`:
+
+- Peticiones idénticas en curso se agrupan: la primera abre un `Vuelo` que
+  ejecuta la petición una sola vez, y las demás leen los mismos trozos según
+  llegan (también los que ya habían llegado).
+- Las peticiones se ejecutan en un pool de hilos de tamaño fijo
+  (`concurrencia`); las que no caben esperan en la cola del pool.
+- Antes de cada intento se toma una ficha de un cubo de fichas dimensionado
+  a la cuota (`por_minuto`, con ráfagas de hasta `rafaga`).
+- Los errores que la API marca como transitorios (cuota agotada, 5xx, red) se
+  reintentan con espera exponencial con jitter (tenacity), siempre que no
+  haya llegado aún ningún trozo: a mitad de respuesta ya no se puede repetir
+  sin duplicar texto.
+
+La ejecución no depende de quien la pidió: si la sesión que abrió el vuelo
+cambia de página, la petición termina igual para las demás.
+
+El plazo de los lectores (`TIMEOUT_TROZO`) solo corre mientras la petición se
+está ejecutando: el tiempo en la cola del pool y esperando ficha no cuenta,
+porque en una ráfaga puede superar con mucho al de la propia respuesta y la
+petición acabaría igual (gastando cuota) para un lector que ya se rindió.
+
+`metricas()` devuelve la profundidad de la cola, las peticiones en curso y los
+percentiles de espera (cola + cuota) de las últimas peticiones.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+MUESTRAS_ESPERA = 500  # Esperas recientes con las que se calculan los percentiles
+TIMEOUT_TROZO = 120  # Segundos máximos que un lector espera el siguiente trozo, sin contar la cola
+
+
+class CuboTokens:
+    """Limitador de ritmo: `por_minuto` fichas por minuto, con ráfagas de hasta `rafaga`."""
+
+    def __init__(self, por_minuto, rafaga=None):
+        self.ritmo = por_minuto / 60
+        self.capacidad = rafaga or max(1, por_minuto // 4)
+        self._fichas = float(self.capacidad)
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        """Toma una ficha, esperando si no hay. Devuelve los segundos esperados."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima) * self.ritmo)
+            self._ultima = ahora
+            # La ficha se reserva aunque el saldo quede negativo: los siguientes esperan por orden
+            self._fichas -= 1
+            espera = -self._fichas / self.ritmo if self._fichas < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class Vuelo:
+    """Una petición en curso, compartida por todos los que piden lo mismo."""
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.trozos = []
+        self.terminado = False
+        self.error = None
+        self.lectores = 1
+        self.intentos = 0
+        self.encolado = time.monotonic()
+        self.iniciado = None  # Cuando sale de la cola del pool
+        self.espera_cuota = 0.0
+        self.en_cola = True  # En la cola del pool o esperando ficha: el plazo de los lectores no corre
+        self._condicion = threading.Condition()
+
+    def esperar_turno(self, en_cola):
+        """Marca si la petición espera turno (pool o cuota) o ya se está ejecutando."""
+        with self._condicion:
+            self.en_cola = en_cola
+            self._condicion.notify_all()
+
+    def anadir(self, trozo):
+        with self._condicion:
+            self.trozos.append(trozo)
+            self._condicion.notify_all()
+
+    def terminar(self, error=None):
+        with self._condicion:
+            self.error = error
+            self.terminado = True
+            self._condicion.notify_all()
+
+    def leer(self, timeout=TIMEOUT_TROZO):
+        """Trozos de la respuesta desde el principio, según llegan. Propaga el error de la petición.
+
+        `timeout` es el máximo entre trozos mientras la petición se ejecuta; la
+        espera en cola no cuenta.
+        """
+        leidos = 0
+        while True:
+            with self._condicion:
+                limite = None
+                while leidos == len(self.trozos) and not self.terminado:
+                    if self.en_cola:
+                        limite = None  # El plazo empieza (o vuelve a empezar) al salir de la cola
+                        self._condicion.wait()
+                        continue
+                    if limite is None:
+                        limite = time.monotonic() + timeout
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise TimeoutError(f"Sin respuesta en {timeout} s")
+                    self._condicion.wait(restante)
+                pendientes = self.trozos[leidos:]
+                terminado, error = self.terminado, self.error
+            for trozo in pendientes:
+                yield trozo
+            leidos += len(pendientes)
+            if terminado and leidos == len(self.trozos):
+                if error is not None:
+                    raise error
+                return
+
+    @property
+    def espera(self):
+        """Segundos desde que se pidió hasta el primer intento (cola del pool + cuota)."""
+        if self.iniciado is None:
+            return time.monotonic() - self.encolado
+        return self.iniciado - self.encolado + self.espera_cuota
+
+
+class Despachador:
+    """Cola compartida con agrupación, límite de ritmo, concurrencia acotada y reintentos."""
+
+    def __init__(self, por_minuto, concurrencia, intentos=4, espera_maxima=30, reintentable=None, nombre="despacho"):
+        self._cubo = CuboTokens(por_minuto)
+        self._ejecutor = ThreadPoolExecutor(concurrencia, thread_name_prefix=nombre)
+        self.concurrencia = concurrencia
+        self.intentos = intentos
+        self.espera_maxima = espera_maxima
+        self.reintentable = reintentable or (lambda error: False)
+        self._vuelos = {}
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=MUESTRAS_ESPERA)
+        self._contadores = {"pedidas": 0, "agrupadas": 0, "intentos": 0, "reintentos": 0, "errores": 0}
+        self._en_cola = 0
+        self._en_curso = 0
+
+    def pedir(self, clave, producir, al_terminar=None):
+        """(vuelo, agrupada): el vuelo de `clave`, abriéndolo si no hay uno en curso.
+
+        `producir()` devuelve un iterable de trozos y se llama una vez por
+        intento. `al_terminar(trozos)` se llama con la respuesta completa antes
+        de cerrar el vuelo (p. ej. para guardarla en caché).
+        """
+        with self._lock:
+            self._contadores["pedidas"] += 1
+            vuelo = self._vuelos.get(clave)
+            if vuelo is not None:
+                vuelo.lectores += 1
+                self._contadores["agrupadas"] += 1
+                return vuelo, True
+            vuelo = self._vuelos[clave] = Vuelo(clave)
+            self._en_cola += 1
+        self._ejecutor.submit(self._ejecutar, vuelo, producir, al_terminar)
+        return vuelo, False
+
+    def _ejecutar(self, vuelo, producir, al_terminar):
+        from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+        with self._lock:
+            self._en_cola -= 1
+            self._en_curso += 1
+        vuelo.iniciado = time.monotonic()
+        error = None
+        try:
+            reintentos = Retrying(
+                stop=stop_after_attempt(self.intentos),
+                wait=wait_random_exponential(multiplier=1, max=self.espera_maxima),
+                retry=retry_if_exception(lambda e: not vuelo.trozos and self.reintentable(e)),
+                before_sleep=lambda estado: self._contar("reintentos"),
+                reraise=True,
+            )
+            for intento in reintentos:
+                with intento:
+                    vuelo.esperar_turno(True)
+                    espera = self._cubo.tomar()
+                    vuelo.esperar_turno(False)
+                    vuelo.espera_cuota += espera
+                    vuelo.intentos += 1
+                    self._contar("intentos")
+                    if vuelo.intentos == 1:
+                        with self._lock:
+                            self._esperas.append(vuelo.espera)
+                    for trozo in producir():
+                        vuelo.anadir(trozo)
+            if al_terminar is not None:
+                al_terminar(vuelo.trozos)
+        except Exception as e:
+            error = e
+            self._contar("errores")
+        finally:
+            # Se quita antes de cerrarlo: quien pida lo mismo después ya encuentra la caché
+            with self._lock:
+                self._vuelos.pop(vuelo.clave, None)
+                self._en_curso -= 1
+            vuelo.terminar(error)
+
+    def _contar(self, contador):
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def metricas(self):
+        """Estado de la cola y percentiles de espera (en segundos) de las últimas peticiones."""
+        with self._lock:
+            esperas = list(self._esperas)
+            metricas = {
+                "en_cola": self._en_cola,
+                "en_curso": self._en_curso,
+                "concurrencia": self.concurrencia,
+                **self._contadores,
+            }
+        percentiles = (50, 90, 99)
+        valores = [None] * len(percentiles)
+        if esperas:
+            import numpy as np  # Solo hace falta cuando ya hubo peticiones
+
+            valores = np.percentile(esperas, percentiles).tolist()
+        for percentil, valor in zip(percentiles, valores):
+            metricas[f"espera_p{percentil}"] = valor
+        return metricas
@@ -0,0 +1,143 @@
+"""Esquemas de tipos por endpoint de la API de eventos.
+
+`pd.DataFrame(response.json())` deja todas las columnas como `object` o
+`int64`. Al cargar cada endpoint se aplica su esquema una sola vez:
+
+- las fechas pasan a `datetime64[ns]` (sin zona horaria, en UTC),
+- el texto de baja cardinalidad pasa a `category`,
+- los ids y contadores se reducen al entero más pequeño de los indicados que
+  admita sus valores (con la variante nullable si hay vacíos).
+
+`aplicar` es idempotente, así que puede usarse también sobre snapshots ya
+tipados, y deja en `df.attrs["memoria"]` los bytes antes y después.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ESQUEMAS = {
+    "estudiantes": {
+        "fechas": ["fechaNacimiento"],
+        "categorias": ["carrera", "grado", "grupo"],
+        "enteros": {"id_estudiante": "int32", "semestre": "int16"},
+    },
+    "eventos": {
+        "fechas": ["fecha_evento", "fecha_inicio", "fecha_fin"],
+        "categorias": ["ubicacion", "categoria_evento"],
+        "enteros": {"id_evento": "int32", "id_categoria_evento": "int32", "cupo_maximo": "int16"},
+    },
+    "profesores": {
+        "fechas": [],
+        "categorias": ["departamento", "especialidad"],
+        "enteros": {"id_profesor": "int32"},
+    },
+    "asistenciaeventos": {
+        "fechas": ["fecha_asistencia"],
+        "categorias": [],
+        "enteros": {"id_asistencia": "int32", "id_evento": "int32", "id_participante": "int32"},
+    },
+    "categoriaevento": {
+        "fechas": [],
+        "categorias": [],
+        "enteros": {"id_categoria_evento": "int32"},
+    },
+    "participantes": {
+        "fechas": ["fecha_registro"],
+        "categorias": ["rol"],
+        "enteros": {"id_participante": "int32", "id_evento": "int32", "id_estudiante": "int32"},
+    },
+}
+
+MAX_PROPORCION_CATEGORIAS = 0.5  # Por encima de esta proporción de valores distintos no compensa
+
+# Enteros candidatos, de menor a mayor, para cada tipo pedido en el esquema
+_ENTEROS = {
+    "int16": ["int16", "int32", "int64"],
+    "int32": ["int32", "int64"],
+    "int64": ["int64"],
+}
+
+
+def _a_fecha(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, "tz", None) is not None:
+            return serie.dt.tz_convert(None)
+        return serie
+    fechas = pd.to_datetime(serie, errors="coerce", format="ISO8601", utc=True)
+    if fechas.isna().sum() > serie.isna().sum():
+        # Formatos no ISO (p. ej. "Mon, 03 Mar 2025 00:00:00 GMT" de Flask)
+        fechas = pd.to_datetime(serie, errors="coerce", format="mixed", utc=True)
+    return fechas.dt.tz_convert(None)
+
+
+def _a_categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype) or not pd.api.types.is_object_dtype(serie):
+        return serie
+    if len(serie) and serie.nunique() / len(serie) > MAX_PROPORCION_CATEGORIAS:
+        return serie
+    return serie.astype("category")
+
+
+def _a_entero(serie, tipo):
+    if pd.api.types.is_datetime64_any_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return serie
+    numeros = pd.to_numeric(serie, errors="coerce")
+    if numeros.isna().sum() > serie.isna().sum():
+        return serie  # Hay valores no numéricos: se deja la columna como vino
+    validos = numeros.dropna()
+    if not validos.empty and not np.all(np.mod(validos.to_numpy(dtype=float), 1) == 0):
+        return serie  # Decimales: no es un entero
+    con_vacios = bool(numeros.isna().any())
+    for candidato in _ENTEROS[tipo]:
+        limites = np.iinfo(candidato)
+        if validos.empty or (validos.min() >= limites.min and validos.max() <= limites.max):
+            return numeros.astype(candidato.capitalize() if con_vacios else candidato)
+    return serie
+
+
+def aplicar(tipo, df):
+    """Devuelve `df` con el esquema de `tipo` aplicado (no modifica el original)."""
+    esquema = ESQUEMAS.get(tipo)
+    if esquema is None or df.empty:
+        return df
+    antes = int(df.memory_usage(deep=True).sum())
+    columnas = {}
+    for col in esquema["fechas"]:
+        if col in df.columns:
+            columnas[col] = _a_fecha(df[col])
+    for col in esquema["categorias"]:
+        if col in df.columns:
+            columnas[col] = _a_categoria(df[col])
+    for col, entero in esquema["enteros"].items():
+        if col in df.columns:
+            columnas[col] = _a_entero(df[col], entero)
+    resultado = df.assign(**columnas) if columnas else df.copy(deep=False)
+    resultado.attrs = {**df.attrs, "memoria": {"antes": antes, "despues": int(resultado.memory_usage(deep=True).sum())}}
+    return resultado
+
+
+def concatenar(tipo, partes):
+    """Concatena frames del mismo endpoint conservando las columnas `category`.
+
+    `pd.concat` convierte a `object` las categóricas con categorías distintas;
+    aquí se unen sus diccionarios con `union_categoricals`, sin recodificar el
+    texto de las filas ya cargadas.
+    """
+    partes = [parte for parte in partes if parte is not None and not parte.empty]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    for col in ESQUEMAS.get(tipo, {}).get("categorias", []):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            if all(col in parte.columns and isinstance(parte[col].dtype, pd.CategoricalDtype) for parte in partes):
+                df[col] = pd.Series(union_categoricals([parte[col] for parte in partes]), index=df.index)
+    return aplicar(tipo, df)
+
+
+def formatear_bytes(n):
+    """Tamaño legible: 1536 -> '1.5 KB'."""
+    for unidad in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unidad}" if unidad == "B" else f"{n:.1f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} GB"
@@ -0,0 +1,61 @@
+"""Exportación de tablas filtradas a CSV, Parquet y Arrow IPC.
+
+Los archivos se escriben por bloques de filas sobre un único buffer, de modo
+que nunca se materializa a la vez el texto completo y su copia codificada
+(como hacía `df.to_csv().encode()`).
+"""
+import io
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+FILAS_POR_BLOQUE = 50_000
+
+
+def _bloques(df, filas_por_bloque):
+    for inicio in range(0, len(df), filas_por_bloque):
+        yield df.iloc[inicio:inicio + filas_por_bloque]
+
+
+def _csv(df, filas_por_bloque):
+    buffer = io.BytesIO()
+    texto = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    for i, bloque in enumerate(_bloques(df, filas_por_bloque)):
+        bloque.to_csv(texto, index=False, header=i == 0)
+    texto.flush()
+    texto.detach()
+    return buffer.getvalue()
+
+
+def _arrow(df, filas_por_bloque, escritor):
+    import pyarrow as pa
+
+    buffer = io.BytesIO()
+    # El esquema se infiere del primer bloque; las columnas vacías en él se tratan como texto
+    esquema = pa.Schema.from_pandas(df.iloc[:filas_por_bloque], preserve_index=False)
+    for i, campo in enumerate(esquema):
+        if pa.types.is_null(campo.type):
+            esquema = esquema.set(i, campo.with_type(pa.string()))
+    with escritor(buffer, esquema) as salida:
+        for bloque in _bloques(df, filas_por_bloque):
+            salida.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+    return buffer.getvalue()
+
+
+def exportar(df, formato, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Serializa `df` en `formato` (una clave de FORMATOS) y devuelve los bytes."""
+    if formato == "CSV":
+        return _csv(df, filas_por_bloque)
+    if formato == "Parquet":
+        import pyarrow.parquet as pq
+
+        return _arrow(df, filas_por_bloque, lambda buffer, esquema: pq.ParquetWriter(buffer, esquema, compression="zstd"))
+    if formato == "Arrow IPC":
+        import pyarrow as pa
+
+        return _arrow(df, filas_por_bloque, lambda buffer, esquema: pa.ipc.new_file(buffer, esquema))
+    raise ValueError(f"Formato de exportación no soportado: {formato}")
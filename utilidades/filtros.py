@@ -0,0 +1,160 @@
+"""Índice de filtros para las tablas de `mostrar_tabla`.
+
+Se construye una vez por carga de datos y evita recorrer la tabla completa en
+cada interacción:
+
+- Columnas categóricas: los valores se factorizan a códigos enteros y se guarda
+  la lista de opciones ya ordenada y, por cada valor, la lista ordenada de filas
+  que lo contienen (listas de posiciones tipo CSR, el equivalente disperso de
+  un bitmap por valor).
+- Columnas numéricas y de fecha: los valores válidos se ordenan una vez, de modo
+  que un rango es un corte por `searchsorted`.
+
+Los filtros se combinan partiendo del conjunto candidato más pequeño y
+comprobando el resto solo sobre esas filas. Los resultados se memorizan por
+estado de los filtros.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_MEMO = 64  # Estados de filtro memorizados por tabla
+
+
+class IndiceFiltros:
+    """Índice de filtros de una tabla, construido una vez por carga."""
+
+    def __init__(self, df, columnas):
+        self.df = df
+        self.categoricas = {}  # col -> (opciones, {valor: código}, códigos, orden, límites)
+        self.rangos = {}  # col -> (valores, válidos, ordenados, orden, es_fecha)
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()  # El índice se comparte entre sesiones
+        for col in columnas:
+            if col not in df.columns:
+                continue
+            serie = df[col]
+            if pd.api.types.is_object_dtype(serie) or isinstance(serie.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+                self._indexar_categorica(col, serie)
+            elif pd.api.types.is_datetime64_any_dtype(serie):
+                self._indexar_rango(col, pd.DatetimeIndex(serie).asi8, serie.notna().to_numpy(), True)
+            elif pd.api.types.is_numeric_dtype(serie):
+                self._indexar_rango(col, serie.to_numpy(dtype=float, na_value=np.nan), serie.notna().to_numpy(), False)
+
+    def _indexar_categorica(self, col, serie):
+        try:
+            codigos, opciones = pd.factorize(serie, sort=True)
+        except TypeError:
+            # Tipos mezclados que no se pueden comparar: se ordenan como texto
+            codigos, opciones = pd.factorize(serie)
+            orden_texto = np.argsort([str(valor) for valor in opciones], kind="stable")
+            reordenar = np.empty_like(orden_texto)
+            reordenar[orden_texto] = np.arange(len(orden_texto))
+            codigos = np.where(codigos >= 0, reordenar[np.maximum(codigos, 0)], -1)
+            opciones = opciones[orden_texto]
+        opciones = list(opciones)
+        orden = np.argsort(codigos, kind="stable")
+        conteos = np.bincount(codigos[codigos >= 0], minlength=len(opciones))
+        limites = np.concatenate(([0], np.cumsum(conteos))) + np.count_nonzero(codigos < 0)
+        posiciones = {valor: codigo for codigo, valor in enumerate(opciones)}
+        self.categoricas[col] = (opciones, posiciones, codigos, orden, limites)
+
+    def _indexar_rango(self, col, valores, validos, es_fecha):
+        filas_validas = np.flatnonzero(validos)
+        orden = filas_validas[np.argsort(valores[filas_validas], kind="stable")]
+        self.rangos[col] = (valores, validos, valores[orden], orden, es_fecha)
+
+    # --- Opciones para los widgets ---
+
+    def opciones(self, col):
+        """Valores distintos de una columna categórica, ya ordenados."""
+        return self.categoricas[col][0]
+
+    def es_fecha(self, col):
+        return self.rangos[col][4]
+
+    def extremos(self, col):
+        """(mínimo, máximo) de una columna de rango, o None si no tiene valores."""
+        ordenados, es_fecha = self.rangos[col][2], self.rangos[col][4]
+        if len(ordenados) == 0:
+            return None
+        if es_fecha:
+            return pd.Timestamp(ordenados[0]), pd.Timestamp(ordenados[-1])
+        return float(ordenados[0]), float(ordenados[-1])
+
+    # --- Consultas ---
+
+    def _limites_rango(self, col, rango):
+        ordenados, es_fecha = self.rangos[col][2], self.rangos[col][4]
+        desde, hasta = rango
+        if es_fecha:
+            desde, hasta = pd.Timestamp(desde).value, pd.Timestamp(hasta).value
+        return desde, hasta, ordenados
+
+    def _activo(self, col, valor):
+        # Un rango que cubre todos los valores no filtra nada, salvo que la columna tenga vacíos:
+        # como con `>=` y `<=`, las filas vacías nunca cumplen un rango
+        if col in self.rangos:
+            desde, hasta, ordenados = self._limites_rango(col, valor)
+            vacios = len(ordenados) < len(self.rangos[col][0])
+            return vacios or len(ordenados) == 0 or desde > ordenados[0] or hasta < ordenados[-1]
+        return col in self.categoricas
+
+    def _candidatas(self, col, valor):
+        # Filas que cumplen un filtro, ordenadas por posición si es categórico
+        if col in self.categoricas:
+            _, posiciones, _, orden, limites = self.categoricas[col]
+            codigo = posiciones.get(valor)
+            if codigo is None:
+                return np.empty(0, dtype=np.intp)
+            return orden[limites[codigo]:limites[codigo + 1]]
+        desde, hasta, ordenados = self._limites_rango(col, valor)
+        orden = self.rangos[col][3]
+        return orden[np.searchsorted(ordenados, desde, "left"):np.searchsorted(ordenados, hasta, "right")]
+
+    def _cumple(self, col, valor, filas):
+        # Comprueba un filtro solo sobre las filas candidatas
+        if col in self.categoricas:
+            _, posiciones, codigos, _, _ = self.categoricas[col]
+            codigo = posiciones.get(valor, -2)
+            return codigos[filas] == codigo
+        desde, hasta, _ = self._limites_rango(col, valor)
+        valores, validos = self.rangos[col][0], self.rangos[col][1]
+        seleccion = valores[filas]
+        return validos[filas] & (seleccion >= desde) & (seleccion <= hasta)
+
+    def clave(self, filtros):
+        """Clave hashable del estado de los filtros activos (() si no hay ninguno)."""
+        activos = [(col, valor) for col, valor in filtros.items() if self._activo(col, valor)]
+        return tuple(sorted(activos, key=lambda item: item[0]))
+
+    def filas(self, filtros):
+        """Posiciones (ordenadas) de las filas que cumplen todos los filtros, o None si no hay filtros activos."""
+        clave = self.clave(filtros)
+        if not clave:
+            return None
+        activos = dict(clave)
+        with self._memo_lock:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                return self._memo[clave]
+        candidatas = {col: self._candidatas(col, valor) for col, valor in activos.items()}
+        col_base = min(candidatas, key=lambda col: len(candidatas[col]))
+        filas = np.sort(candidatas[col_base])
+        for col, valor in activos.items():
+            if col != col_base and len(filas):
+                filas = filas[self._cumple(col, valor, filas)]
+        with self._memo_lock:
+            self._memo[clave] = filas
+            if len(self._memo) > MAX_MEMO:
+                self._memo.popitem(last=False)
+        return filas
+
+    def filtrar(self, filtros):
+        """DataFrame filtrado. Sin filtros activos devuelve la tabla original, sin copiarla."""
+        filas = self.filas(filtros)
+        if filas is None:
+            return self.df
+        return self.df.take(filas)
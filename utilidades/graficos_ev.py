@@ -0,0 +1,87 @@
+"""Gráficas del tablero de carros eléctricos a partir de datos ya agregados.
+
+Plotly solo recibe series agregadas (conteos por marca, por tramo de edad y por
+mes), nunca las filas, así que el JSON de cada figura tiene un tamaño acotado
+por el número de marcas, tramos o meses. La página memoriza cada figura como un
+nodo de su grafo de dependencias (`dependencias`), así que solo se vuelve a
+construir cuando cambia la consulta de la que sale. Plotly se importa al
+construir la primera figura, no al cargar la página.
+
+Si los datos vienen del modo aproximado (`aproximado_ev`), traen la mitad del
+ancho del intervalo al 95 % en la columna "error" (y "error_autonomia" en las
+marcas), y las figuras la dibujan como barras de error.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+TRAMOS_EDAD = 20
+
+
+def histograma_edades(por_edad, tramos=TRAMOS_EDAD):
+    """Agrupa conteos por edad en unos `tramos` de ancho entero. Devuelve inicio, fin y registros."""
+    if por_edad.empty:
+        return pd.DataFrame({"desde": [], "hasta": [], "registros": []})
+    minimo, maximo = por_edad["edad"].min(), por_edad["edad"].max()
+    ancho = max(1, math.ceil((maximo - minimo + 1) / tramos))
+    inicio = math.floor(minimo / ancho) * ancho
+    tramo = ((por_edad["edad"].to_numpy() - inicio) // ancho).astype(np.int64)
+    conteos = np.bincount(tramo, weights=por_edad["registros"].to_numpy(), minlength=tramo.max() + 1)
+    desde = inicio + np.arange(len(conteos)) * ancho
+    tramos = pd.DataFrame({"desde": desde, "hasta": desde + ancho - 1, "registros": conteos.astype(np.int64)})
+    if "error" in por_edad:
+        # Errores de edades distintas combinados como si fueran independientes
+        tramos["error"] = np.sqrt(np.bincount(tramo, weights=por_edad["error"].to_numpy() ** 2, minlength=len(conteos)))
+    return tramos
+
+
+def pastel_marcas(por_marca):
+    import plotly.express as px
+
+    fig = px.pie(por_marca, names="marca_auto", values="registros", title="Distribución de marcas de autos eléctricos",
+                 color_discrete_sequence=px.colors.qualitative.Bold,
+                 hover_data={"error": ":,.0f"} if "error" in por_marca else None)
+    fig.update_layout(font_size=12)
+    return fig
+
+
+def histograma_edad(por_edad):
+    import plotly.express as px
+
+    tramos = histograma_edades(por_edad)
+    fig = px.bar(tramos, x=(tramos["desde"] + tramos["hasta"]) / 2, y="registros",
+                 title="Distribución de edades de los propietarios",
+                 color_discrete_sequence=["#ff7f0e"], hover_data={"desde": True, "hasta": True},
+                 error_y="error" if "error" in tramos else None)
+    if not tramos.empty:
+        fig.update_traces(width=float(tramos["hasta"].iloc[0] - tramos["desde"].iloc[0] + 1))
+    fig.update_layout(font_size=12, xaxis_title="Edad", yaxis_title="Cantidad", bargap=0)
+    return fig
+
+
+def barras_autonomia(por_marca):
+    import plotly.express as px
+
+    fig = px.bar(
+        por_marca,
+        x="marca_auto",
+        y="autonomia_promedio",
+        title="Autonomía promedio por marca",
+        color="marca_auto",
+        color_discrete_sequence=px.colors.qualitative.Set2,
+        labels={"marca_auto": "Marca", "autonomia_promedio": "Autonomía promedio (km)"},
+        error_y="error_autonomia" if "error_autonomia" in por_marca else None,
+    )
+    fig.update_layout(font_size=12, xaxis_title="Marca", yaxis_title="Autonomía promedio (km)")
+    return fig
+
+
+def linea_registros(por_mes):
+    import plotly.express as px
+
+    fig = px.line(por_mes, x="year_month", y="count", title="Registros a lo largo del tiempo",
+                  markers=True, color_discrete_sequence=["#2ca02c"],
+                  error_y="error" if "error" in por_mes else None)
+    fig.update_layout(font_size=12, xaxis_title="Año-Mes", yaxis_title="Número de registros")
+    return fig
@@ -0,0 +1,101 @@
+"""Tablas de eventos que muestra `mostrar_tabla` y sus índices.
+
+`indices(tipo, df)` devuelve los índices de filtros, búsqueda y orden de la
+tabla `tipo`, construidos una vez por versión de la tabla y compartidos por
+las sesiones del proceso (`refresco.por_version`).
+
+Al importarse, el módulo registra en `refresco` un derivado por tabla de
+`TABLAS`, con sus columnas fijas, que construye los índices de cada versión
+nueva en el hilo de refresco antes de publicarla.
+"""
+from typing import Any, NamedTuple
+
+from utilidades import refresco
+
+# Tablas disponibles: (título, endpoint, columnas de filtro)
+TABLAS = {
+    "Estudiantes": (
+        "Estudiantes",
+        "estudiantes",
+        ["nombre", "apellido", "correo", "carrera", "semestre", "grado", "grupo", "fechaNacimiento"],
+    ),
+    "Eventos": (
+        "Eventos",
+        "eventos",
+        ["nombre_evento", "fecha_evento", "ubicacion", "id_categoria_evento", "cupo_maximo", "fecha_inicio", "fecha_fin" , "categoria_evento"],
+    ),
+    "Profesores": (
+        "Profesores",
+        "profesores",
+        ["nombre", "apellido", "email", "departamento", "especialidad"],
+    ),
+    "Asistencia Eventos": (
+        "Asistencia a Eventos",
+        "asistenciaeventos",
+        ["id_evento", "id_participante", "fecha_asistencia"],
+    ),
+    "Categoria Evento": (
+        "Categoria de Evento",
+        "categoriaevento",
+        ["nombre_categoria", "descripcion"],
+    ),
+    "Participantes": (
+        "Participantes",
+        "participantes",
+        ["id_evento", "id_estudiante", "rol", "fecha_registro"],
+    ),
+}
+
+# Columnas que se buscan como texto (con el índice de búsqueda) en lugar de con un desplegable
+COLUMNAS_BUSQUEDA = {
+    "estudiantes": ["nombre", "apellido", "correo"],
+    "profesores": ["nombre", "apellido", "email"],
+}
+
+COLUMNAS_FILTRO = {tipo: columnas for _, tipo, columnas in TABLAS.values()}
+
+
+class Indices(NamedTuple):
+    version: Any
+    columnas_filtro: list  # Columnas con desplegable o rango (sin las de búsqueda)
+    columnas_busqueda: list  # Columnas de búsqueda que tiene la tabla
+    filtros: Any  # IndiceFiltros
+    busqueda: Any  # IndiceBusqueda, o None si la tabla no tiene columnas de búsqueda
+    orden: Any  # IndiceOrden
+
+
+def version_tabla(df):
+    """Versión del contenido de una tabla: la pone el refresco; las tablas sin ella usan filas y fecha."""
+    return df.attrs.get("version") or (len(df), df.attrs.get("snapshot", {}).get("guardado_en"))
+
+
+def _construir(tipo, df, version):
+    from utilidades import busqueda
+    from utilidades.filtros import IndiceFiltros
+    from utilidades.paginacion import IndiceOrden
+
+    columnas_busqueda = [col for col in COLUMNAS_BUSQUEDA.get(tipo, ()) if col in df.columns]
+    columnas_filtro = [col for col in COLUMNAS_FILTRO[tipo] if col not in columnas_busqueda]
+    return Indices(
+        version=version,
+        columnas_filtro=columnas_filtro,
+        columnas_busqueda=columnas_busqueda,
+        filtros=IndiceFiltros(df, columnas_filtro),
+        # Al refrescar los datos solo se indexan las filas nuevas o cambiadas
+        busqueda=busqueda.indice(tipo, df, columnas_busqueda) if columnas_busqueda else None,
+        orden=IndiceOrden(df),
+    )
+
+
+def indices(tipo, df):
+    """Los `Indices` de `df`, la tabla `tipo`, construidos una sola vez por versión."""
+    version = version_tabla(df)
+    return refresco.por_version(f"indices:{tipo}", version, lambda: _construir(tipo, df, version))
+
+
+def _registrar():
+    for tipo in COLUMNAS_FILTRO:
+        refresco.derivado(tipo, "indices", lambda carga, tipo=tipo: indices(tipo, carga.valor))
+
+
+_registrar()
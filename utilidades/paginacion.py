@@ -0,0 +1,101 @@
+"""Tabla paginada: solo se envía al navegador la ventana visible.
+
+`st.dataframe(df)` serializa el frame completo en cada rerun. `tabla_paginada`
+ordena en el servidor (con los rangos precalculados de `IndiceOrden` cuando se
+le pasa uno) y manda únicamente las filas de la página actual, así que el
+tamaño del mensaje no depende del número de filas filtradas.
+
+La tabla es un fragmento (`st.fragment`): cambiar la página, el orden o las
+filas por página solo vuelve a ejecutar la tabla, no la página que la contiene.
+"""
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utilidades import trazas
+
+FILAS_POR_PAGINA = [25, 50, 100, 250]
+SIN_ORDEN = "(sin ordenar)"
+
+
+class IndiceOrden:
+    """Rango de cada fila por columna de una tabla base, calculado una vez por columna."""
+
+    def __init__(self, df):
+        self.df = df
+        self._rangos = {}  # col -> (rango, n_validos)
+        self._lock = threading.Lock()  # El índice se comparte entre sesiones
+
+    def rango(self, col):
+        """(rango, n_validos): posición de cada fila al ordenar por `col`, vacíos al final."""
+        with self._lock:
+            if col not in self._rangos:
+                serie = self.df[col]
+                try:
+                    rangos = serie.rank(method="first", na_option="bottom")
+                except TypeError:
+                    # Tipos mezclados que no se pueden comparar: se ordenan como texto
+                    rangos = serie.astype(str).where(serie.notna()).rank(method="first", na_option="bottom")
+                self._rangos[col] = (rangos.to_numpy(dtype=np.int64) - 1, int(serie.notna().sum()))
+            return self._rangos[col]
+
+    def posiciones(self, df_filtrado):
+        """Posiciones en la tabla base de las filas de `df_filtrado`."""
+        indice = self.df.index
+        if isinstance(indice, pd.RangeIndex) and indice.start == 0 and indice.step == 1:
+            return df_filtrado.index.to_numpy()
+        return indice.get_indexer(df_filtrado.index)
+
+    def ordenar(self, df_filtrado, col, descendente=False):
+        """Posiciones base de `df_filtrado` ordenadas por `col` (vacíos siempre al final)."""
+        posiciones = self.posiciones(df_filtrado)
+        rango, n_validos = self.rango(col)
+        claves = rango[posiciones]
+        if descendente:
+            claves = np.where(claves < n_validos, n_validos - 1 - claves, claves)
+        return posiciones[np.argsort(claves, kind="stable")]
+
+
+@st.fragment
+def tabla_paginada(df, clave, indice_orden=None, altura=None):
+    """Muestra `df` página a página con ordenación en el servidor. Devuelve la ventana mostrada."""
+    with trazas.fragmento(f"tabla:{clave}"):
+        return _tabla_paginada(df, clave, indice_orden, altura)
+
+
+def _tabla_paginada(df, clave, indice_orden, altura):
+    total = len(df)
+    controles = st.columns([2, 1, 1, 1])
+    with controles[0]:
+        columna_orden = st.selectbox("Ordenar por", [SIN_ORDEN] + list(df.columns), key=f"orden_{clave}")
+    with controles[1]:
+        descendente = st.toggle("Descendente", key=f"desc_{clave}", disabled=columna_orden == SIN_ORDEN)
+    with controles[2]:
+        por_pagina = st.selectbox("Filas por página", FILAS_POR_PAGINA, index=1, key=f"por_pagina_{clave}")
+    paginas = max(1, math.ceil(total / por_pagina))
+    clave_pagina = f"pagina_{clave}"
+    # Si los filtros reducen el número de páginas, la página actual se ajusta antes de crear el widget
+    if st.session_state.get(clave_pagina, 1) > paginas:
+        st.session_state[clave_pagina] = paginas
+    with controles[3]:
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key=clave_pagina)
+
+    inicio = (pagina - 1) * por_pagina
+    fin = min(inicio + por_pagina, total)
+    with trazas.tramo(f"ordenar:{clave}", filas_entrada=total) as tramo:
+        if columna_orden == SIN_ORDEN:
+            ventana = df.iloc[inicio:fin]
+        elif indice_orden is not None and columna_orden in indice_orden.df.columns:
+            ventana = indice_orden.df.take(indice_orden.ordenar(df, columna_orden, descendente)[inicio:fin])
+            ventana = ventana[df.columns]
+        else:
+            ordenado = df.sort_values(columna_orden, ascending=not descendente, na_position="last", kind="stable")
+            ventana = ordenado.iloc[inicio:fin]
+        tramo.filas_salida = len(ventana)
+    with trazas.tramo(f"dataframe:{clave}", filas_entrada=len(ventana), bytes=trazas.bytes_de(ventana)):
+        st.dataframe(ventana, height=altura, use_container_width=True)
+    st.caption(f"Filas {inicio + 1 if total else 0}–{fin} de {total}")
+    return ventana
@@ -0,0 +1,357 @@
+"""Modo particionado (fuera de memoria) del registro de carros eléctricos.
+
+Para registros que no caben en memoria, el CSV se convierte por lotes a un
+dataset Parquet particionado al estilo Hive por lugar de registro::
+
+    .cache/datasets/<nombre>.particiones/lugar_registro=Madrid/parte-0.parquet
+
+Solo se particiona por lo que filtra el tablero: un nivel más (p. ej. el año de
+registro, que ningún filtro acota) no descartaría nada y solo multiplicaría los
+archivos pequeños y el coste fijo de abrir cada uno.
+
+Los filtros del tablero se traducen a una expresión de `pyarrow.dataset`: las
+particiones que no cumplen el filtro de lugar ni se abren, y dentro de cada
+archivo se descartan los grupos de filas cuyas estadísticas quedan fuera de
+los rangos. Los grupos que quedan se recorren en lotes de tamaño fijo en un
+pool de hilos y cada uno aporta agregados parciales (conteos y sumas) que al
+final se combinan, así que la memoria usada depende del tamaño del lote y del
+número de hilos, no del número de filas. El resultado tiene la misma forma que
+el del cubo (`ResultadoCubo`), de modo que la página lo usa igual.
+
+Para generarlo a mano::
+
+    python -m utilidades.particiones_ev [ruta.csv]
+"""
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utilidades import dataset_ev
+from utilidades.archivos import escribir_atomico
+from utilidades.cubo_ev import DIMENSIONES, ResultadoCubo
+
+PARTICIONES = [("lugar_registro", "string")]
+COLUMNAS_RANGO = ["año_modelo", "edad", "autonomia_km"]
+COLUMNAS_AGREGADO = ["marca_auto", "edad", "autonomia_km", "fecha_registro"]
+
+UMBRAL_BYTES = 256 * 1024 ** 2  # A partir de este tamaño de CSV se recomienda el modo particionado
+FILAS_POR_LOTE = 65_536  # Filas por lote al leer el CSV y al recorrer el dataset
+MIN_FILAS_GRUPO = 10_000  # Evita grupos de filas diminutos cuando un lote se reparte entre muchas particiones
+MAX_FILAS_GRUPO = 131_072
+MAX_MUESTRA = 10_000  # Filas que se traen para la tabla
+TRABAJADORES = min(8, os.cpu_count() or 1)
+
+FORMATO = 2  # Se incrementa al cambiar cómo se construye el dataset, para forzar su reconstrucción
+
+_lock = threading.Lock()
+
+
+def _rutas(ruta_csv, directorio):
+    nombre = Path(ruta_csv).stem
+    return Path(directorio) / f"{nombre}.particiones", Path(directorio) / f"{nombre}.particiones.json"
+
+
+def recomendado(ruta_csv=dataset_ev.RUTA_CSV):
+    """True si el CSV es lo bastante grande como para no cargarlo entero en memoria."""
+    return Path(ruta_csv).stat().st_size >= UMBRAL_BYTES
+
+
+def _esquema_particiones():
+    import pyarrow as pa
+
+    return pa.schema([(col, getattr(pa, tipo)()) for col, tipo in PARTICIONES])
+
+
+def _lotes(ruta_csv, resumen):
+    """Lee el CSV por lotes y va acumulando valores distintos y extremos."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+
+    tipos = {col: getattr(pa, tipo)() for col, tipo in dataset_ev.COLUMNAS_ENTERAS.items()}
+    tipos.update({col: pa.timestamp("ns") for col in dataset_ev.COLUMNAS_FECHA})
+    lector = pv.open_csv(
+        ruta_csv,
+        read_options=pv.ReadOptions(block_size=16 * 1024 ** 2),
+        convert_options=pv.ConvertOptions(column_types=tipos),
+    )
+    resumen["columnas"] = lector.schema.names
+    valores = {col: set() for col in DIMENSIONES if col not in COLUMNAS_RANGO}
+    extremos = {}
+    for lote in lector:
+        if lote.num_rows == 0:
+            continue
+        resumen["filas"] += lote.num_rows
+        for col, distintos in valores.items():
+            distintos.update(valor for valor in pc.unique(lote.column(col)).to_pylist() if valor is not None)
+        for col in COLUMNAS_RANGO:
+            minmax = pc.min_max(lote.column(col)).as_py()
+            if minmax["min"] is None:
+                continue
+            actual = extremos.get(col)
+            extremos[col] = (minmax["min"], minmax["max"]) if actual is None else (
+                min(actual[0], minmax["min"]), max(actual[1], minmax["max"])
+            )
+        yield lote
+    resumen["valores"] = {col: sorted(distintos) for col, distintos in valores.items()}
+    resumen["extremos"] = extremos
+
+
+def construir(ruta_csv=dataset_ev.RUTA_CSV, directorio=dataset_ev.DIRECTORIO):
+    """Convierte el CSV al dataset particionado, sin cargarlo entero. Devuelve la ruta del dataset."""
+    import pyarrow.dataset as ds
+
+    ruta_dataset, ruta_meta = _rutas(ruta_csv, directorio)
+    temporal = ruta_dataset.with_name(f"{ruta_dataset.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(temporal, ignore_errors=True)
+    resumen = {"filas": 0}
+    lotes = _lotes(ruta_csv, resumen)
+    primero = next(lotes, None)
+    if primero is None:
+        raise ValueError(f"{ruta_csv} no tiene registros")
+
+    def todos():
+        yield primero
+        yield from lotes
+
+    ds.write_dataset(
+        todos(),
+        temporal,
+        schema=primero.schema,
+        format="parquet",
+        partitioning=ds.partitioning(_esquema_particiones(), flavor="hive"),
+        basename_template="parte-{i}.parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        min_rows_per_group=MIN_FILAS_GRUPO,
+        max_rows_per_group=MAX_FILAS_GRUPO,
+        max_partitions=4096,
+    )
+
+    tamano, mtime_ns = dataset_ev.version(ruta_csv)
+    metadatos = {
+        "formato": FORMATO,
+        "tamano": tamano,
+        "mtime_ns": mtime_ns,
+        "sha256": dataset_ev.hash_csv(ruta_csv),
+        **resumen,
+    }
+    # Se borran los metadatos antes de cambiar el directorio: si el proceso muere a medias,
+    # el dataset se da por no vigente y se reconstruye
+    ruta_meta.unlink(missing_ok=True)
+    if ruta_dataset.exists():
+        viejo = temporal.with_name(f"{ruta_dataset.name}.viejo-{os.getpid()}-{threading.get_ident()}")
+        os.replace(ruta_dataset, viejo)
+        os.replace(temporal, ruta_dataset)
+        shutil.rmtree(viejo, ignore_errors=True)
+    else:
+        os.replace(temporal, ruta_dataset)
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+    return ruta_dataset
+
+
+def _metadatos_vigentes(ruta_csv, directorio):
+    ruta_dataset, ruta_meta = _rutas(ruta_csv, directorio)
+    if not ruta_dataset.exists() or not ruta_meta.exists():
+        return None
+    try:
+        metadatos = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if metadatos.get("formato") != FORMATO:
+        return None
+    tamano, mtime_ns = dataset_ev.version(ruta_csv)
+    if (metadatos.get("tamano"), metadatos.get("mtime_ns")) == (tamano, mtime_ns):
+        return metadatos
+    if metadatos.get("sha256") != dataset_ev.hash_csv(ruta_csv):
+        return None
+    metadatos.update(tamano=tamano, mtime_ns=mtime_ns)
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+    return metadatos
+
+
+def abrir(ruta_csv=dataset_ev.RUTA_CSV, directorio=dataset_ev.DIRECTORIO):
+    """El dataset particionado listo para consultar, reconstruyéndolo antes si el CSV cambió."""
+    with _lock:
+        metadatos = _metadatos_vigentes(ruta_csv, directorio)
+        if metadatos is None:
+            construir(ruta_csv, directorio)
+            metadatos = _metadatos_vigentes(ruta_csv, directorio)
+    return RegistrosParticionados(_rutas(ruta_csv, directorio)[0], metadatos)
+
+
+class _Parcial:
+    """Agregados parciales de los lotes que recorre un hilo."""
+
+    def __init__(self):
+        self.registros = 0
+        self.suma_edad = 0.0
+        self.suma_cuadrados_edad = 0.0
+        self.suma_autonomia = 0.0
+        self.suma_cuadrados_autonomia = 0.0
+        self.conteo_marca = pd.Series(dtype="int64")
+        self.suma_marca = pd.Series(dtype="float64")
+        self.conteo_edad = pd.Series(dtype="int64")
+        self.conteo_mes = pd.Series(dtype="int64")
+
+    def agregar(self, lote):
+        if lote.num_rows == 0:
+            return
+        df = lote.to_pandas()
+        edad = df["edad"].to_numpy(dtype=float)
+        autonomia = df["autonomia_km"].to_numpy(dtype=float)
+        self.registros += len(df)
+        self.suma_edad += edad.sum()
+        self.suma_cuadrados_edad += (edad ** 2).sum()
+        self.suma_autonomia += autonomia.sum()
+        self.suma_cuadrados_autonomia += (autonomia ** 2).sum()
+        por_marca = df.groupby("marca_auto", sort=False)["autonomia_km"].agg(["size", "sum"])
+        self.conteo_marca = self.conteo_marca.add(por_marca["size"], fill_value=0)
+        self.suma_marca = self.suma_marca.add(por_marca["sum"], fill_value=0)
+        self.conteo_edad = self.conteo_edad.add(df["edad"].value_counts(sort=False), fill_value=0)
+        meses = pd.Series(df["fecha_registro"].to_numpy().astype("datetime64[M]")).value_counts(sort=False)
+        self.conteo_mes = self.conteo_mes.add(meses, fill_value=0)
+
+    def combinar(self, otro):
+        self.registros += otro.registros
+        self.suma_edad += otro.suma_edad
+        self.suma_cuadrados_edad += otro.suma_cuadrados_edad
+        self.suma_autonomia += otro.suma_autonomia
+        self.suma_cuadrados_autonomia += otro.suma_cuadrados_autonomia
+        self.conteo_marca = self.conteo_marca.add(otro.conteo_marca, fill_value=0)
+        self.suma_marca = self.suma_marca.add(otro.suma_marca, fill_value=0)
+        self.conteo_edad = self.conteo_edad.add(otro.conteo_edad, fill_value=0)
+        self.conteo_mes = self.conteo_mes.add(otro.conteo_mes, fill_value=0)
+
+    def resultado(self):
+        conteo_marca = self.conteo_marca.sort_index()
+        por_marca = pd.DataFrame({
+            "marca_auto": conteo_marca.index.astype(object),
+            "registros": conteo_marca.to_numpy(dtype=np.int64),
+            "autonomia_promedio": (self.suma_marca.reindex(conteo_marca.index) / conteo_marca).to_numpy(dtype=float),
+        })
+        conteo_edad = self.conteo_edad.sort_index()
+        por_edad = pd.DataFrame({
+            "edad": conteo_edad.index.to_numpy(dtype=float),
+            "registros": conteo_edad.to_numpy(dtype=np.int64),
+        })
+        conteo_mes = self.conteo_mes.sort_index()
+        por_mes = pd.DataFrame({
+            "year_month": [mes.strftime("%Y-%m") for mes in conteo_mes.index],
+            "count": conteo_mes.to_numpy(dtype=np.int64),
+        })
+        return ResultadoCubo(
+            registros=self.registros,
+            suma_edad=float(self.suma_edad),
+            suma_cuadrados_edad=float(self.suma_cuadrados_edad),
+            suma_autonomia=float(self.suma_autonomia),
+            suma_cuadrados_autonomia=float(self.suma_cuadrados_autonomia),
+            por_marca=por_marca,
+            por_edad=por_edad,
+            por_mes=por_mes,
+            celdas=np.empty(0, dtype=np.int64),  # Sin cubo: no hay celdas ni filas que localizar
+            filas_parciales=np.empty(0, dtype=np.int64),
+        )
+
+
+class RegistrosParticionados:
+    """Consultas del tablero sobre el dataset particionado, con la misma interfaz que `CuboRegistros`."""
+
+    def __init__(self, ruta, metadatos, trabajadores=TRABAJADORES, filas_por_lote=FILAS_POR_LOTE):
+        import pyarrow.dataset as ds
+
+        self.ruta = Path(ruta)
+        self.dataset = ds.dataset(
+            self.ruta,
+            format="parquet",
+            partitioning=ds.partitioning(_esquema_particiones(), flavor="hive"),
+        )
+        self.metadatos = metadatos
+        self.columnas = metadatos["columnas"]
+        self.filas_totales = metadatos["filas"]
+        self.valores = metadatos["valores"]
+        self.extremos = {col: tuple(valores) for col, valores in metadatos["extremos"].items()}
+        for col in COLUMNAS_RANGO:
+            self.extremos.setdefault(col, (0, 0))
+        self.trabajadores = trabajadores
+        self.filas_por_lote = filas_por_lote
+
+    def __len__(self):
+        return self.filas_totales
+
+    @staticmethod
+    def expresiones(lugares, marcas, años, edades, autonomias, tipos_carga, baterias):
+        """Los filtros del tablero como expresiones de `pyarrow.dataset`: (particiones, filas).
+
+        Van por separado porque las columnas de partición no existen dentro de los
+        archivos y las estadísticas de los grupos de filas solo admiten columnas físicas.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        def texto(valores):
+            # Con tipo explícito, para que una selección vacía no quede como lista de nulos
+            return pa.array(list(valores), type=pa.string())
+
+        particion = ds.field("lugar_registro").isin(texto(lugares))
+        filas = (
+            ds.field("marca_auto").isin(texto(marcas))
+            & ds.field("tipo_carga").isin(texto(tipos_carga))
+            & ds.field("baterias_recicladas").isin(texto(baterias))
+        )
+        for col, (desde, hasta) in (("año_modelo", años), ("edad", edades), ("autonomia_km", autonomias)):
+            filas &= (ds.field(col) >= desde) & (ds.field(col) <= hasta)
+        return particion, filas
+
+    def grupos(self, particion, filas):
+        """Grupos de filas que pueden contener filas que cumplen los filtros.
+
+        `get_fragments` descarta las particiones por su ruta y `split_by_row_group`
+        descarta los grupos de filas por las estadísticas de cada columna.
+        """
+        return [
+            grupo
+            for fragmento in self.dataset.get_fragments(filter=particion)
+            for grupo in fragmento.split_by_row_group(filter=filas)
+        ]
+
+    def _recorrer(self, grupo, filas):
+        parcial = _Parcial()
+        for lote in grupo.to_batches(
+            columns=COLUMNAS_AGREGADO,
+            filter=filas,
+            batch_size=self.filas_por_lote,
+            batch_readahead=1,
+            use_threads=False,  # El paralelismo viene del pool: un lote en memoria por hilo
+        ):
+            parcial.agregar(lote)
+        return parcial
+
+    def consultar(self, lugares, marcas, años, edades, autonomias, tipos_carga, baterias):
+        """Agregados de las filas que cumplen los filtros del tablero."""
+        particion, filas = self.expresiones(lugares, marcas, años, edades, autonomias, tipos_carga, baterias)
+        total = _Parcial()
+        grupos = self.grupos(particion, filas)
+        if grupos:
+            with ThreadPoolExecutor(max_workers=min(self.trabajadores, len(grupos))) as pool:
+                for parcial in pool.map(lambda grupo: self._recorrer(grupo, filas), grupos):
+                    total.combinar(parcial)
+        return total.resultado()
+
+    def muestra(self, lugares, marcas, años, edades, autonomias, tipos_carga, baterias, limite=MAX_MUESTRA):
+        """Las primeras `limite` filas que cumplen los filtros, con las columnas del CSV."""
+        particion, filas = self.expresiones(lugares, marcas, años, edades, autonomias, tipos_carga, baterias)
+        tabla = self.dataset.scanner(columns=self.columnas, filter=particion & filas, batch_size=self.filas_por_lote).head(limite)
+        return tabla.to_pandas()
+
+
+if __name__ == "__main__":
+    import sys
+
+    ruta = construir(sys.argv[1]) if len(sys.argv) > 1 else construir()
+    print(f"Dataset particionado generado en {ruta}")
@@ -0,0 +1,295 @@
+"""Precalentamiento y refresco en segundo plano de los datos de las páginas.
+
+Un hilo por proceso (`iniciar()`, idempotente; lo arranca la primera página que
+se ejecuta, porque Streamlit no tiene un gancho de arranque del servidor) mantiene
+al día cada fuente de datos:
+
+- las tablas de la API (una fuente por endpoint): se cargan todas al arrancar y
+  se vuelven a sincronizar `ANTELACION` segundos antes de que caduquen (`TTL_API`),
+- el registro de carros eléctricos: al arrancar se prepara su caché en disco
+  (columnar, o particionada con la muestra del modo aproximado, según
+  `particiones_ev.recomendado()`) y cada
+  `INTERVALO_DATASET` segundos se comprueba si cambió el CSV.
+
+Cada carga nueva se publica de golpe (`Carga` inmutable que se sustituye
+entera): las sesiones que ya tenían la anterior siguen con ella y las
+siguientes reciben la nueva. Antes de publicarla se ejecutan los `derivado`s
+de la fuente (índices, cubos...), de modo que las cachés de la versión nueva
+ya están hechas cuando alguien la pide. Si el contenido no cambió (misma
+versión), se conserva la carga anterior y no se recalcula nada.
+
+Los derivados los registran los módulos que los construyen al importarse, con
+argumentos fijos (no dependen de lo que tenga elegido ninguna sesión), y guardan
+lo que construyen con `por_version`: una caché del proceso, sin Streamlit, que
+el hilo de refresco llena y las páginas leen.
+
+`obtener(nombre)` nunca espera a un refresco: devuelve la carga vigente y, si
+está caducada, despierta al hilo y sirve la anterior mientras tanto. Solo la
+primera carga de una fuente se hace en el hilo de quien la pide (agrupando a
+los que llegan a la vez). Si la carga falla, el error se repite sin volver a
+intentarlo durante `ESPERA_ERROR` segundos, mientras el hilo reintenta detrás.
+
+`refrescar(*nombres)` fuerza el refresco de fuentes concretas (botones de las
+páginas), sin tocar el resto. MIPROYECTO_REFRESCO=0 desactiva el hilo: las
+fuentes caducadas se recargan entonces al pedirlas.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+TTL_API = 300  # Segundos que se consideran vigentes las tablas de la API
+ANTELACION = 60  # Se refrescan este tiempo antes de caducar
+INTERVALO_DATASET = 60  # Segundos entre comprobaciones del CSV de carros
+ESPERA_ERROR = 30  # Segundos antes de reintentar una carga fallida
+MAX_VERSIONES = 2  # Versiones de cada objeto de `por_version`: la vigente y la que aún puedan mostrar otras sesiones
+ACTIVO = os.environ.get("MIPROYECTO_REFRESCO", "1") != "0"
+
+_fuentes = {}
+_fuentes_lock = threading.Lock()
+_hilo = None
+_ejecutor = None
+_despertar = threading.Event()
+_derivados = {}  # fuente -> {clave: funcion(carga)}
+_versiones = {}  # nombre -> OrderedDict(version -> objeto), de la más antigua a la más reciente
+_versiones_lock = threading.Lock()
+_construyendo = {}  # nombre -> Lock: cada versión se construye una sola vez aunque la pidan varios hilos
+
+
+class Carga(NamedTuple):
+    version: Any  # Identifica el contenido; las cachés derivadas se indexan por ella
+    valor: Any  # DataFrame de la tabla, o None si la fuente solo prepara archivos
+    cargada_en: float  # time.monotonic() del último refresco correcto
+
+
+class Fuente:
+    """Una fuente de datos con su carga vigente y su calendario de refresco."""
+
+    def __init__(self, nombre, cargar, intervalo, ttl=None, comprobar=None):
+        self.nombre = nombre
+        self.cargar = cargar  # () -> (version, valor)
+        self.intervalo = intervalo
+        self.ttl = ttl  # Edad a partir de la cual la carga se sirve como caducada, o None
+        self.comprobar = comprobar  # () -> version actual sin cargar nada (barato), o None
+        self.carga = None
+        self.error = None
+        self.fallo_en = None
+        self.proxima = 0.0  # time.monotonic() del próximo refresco programado
+        self.en_curso = False
+        self.refrescos = 0
+        self.lock = threading.Lock()
+
+    def caducada(self, carga):
+        if self.ttl is not None and time.monotonic() - carga.cargada_en >= self.ttl:
+            return True
+        return self.comprobar is not None and self.comprobar() != carga.version
+
+
+def _cargar_api(tipo):
+    from utilidades import api_eventos, compartido, sincronizacion, snapshots
+
+    # asistenciaeventos y participantes se sincronizan de forma incremental
+    df = sincronizacion.sincronizar(tipo)
+    version = snapshots.version(tipo)
+    if version is None:
+        # Sin snapshot en disco no hay forma de saber si cambió: cada carga es una versión nueva
+        version = (tipo, "sin_snapshot", time.time())
+    else:
+        df = compartido.compartir(tipo, df, version)
+        api_eventos.recordar(tipo, df)  # El respaldo en memoria también pasa a ser la vista compartida
+    df.attrs["version"] = version
+    return version, df
+
+
+def _cargar_dataset():
+    from utilidades import aproximado_ev, dataset_ev, particiones_ev
+
+    version = dataset_ev.version()
+    if particiones_ev.recomendado():
+        aproximado_ev.abrir()  # Dataset particionado, y con él la muestra y los bocetos del modo aproximado
+    else:
+        dataset_ev.ruta_columnar()
+    return version, None
+
+
+def _registrar_fuentes():
+    from utilidades import dataset_ev
+    from utilidades import derivados_ev, indices_eventos  # Registran sus derivados al importarse
+    from utilidades.api_eventos import API_ENDPOINTS
+
+    with _fuentes_lock:
+        if _fuentes:
+            return
+        for tipo in API_ENDPOINTS:
+            _fuentes[tipo] = Fuente(tipo, lambda tipo=tipo: _cargar_api(tipo), TTL_API - ANTELACION, ttl=TTL_API)
+        _fuentes["carros"] = Fuente("carros", _cargar_dataset, INTERVALO_DATASET, comprobar=dataset_ev.version)
+
+
+def iniciar():
+    """Registra las fuentes y arranca el hilo de refresco del proceso (una sola vez)."""
+    global _hilo, _ejecutor
+    _registrar_fuentes()
+    if not ACTIVO:
+        return
+    with _fuentes_lock:
+        if _hilo is None:
+            _ejecutor = ThreadPoolExecutor(len(_fuentes), thread_name_prefix="refresco")
+            _hilo = threading.Thread(target=_bucle, name="refresco", daemon=True)
+            _hilo.start()
+
+
+def _bucle():
+    while True:
+        _despertar.clear()
+        ahora = time.monotonic()
+        for fuente in list(_fuentes.values()):
+            if not fuente.en_curso and fuente.proxima <= ahora:
+                fuente.en_curso = True  # Evita programarla dos veces mientras espera en el pool
+                _ejecutor.submit(_refrescar_en_fondo, fuente)
+        pendientes = [fuente.proxima for fuente in _fuentes.values() if not fuente.en_curso]
+        espera = min(pendientes, default=ahora + INTERVALO_DATASET) - time.monotonic()
+        if espera > 0:
+            _despertar.wait(espera)
+
+
+def _refrescar_en_fondo(fuente):
+    try:
+        _actualizar(fuente)
+    except Exception:
+        pass  # Queda anotado en la fuente y se reintenta a los ESPERA_ERROR segundos
+    finally:
+        fuente.en_curso = False
+        _despertar.set()
+
+
+def _actualizar(fuente, forzar=False):
+    pedida = time.monotonic()
+    with fuente.lock:
+        anterior = fuente.carga
+        if not forzar and anterior is not None and anterior.cargada_en >= pedida:
+            return anterior  # Otro hilo la acaba de refrescar mientras se esperaba el lock
+        try:
+            if not forzar and anterior is not None and fuente.comprobar is not None and fuente.comprobar() == anterior.version:
+                nueva = anterior._replace(cargada_en=time.monotonic())
+            else:
+                version, valor = fuente.cargar()
+                if not forzar and anterior is not None and version == anterior.version:
+                    # Mismo contenido: se conserva el objeto publicado y sus cachés derivadas
+                    nueva = anterior._replace(cargada_en=time.monotonic())
+                else:
+                    nueva = Carga(version, valor, time.monotonic())
+                    for derivado in list(_derivados.get(fuente.nombre, {}).values()):
+                        try:
+                            derivado(nueva)
+                        except Exception:
+                            pass  # La página lo recalculará al pedirlo
+        except Exception as e:
+            fuente.error = e
+            fuente.fallo_en = time.monotonic()
+            fuente.proxima = fuente.fallo_en + ESPERA_ERROR
+            raise
+        fuente.carga = nueva
+        fuente.error = None
+        fuente.refrescos += 1
+        fuente.proxima = nueva.cargada_en + fuente.intervalo
+        return nueva
+
+
+def _fuente(nombre):
+    iniciar()
+    return _fuentes[nombre]
+
+
+def obtener(nombre):
+    """`Carga` vigente de la fuente `nombre`, sin esperar a refrescos.
+
+    Solo espera si la fuente no se ha cargado nunca. Propaga el error de la
+    última carga fallida si no hay ninguna carga buena que servir.
+    """
+    fuente = _fuente(nombre)
+    carga = fuente.carga
+    if carga is None:
+        if fuente.error is not None and time.monotonic() - fuente.fallo_en < ESPERA_ERROR:
+            raise fuente.error
+        from utilidades import trazas
+
+        trazas.fallo_cache()
+        return _actualizar(fuente)
+    if fuente.caducada(carga):
+        if not ACTIVO:
+            return _actualizar(fuente)
+        if fuente.error is None:
+            fuente.proxima = 0.0  # Se sirve la anterior y el hilo la refresca ya
+            _despertar.set()
+    return carga
+
+
+def tabla(nombre):
+    """DataFrame vigente de la fuente `nombre` (ver `obtener`)."""
+    return obtener(nombre).valor
+
+
+def derivado(nombre, clave, funcion):
+    """Registra `funcion(carga)` para preparar las cachés de cada versión nueva de `nombre` antes de publicarla.
+
+    Se llama al importar el módulo que construye esas cachés: `funcion` se
+    ejecuta en el hilo de refresco, así que no debe usar Streamlit.
+    """
+    _derivados.setdefault(nombre, {})[clave] = funcion
+
+
+def por_version(nombre, version, construir):
+    """El objeto `nombre` de `version`: lo construye `construir()` la primera vez y se comparte en el proceso.
+
+    Se conservan las `MAX_VERSIONES` más recientes de cada nombre.
+    """
+    with _versiones_lock:
+        versiones = _versiones.setdefault(nombre, OrderedDict())
+        if version in versiones:
+            versiones.move_to_end(version)
+            return versiones[version]
+        bloqueo = _construyendo.setdefault(nombre, threading.Lock())
+    with bloqueo:
+        with _versiones_lock:
+            if version in versiones:
+                return versiones[version]
+        from utilidades import trazas
+
+        trazas.fallo_cache()
+        objeto = construir()
+        with _versiones_lock:
+            versiones[version] = objeto
+            while len(versiones) > MAX_VERSIONES:
+                versiones.popitem(last=False)
+    return objeto
+
+
+def olvidar(*nombres):
+    """Descarta los objetos de `por_version` de `nombres` (p. ej. al recargar los datos a mano)."""
+    with _versiones_lock:
+        for nombre in nombres:
+            _versiones.pop(nombre, None)
+
+
+def refrescar(*nombres):
+    """Recarga ya las fuentes `nombres` (en paralelo) y espera a que terminen. Devuelve los errores por fuente."""
+    fuentes = [_fuente(nombre) for nombre in nombres]
+    with ThreadPoolExecutor(max(1, len(fuentes)), thread_name_prefix="refrescar") as ejecutor:
+        futuros = {ejecutor.submit(_actualizar, fuente, True): fuente.nombre for fuente in fuentes}
+        wait(futuros)
+    return {nombre: futuro.exception() for futuro, nombre in futuros.items() if futuro.exception() is not None}
+
+
+def estado(nombre):
+    """Edad de la carga, segundos hasta el próximo refresco, refrescos hechos y último error de `nombre`."""
+    fuente = _fuente(nombre)
+    carga, ahora = fuente.carga, time.monotonic()
+    return {
+        "edad": None if carga is None else ahora - carga.cargada_en,
+        "proximo": None if not ACTIVO else max(0.0, fuente.proxima - ahora),
+        "en_curso": fuente.en_curso,
+        "refrescos": fuente.refrescos,
+        "error": fuente.error,
+    }
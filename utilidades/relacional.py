@@ -0,0 +1,235 @@
+"""Almacén relacional en memoria para las tablas de eventos.
+
+Se construye una vez por refresco de datos. Las claves foráneas (`id_evento`,
+`id_participante`, `id_estudiante`, `id_categoria_evento`) se codifican con un
+diccionario común por clave, de modo que todas las tablas comparten los mismos
+códigos enteros. Con esos códigos se crean:
+
+- un índice hash (el diccionario, un `pd.Index`) de valor -> código,
+- un vector código -> fila en la tabla dueña de la clave (p. ej. `eventos`),
+- índices ordenados código -> filas en las tablas que la referencian.
+
+Las vistas desnormalizadas y los resúmenes por evento y por categoría se
+calculan al construir el almacén, así que consultarlos es una búsqueda y no un
+`merge` en cada rerun de Streamlit.
+"""
+import numpy as np
+import pandas as pd
+
+# Clave -> tabla en la que es clave primaria
+CLAVES = {
+    "id_evento": "eventos",
+    "id_participante": "participantes",
+    "id_estudiante": "estudiantes",
+    "id_categoria_evento": "categoriaevento",
+}
+
+# Columnas que aporta cada tabla a las vistas desnormalizadas
+COLUMNAS_VISTA = {
+    "participantes": ["id_estudiante", "id_evento", "rol", "fecha_registro"],
+    "estudiantes": ["nombre", "apellido", "correo", "carrera", "semestre", "grado", "grupo"],
+    "eventos": ["nombre_evento", "fecha_evento", "ubicacion", "cupo_maximo", "id_categoria_evento"],
+    "categoriaevento": ["nombre_categoria"],
+}
+
+
+class AlmacenEventos:
+    """Tablas de eventos con claves codificadas, índices y vistas precalculadas."""
+
+    def __init__(self, datos):
+        self.tablas = {tipo: df.reset_index(drop=True) for tipo, df in datos.items() if df is not None}
+        self.diccionarios = {}  # clave -> pd.Index con los valores distintos
+        self.codigos = {}  # (tabla, clave) -> np.ndarray[int32], -1 si falta
+        self.posicion = {}  # clave -> np.ndarray código -> fila en la tabla dueña
+        self.indices = {}  # (tabla, clave) -> (orden, límites) para buscar filas por código
+        self._codificar()
+        self.vista_participantes = self._construir_vista_participantes()
+        self.vista_asistencia = self._construir_vista_asistencia()
+        self.resumen_eventos = self._construir_resumen_eventos()
+        self.resumen_categorias = self._construir_resumen_categorias()
+
+    # --- Codificación e índices ---
+
+    def _codificar(self):
+        for clave, duena in CLAVES.items():
+            columnas = [(tipo, df[clave]) for tipo, df in self.tablas.items() if clave in df.columns]
+            if not columnas:
+                continue
+            valores = pd.concat([serie.dropna() for _, serie in columnas], ignore_index=True)
+            diccionario = pd.Index(valores.unique())
+            self.diccionarios[clave] = diccionario
+            for tipo, serie in columnas:
+                codigos = diccionario.get_indexer(serie).astype(np.int32)
+                self.codigos[(tipo, clave)] = codigos
+                if tipo != duena:
+                    # Índice ordenado tipo CSR: filas con código k = orden[límites[k]:límites[k + 1]]
+                    orden = np.argsort(codigos, kind="stable")
+                    conteos = np.bincount(codigos[codigos >= 0], minlength=len(diccionario))
+                    inicio = np.count_nonzero(codigos < 0)
+                    limites = np.concatenate(([0], np.cumsum(conteos))) + inicio
+                    self.indices[(tipo, clave)] = (orden, limites)
+            if (duena, clave) in self.codigos:
+                posicion = np.full(len(diccionario), -1, dtype=np.int64)
+                codigos = self.codigos[(duena, clave)]
+                validos = codigos >= 0
+                posicion[codigos[validos]] = np.flatnonzero(validos)
+                self.posicion[clave] = posicion
+
+    def codigo(self, clave, valor):
+        """Código entero de `valor` para `clave`, o -1 si no existe."""
+        diccionario = self.diccionarios.get(clave)
+        if diccionario is None:
+            return -1
+        return int(diccionario.get_indexer([valor])[0])
+
+    def filas(self, tipo, clave, valor):
+        """Posiciones de las filas de `tipo` cuya columna `clave` vale `valor`."""
+        codigo = self.codigo(clave, valor)
+        if codigo < 0 or (tipo, clave) not in self.indices:
+            return np.empty(0, dtype=np.int64)
+        orden, limites = self.indices[(tipo, clave)]
+        return orden[limites[codigo]:limites[codigo + 1]]
+
+    def _enlazar(self, tipo, clave, filas=None):
+        # Filas de la tabla dueña de `clave` referenciadas desde `tipo` (-1 si no hay)
+        codigos = self.codigos.get((tipo, clave))
+        posicion = self.posicion.get(clave)
+        if codigos is None or posicion is None:
+            return None
+        if filas is not None:
+            codigos = np.where(filas >= 0, codigos[np.maximum(filas, 0)], -1)
+        return np.where(codigos >= 0, posicion[np.maximum(codigos, 0)], -1)
+
+    def _tomar(self, tipo, filas, excluir):
+        # Columnas de `tipo` para las filas dadas; las filas -1 quedan en NaN
+        columnas = [c for c in COLUMNAS_VISTA[tipo] if c in self.tablas[tipo].columns and c not in excluir]
+        return self.tablas[tipo][columnas].reindex(filas).reset_index(drop=True)
+
+    # --- Vistas desnormalizadas ---
+
+    def _completar(self, vista, tipo, filas_origen=None):
+        # Añade estudiante, evento y categoría siguiendo las claves desde `tipo`
+        partes = [vista]
+        filas_estudiante = self._enlazar(tipo, "id_estudiante", filas_origen)
+        if filas_estudiante is not None:
+            partes.append(self._tomar("estudiantes", filas_estudiante, vista.columns))
+        filas_evento = self._enlazar(tipo, "id_evento", filas_origen)
+        if filas_evento is not None:
+            partes.append(self._tomar("eventos", filas_evento, vista.columns))
+            filas_categoria = self._enlazar("eventos", "id_categoria_evento", filas_evento)
+            if filas_categoria is not None:
+                partes.append(self._tomar("categoriaevento", filas_categoria, vista.columns))
+        return pd.concat(partes, axis=1)
+
+    def _asistio(self):
+        # Para cada participante: ¿hay un registro de asistencia con su id (y su evento)?
+        participantes = self.codigos.get(("participantes", "id_participante"))
+        asistentes = self.codigos.get(("asistenciaeventos", "id_participante"))
+        if participantes is None or asistentes is None:
+            return None
+        eventos_part = self.codigos.get(("participantes", "id_evento"))
+        eventos_asis = self.codigos.get(("asistenciaeventos", "id_evento"))
+        if eventos_part is None or eventos_asis is None:
+            return np.isin(participantes, asistentes[asistentes >= 0])
+        n = len(self.diccionarios["id_participante"])
+        pares_part = eventos_part.astype(np.int64) * n + participantes
+        pares_asis = eventos_asis.astype(np.int64) * n + asistentes
+        return np.isin(pares_part, pares_asis[(asistentes >= 0) & (eventos_asis >= 0)])
+
+    def _construir_vista_participantes(self):
+        if "participantes" not in self.tablas:
+            return pd.DataFrame()
+        vista = self._completar(self.tablas["participantes"], "participantes")
+        asistio = self._asistio()
+        if asistio is not None:
+            vista["asistio"] = asistio
+        return vista
+
+    def _construir_vista_asistencia(self):
+        if "asistenciaeventos" not in self.tablas:
+            return pd.DataFrame()
+        asistencia = self.tablas["asistenciaeventos"]
+        filas_participante = self._enlazar("asistenciaeventos", "id_participante")
+        if filas_participante is None:
+            return self._completar(asistencia, "asistenciaeventos")
+        # La asistencia llega al estudiante a través del participante
+        vista = pd.concat(
+            [asistencia, self._tomar("participantes", filas_participante, asistencia.columns)], axis=1
+        )
+        partes = [vista]
+        filas_estudiante = self._enlazar("participantes", "id_estudiante", filas_participante)
+        if filas_estudiante is not None:
+            partes.append(self._tomar("estudiantes", filas_estudiante, vista.columns))
+        vista = pd.concat(partes, axis=1)
+        return self._completar(vista, "asistenciaeventos")
+
+    # --- Resúmenes ---
+
+    def _conteo_por_evento(self, tipo, mascara=None):
+        codigos = self.codigos.get((tipo, "id_evento"))
+        if codigos is None:
+            return None
+        if mascara is not None:
+            codigos = codigos[mascara]
+        return np.bincount(codigos[codigos >= 0], minlength=len(self.diccionarios["id_evento"]))
+
+    def _construir_resumen_eventos(self):
+        if "eventos" not in self.tablas or ("eventos", "id_evento") not in self.codigos:
+            return pd.DataFrame()
+        eventos = self.tablas["eventos"]
+        codigos = self.codigos[("eventos", "id_evento")]
+        resumen = eventos[[c for c in ["id_evento", *COLUMNAS_VISTA["eventos"]] if c in eventos.columns]].copy()
+        inscritos = self._conteo_por_evento("participantes")
+        asistencias = self._conteo_por_evento("asistenciaeventos")
+        validos = np.maximum(codigos, 0)
+        resumen["inscritos"] = np.where(codigos >= 0, inscritos[validos], 0) if inscritos is not None else 0
+        resumen["asistencias"] = np.where(codigos >= 0, asistencias[validos], 0) if asistencias is not None else 0
+        asistio = self.vista_participantes.get("asistio")
+        if asistio is not None:
+            ausentes = self._conteo_por_evento("participantes", ~asistio.to_numpy(dtype=bool))
+            resumen["ausentes"] = np.where(codigos >= 0, ausentes[validos], 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resumen["tasa_asistencia"] = np.where(
+                resumen["inscritos"] > 0, resumen["asistencias"] / resumen["inscritos"], np.nan
+            )
+            if "cupo_maximo" in resumen.columns:
+                cupo = pd.to_numeric(resumen["cupo_maximo"], errors="coerce").to_numpy(dtype=float)
+                resumen["ocupacion"] = np.where(cupo > 0, resumen["inscritos"] / cupo, np.nan)
+        filas_categoria = self._enlazar("eventos", "id_categoria_evento")
+        if filas_categoria is not None:
+            resumen = pd.concat(
+                [resumen, self._tomar("categoriaevento", filas_categoria, resumen.columns)], axis=1
+            )
+        return resumen
+
+    def _construir_resumen_categorias(self):
+        resumen = self.resumen_eventos
+        if resumen.empty or "id_categoria_evento" not in resumen.columns:
+            return pd.DataFrame()
+        claves = ["id_categoria_evento"] + (["nombre_categoria"] if "nombre_categoria" in resumen.columns else [])
+        metricas = [c for c in ["inscritos", "asistencias", "ausentes"] if c in resumen.columns]
+        # Los eventos son pocos: agregar sobre el resumen por evento es barato
+        por_categoria = resumen.groupby(claves, dropna=False)[metricas].sum()
+        por_categoria.insert(0, "eventos", resumen.groupby(claves, dropna=False).size())
+        por_categoria = por_categoria.reset_index()
+        por_categoria["tasa_asistencia"] = (
+            por_categoria["asistencias"] / por_categoria["inscritos"].where(por_categoria["inscritos"] > 0)
+        )
+        return por_categoria
+
+    # --- Consultas ---
+
+    def asistencia_de_evento(self, id_evento):
+        """Registros de asistencia desnormalizados de un evento."""
+        return self.vista_asistencia.iloc[self.filas("asistenciaeventos", "id_evento", id_evento)]
+
+    def participantes_de_evento(self, id_evento):
+        """Inscritos desnormalizados de un evento."""
+        return self.vista_participantes.iloc[self.filas("participantes", "id_evento", id_evento)]
+
+    def ausentes(self, id_evento=None):
+        """Inscritos que no registraron asistencia (de un evento o de todos)."""
+        vista = self.vista_participantes if id_evento is None else self.participantes_de_evento(id_evento)
+        if "asistio" not in vista.columns:
+            return vista.iloc[0:0]
+        return vista[~vista["asistio"]]
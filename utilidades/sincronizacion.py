@@ -0,0 +1,198 @@
+"""Sincronización incremental de los endpoints que solo crecen.
+
+La asistencia y los participantes solo acumulan registros, así que en lugar de
+descargar la colección completa en cada refresco se guarda una marca de agua
+(el mayor id o, si no hay id, la fecha más reciente) en los metadatos del
+snapshot y se piden solo los registros posteriores, paginando si la API lo
+admite. Las filas nuevas se añaden como una parte más del snapshot sin
+reescribir las anteriores.
+
+La petición incremental lleva también las cabeceras condicionales del
+snapshot: si la colección no ha cambiado, el servidor puede responder 304 sin
+mirar los parámetros.
+
+Lo que devuelve la petición incremental se añade siempre al snapshot, salvo
+que la API haya ignorado el filtro (`filtro_ignorado`): entonces la respuesta
+es la colección completa y sustituye al snapshot. Los refrescos siguientes usan
+la petición condicional de `api_eventos.descargar` (que sí puede acabar en
+304) y no se vuelve a probar la incremental hasta pasado INTERVALO_RESYNC. Si
+el resultado no pasa la comprobación de consistencia, se hace un resync
+completo.
+"""
+import time
+
+import pandas as pd
+
+from utilidades import api_eventos, esquemas, snapshots
+
+# Endpoint -> (columna id, columna fecha) candidatas a marca de agua
+INCREMENTALES = {
+    "asistenciaeventos": ("id_asistencia", "fecha_asistencia"),
+    "participantes": ("id_participante", "fecha_registro"),
+}
+
+# Parámetros de consulta para pedir solo lo nuevo y paginar
+PARAMETRO_DESDE_ID = "desde_id"
+PARAMETRO_DESDE_FECHA = "desde_fecha"
+PARAMETRO_PAGINA = "pagina"
+PARAMETRO_POR_PAGINA = "por_pagina"
+POR_PAGINA = 1000
+MAX_PAGINAS = 100
+
+MAX_PARTES = 16  # Al superarlas se compacta el snapshot en un solo archivo
+INTERVALO_RESYNC = 6 * 3600  # Resync completo periódico como red de seguridad
+
+
+def marca_de_agua(tipo, df):
+    """(columna, valor) de la marca de agua de `df`, o (None, None)."""
+    columna_id, columna_fecha = INCREMENTALES[tipo]
+    if df.empty:
+        return None, None
+    if columna_id in df.columns and pd.api.types.is_integer_dtype(df[columna_id]):
+        return columna_id, int(df[columna_id].max())
+    if columna_fecha in df.columns:
+        fechas = pd.to_datetime(df[columna_fecha], errors="coerce").dropna()
+        if not fechas.empty:
+            return columna_fecha, fechas.max().isoformat()
+    return None, None
+
+
+def es_consistente(tipo, df, metadatos):
+    """Comprueba que el frame acumulado cuadra con sus metadatos."""
+    columna_id = INCREMENTALES[tipo][0]
+    if columna_id in df.columns and df[columna_id].duplicated().any():
+        return False
+    if metadatos.get("filas") is not None and metadatos["filas"] != len(df):
+        return False
+    columna, valor = marca_de_agua(tipo, df)
+    return columna == metadatos.get("marca_columna") and valor == metadatos.get("marca_valor")
+
+
+def filtro_ignorado(tipo, nuevos, columna, valor):
+    """True si la respuesta incremental trae registros que ya cubría la marca de agua.
+
+    Una API que respeta el filtro solo devuelve registros posteriores, así que
+    cualquiera en la marca o por debajo indica que lo ignoró. El número de
+    filas no sirve: un lote de filas nuevas puede ser mayor que todo el
+    snapshot. Con marca por fecha se admiten los de la misma fecha, que pueden
+    repetirse.
+    """
+    if columna not in nuevos.columns:
+        return False
+    if columna == INCREMENTALES[tipo][0]:
+        return bool((nuevos[columna] <= valor).any())
+    return bool((pd.to_datetime(nuevos[columna], errors="coerce") < pd.Timestamp(valor)).any())
+
+
+def _descargar_desde(tipo, columna, valor, metadatos):
+    # (registros nuevos, validadores de la respuesta), o (None, None) si el servidor respondió 304
+    parametro = PARAMETRO_DESDE_ID if columna == INCREMENTALES[tipo][0] else PARAMETRO_DESDE_FECHA
+    sesion = api_eventos.obtener_sesion()
+    registros = []
+    anterior = None
+    validadores = None
+    for pagina in range(1, MAX_PAGINAS + 1):
+        response = sesion.get(
+            api_eventos.API_ENDPOINTS[tipo],
+            params={parametro: valor, PARAMETRO_PAGINA: pagina, PARAMETRO_POR_PAGINA: POR_PAGINA},
+            headers=snapshots.cabeceras_condicionales(metadatos) if pagina == 1 else None,
+            timeout=api_eventos.TIMEOUT_CON_SNAPSHOT,
+        )
+        if response.status_code == 304:
+            return None, None
+        response.raise_for_status()
+        if validadores is None:
+            validadores = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        lote = response.json()
+        if not isinstance(lote, list):
+            raise ValueError(f"Respuesta inesperada de {tipo}: se esperaba una lista")
+        if lote == anterior:
+            break  # La API ignora la paginación y repite la misma página
+        registros.extend(lote)
+        if len(lote) != POR_PAGINA:
+            break
+        anterior = lote
+    return pd.DataFrame(registros), validadores
+
+
+def resync_completo(tipo, directorio=snapshots.DIRECTORIO, **metadatos):
+    """Descarga la colección completa de `tipo` (petición condicional) y reinicia su marca de agua.
+
+    `metadatos` se conserva en el snapshot (p. ej. `filtro_ignorado_en`).
+    """
+    df = api_eventos.descargar(tipo, directorio=directorio)
+    columna, valor = marca_de_agua(tipo, df)
+    snapshots.anotar(
+        tipo,
+        directorio,
+        marca_columna=columna,
+        marca_valor=valor,
+        resync_completo_en=time.time(),
+        **metadatos,
+    )
+    return df
+
+
+def _guardar(tipo, df, directorio, **metadatos):
+    columna, valor = marca_de_agua(tipo, df)
+    snapshots.guardar(tipo, df, directorio=directorio, marca_columna=columna, marca_valor=valor, **metadatos)
+    api_eventos.recordar(tipo, df)
+    return api_eventos.con_origen(df, "incremental", time.time())
+
+
+def sincronizar(tipo, completo=False, directorio=snapshots.DIRECTORIO):
+    """Devuelve el DataFrame actualizado de `tipo`, de forma incremental si se puede.
+
+    Los endpoints que no están en `INCREMENTALES` se descargan completos con
+    `api_eventos.descargar`. Con `completo=True` se fuerza un resync completo.
+    """
+    if tipo not in INCREMENTALES:
+        return api_eventos.descargar(tipo, directorio=directorio)
+    metadatos = snapshots.leer_metadatos(tipo, directorio)
+    base = api_eventos.ultimo_bueno(tipo, directorio)
+    columna, valor = metadatos.get("marca_columna"), metadatos.get("marca_valor")
+    vencido = time.time() - metadatos.get("resync_completo_en", 0) > INTERVALO_RESYNC
+    filtro_ignorado_en = metadatos.get("filtro_ignorado_en")
+    if filtro_ignorado_en is not None and time.time() - filtro_ignorado_en < INTERVALO_RESYNC:
+        # La API no admite la petición incremental: la condicional completa al menos puede dar 304
+        return resync_completo(tipo, directorio, filtro_ignorado_en=filtro_ignorado_en)
+    if completo or base is None or columna is None or vencido:
+        return resync_completo(tipo, directorio)
+
+    nuevos, validadores = _descargar_desde(tipo, columna, valor, metadatos)
+    if nuevos is None or nuevos.empty:
+        snapshots.marcar_validado(tipo, directorio)
+        return api_eventos.con_origen(base, "no_modificado", time.time())
+    nuevos = esquemas.aplicar(tipo, nuevos)
+    columna_id = INCREMENTALES[tipo][0]
+    if filtro_ignorado(tipo, nuevos, columna, valor) and (
+        columna_id not in nuevos.columns or base[columna_id].isin(nuevos[columna_id]).all()
+    ):
+        # La API ignoró el filtro y devolvió la colección completa (con todos los registros del
+        # snapshot; si solo trae algunos, son modificados y se combinan abajo): se guarda con sus
+        # validadores y los próximos refrescos usan la petición condicional completa
+        ahora = time.time()
+        return _guardar(tipo, nuevos, directorio, resync_completo_en=ahora, filtro_ignorado_en=ahora, **validadores)
+
+    resync_completo_en = metadatos.get("resync_completo_en")
+    if columna != columna_id or columna_id not in nuevos.columns:
+        # Marca por fecha: los registros del mismo día pueden repetirse
+        df = esquemas.concatenar(tipo, [base, nuevos]).drop_duplicates(ignore_index=True)
+        return _guardar(tipo, df, directorio, resync_completo_en=resync_completo_en, **validadores)
+    cambiados = base[columna_id].isin(nuevos[columna_id])
+    if cambiados.any():
+        # Registros anteriores modificados junto a los nuevos: se sustituyen y se reescribe el snapshot
+        df = esquemas.concatenar(tipo, [base[~cambiados], nuevos])
+        return _guardar(tipo, df, directorio, resync_completo_en=resync_completo_en, **validadores)
+
+    # Caso habitual: solo hay filas nuevas y se añaden como una parte más
+    df = esquemas.concatenar(tipo, [base, nuevos])
+    columna, valor = marca_de_agua(tipo, df)
+    if len(metadatos.get("partes", [])) >= MAX_PARTES or not snapshots.agregar(
+        tipo, nuevos, directorio, marca_columna=columna, marca_valor=valor, **validadores
+    ):
+        return _guardar(tipo, df, directorio, resync_completo_en=resync_completo_en, **validadores)
+    if not es_consistente(tipo, df, snapshots.leer_metadatos(tipo, directorio)):
+        return resync_completo(tipo, directorio)
+    api_eventos.recordar(tipo, df)
+    return api_eventos.con_origen(df, "incremental", time.time())
@@ -0,0 +1,174 @@
+"""Almacén local de snapshots de la API de eventos.
+
+Cada endpoint se guarda como un archivo Parquet (columnar y comprimido) junto a
+un JSON de metadatos con el ETag / Last-Modified de la respuesta que lo generó,
+para poder revalidarlo con peticiones condicionales y servirlo como respaldo
+cuando la API no responde.
+
+Las sincronizaciones incrementales no reescriben el archivo base: cada lote de
+filas nuevas se añade como una parte `<tipo>.parte-NNNN.parquet` listada en
+los metadatos, hasta que `guardar` vuelve a compactarlo todo en un solo archivo.
+"""
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utilidades.archivos import DIRECTORIO_CACHE, escribir_atomico
+
+DIRECTORIO = DIRECTORIO_CACHE / "eventos"
+
+
+def _rutas(tipo, directorio):
+    directorio = Path(directorio)
+    return directorio / f"{tipo}.parquet", directorio / f"{tipo}.json"
+
+
+def leer_metadatos(tipo, directorio=DIRECTORIO):
+    """Devuelve los metadatos del snapshot de `tipo`, o {} si no existe."""
+    ruta_datos, ruta_meta = _rutas(tipo, directorio)
+    if not ruta_datos.exists() or not ruta_meta.exists():
+        return {}
+    try:
+        return json.loads(ruta_meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def version(tipo, directorio=DIRECTORIO):
+    """Identifica el contenido del snapshot de `tipo` (cambia solo al reescribirlo o añadirle partes), o None."""
+    metadatos = leer_metadatos(tipo, directorio)
+    if not metadatos:
+        return None
+    ruta_datos, _ = _rutas(tipo, directorio)
+    try:
+        mtime_ns = ruta_datos.stat().st_mtime_ns
+    except OSError:
+        return None
+    return tipo, mtime_ns, tuple(metadatos.get("partes", [])), metadatos.get("filas")
+
+
+def cabeceras_condicionales(metadatos):
+    """Cabeceras If-None-Match / If-Modified-Since para revalidar un snapshot."""
+    cabeceras = {}
+    if metadatos.get("etag"):
+        cabeceras["If-None-Match"] = metadatos["etag"]
+    if metadatos.get("last_modified"):
+        cabeceras["If-Modified-Since"] = metadatos["last_modified"]
+    return cabeceras
+
+
+def _escribir_metadatos(ruta_meta, metadatos):
+    escribir_atomico(ruta_meta, lambda ruta: ruta.write_text(json.dumps(metadatos), encoding="utf-8"))
+
+
+def cargar(tipo, directorio=DIRECTORIO):
+    """Lee el snapshot de `tipo`, o devuelve None si no existe o está dañado."""
+    metadatos = leer_metadatos(tipo, directorio)
+    if not metadatos:
+        return None
+    ruta_datos, _ = _rutas(tipo, directorio)
+    try:
+        df = pd.read_parquet(ruta_datos)
+        partes = [pd.read_parquet(Path(directorio) / parte) for parte in metadatos.get("partes", [])]
+    except Exception:
+        return None
+    if partes:
+        df = pd.concat([df, *partes], ignore_index=True)
+    df.attrs["snapshot"] = {"origen": "snapshot", "guardado_en": metadatos.get("guardado_en")}
+    return df
+
+
+def guardar(tipo, df, etag=None, last_modified=None, directorio=DIRECTORIO, **extra):
+    """Guarda `df` como snapshot completo de `tipo`, descartando las partes.
+
+    `extra` se añade a los metadatos (p. ej. la marca de agua incremental).
+    Devuelve False si no se pudo escribir.
+    """
+    ruta_datos, ruta_meta = _rutas(tipo, directorio)
+    metadatos = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "guardado_en": time.time(),
+        "filas": len(df),
+        "partes": [],
+        **extra,
+    }
+    try:
+        ruta_datos.parent.mkdir(parents=True, exist_ok=True)
+        escribir_atomico(ruta_datos, lambda ruta: df.to_parquet(ruta, index=False, compression="zstd"))
+        _escribir_metadatos(ruta_meta, metadatos)
+    except Exception:
+        # Columnas con tipos mezclados o disco sin permisos: se sigue sin snapshot
+        return False
+    for parte in Path(directorio).glob(f"{tipo}.parte-*.parquet"):
+        parte.unlink(missing_ok=True)
+    return True
+
+
+def agregar(tipo, df_nuevos, directorio=DIRECTORIO, **extra):
+    """Añade `df_nuevos` al snapshot de `tipo` como una parte nueva.
+
+    Requiere que ya exista un snapshot base. `extra` actualiza los metadatos
+    (p. ej. la marca de agua y el ETag / Last-Modified de la respuesta
+    incremental, para revalidar contra ellos). Devuelve False si no se pudo
+    escribir; en ese caso conviene volver a guardar el snapshot completo.
+    """
+    metadatos = leer_metadatos(tipo, directorio)
+    if not metadatos:
+        return False
+    _, ruta_meta = _rutas(tipo, directorio)
+    partes = list(metadatos.get("partes", []))
+    nombre = f"{tipo}.parte-{len(partes) + 1:04d}.parquet"
+    try:
+        escribir_atomico(
+            Path(directorio) / nombre,
+            lambda ruta: df_nuevos.to_parquet(ruta, index=False, compression="zstd"),
+        )
+        metadatos.update(extra)
+        metadatos["partes"] = partes + [nombre]
+        metadatos["filas"] = metadatos.get("filas", 0) + len(df_nuevos)
+        metadatos["guardado_en"] = time.time()
+        _escribir_metadatos(ruta_meta, metadatos)
+    except Exception:
+        return False
+    return True
+
+
+def anotar(tipo, directorio=DIRECTORIO, **campos):
+    """Actualiza campos de los metadatos de un snapshot existente."""
+    metadatos = leer_metadatos(tipo, directorio)
+    if not metadatos:
+        return
+    metadatos.update(campos)
+    _, ruta_meta = _rutas(tipo, directorio)
+    try:
+        _escribir_metadatos(ruta_meta, metadatos)
+    except OSError:
+        pass
+
+
+def marcar_validado(tipo, directorio=DIRECTORIO):
+    """Registra que el servidor confirmó (304) que el snapshot sigue vigente."""
+    anotar(tipo, directorio, guardado_en=time.time())
+
+
+def formatear_segundos(segundos):
+    """Texto legible para una duración en segundos."""
+    segundos = max(0, int(segundos))
+    if segundos < 60:
+        return f"{segundos} s"
+    if segundos < 3600:
+        return f"{segundos // 60} min"
+    if segundos < 86400:
+        return f"{segundos // 3600} h {segundos % 3600 // 60} min"
+    return f"{segundos // 86400} días"
+
+
+def edad(df):
+    """Texto legible con la antigüedad del snapshot del que procede `df`."""
+    guardado_en = df.attrs.get("snapshot", {}).get("guardado_en")
+    if guardado_en is None:
+        return "desconocida"
+    return formatear_segundos(time.time() - guardado_en)
@@ -0,0 +1,388 @@
+"""Tiempos por etapa de cada rerun de las páginas.
+
+Cada página llama a `iniciar` al principio y a `cerrar` al final, y envuelve
+sus etapas (carga, filtros, agregados, figuras, tablas...) en `tramo`::
+
+    with trazas.tramo("cargar_datos", cacheado=True, endpoint=tipo) as t:
+        df = cargar_datos(tipo)
+        t.filas_salida = len(df)
+
+Un tramo registra el tiempo de reloj y, si se rellenan, las filas de entrada y
+de salida, los bytes producidos y si la caché acertó. Las funciones con
+`st.cache_data`/`st.cache_resource` llaman a `fallo_cache()` en su cuerpo, que
+solo se ejecuta cuando la caché falla, y eso marca el tramo `cacheado` que las
+envuelve. Los tramos abiertos desde hilos con el contexto de la sesión (p. ej.
+la carga concurrente de endpoints) cuentan en el rerun de esa sesión.
+
+Para el arranque en frío, las páginas llaman a `iniciar` antes de sus
+importaciones pesadas, las envuelven en `importaciones()` (tramo "importar",
+con el número de módulos que se cargaron) y llaman a `primer_pintado()` tras
+su primer contenido visible: el tramo "primer_pintado" mide desde el inicio
+del rerun y se compara con PRESUPUESTO_PRIMER_PINTADO.
+
+Los fragmentos (`st.fragment`) envuelven su cuerpo en `fragmento(nombre)`:
+dentro de un rerun de la página es un tramo más, y cuando un widget del
+fragmento hace que solo se vuelva a ejecutar él, se mide como un rerun propio
+(con el campo "fragmento" en el log y sin panel, que está en la barra lateral).
+
+Al cerrar el rerun:
+
+- cada tramo se escribe como una línea JSON en `.cache/trazas/trazas.jsonl`
+  (con rotación por tamaño), para poder agregarlos después,
+- si el usuario activa "⏱️ Tiempos de ejecución" en la barra lateral, se
+  muestran los tramos del rerun actual.
+
+El perfilador de muestreo se activa para una sola sesión añadiendo `?perfil=1`
+a la URL (o desde el propio panel): mientras dura el rerun, un hilo toma la
+pila del hilo del script cada pocos milisegundos, y al cerrar se muestran las
+funciones con más muestras y se guardan las pilas en formato colapsado
+(compatible con flamegraph.pl y speedscope) junto al log.
+
+MIPROYECTO_TRAZAS=0 desactiva el log y MIPROYECTO_PRESUPUESTO_PINTADO cambia el
+presupuesto del primer pintado (en segundos).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utilidades.archivos import DIRECTORIO_CACHE
+
+DIRECTORIO = DIRECTORIO_CACHE / "trazas"
+MAX_BYTES_LOG = 5 * 1024 ** 2
+COPIAS_LOG = 5
+LOG_ACTIVO = os.environ.get("MIPROYECTO_TRAZAS", "1") != "0"
+INTERVALO_MUESTREO = 0.005  # Segundos entre muestras del perfilador
+FUNCIONES_PERFIL = 15  # Funciones que se muestran en el panel
+PARAMETRO_PERFIL = "perfil"
+PRESUPUESTO_PRIMER_PINTADO = float(os.environ.get("MIPROYECTO_PRESUPUESTO_PINTADO") or 1.0)
+
+_ejecuciones = {}  # id de sesión -> Ejecucion del rerun en curso (se quita al cerrarlo)
+_ejecuciones_lock = threading.Lock()
+_abiertos = threading.local()  # Pila de tramos abiertos en cada hilo
+_log = None
+_log_lock = threading.Lock()
+
+
+class Tramo:
+    """Una etapa medida de un rerun."""
+
+    CAMPOS = ("cache", "filas_entrada", "filas_salida", "bytes")
+
+    def __init__(self, nombre, cacheado=False, **atributos):
+        self.nombre = nombre
+        self.cache = "acierto" if cacheado else None
+        self.filas_entrada = None
+        self.filas_salida = None
+        self.bytes = None
+        self.segundos = None
+        self.hilo = threading.current_thread().name
+        self.extra = {}
+        for campo, valor in atributos.items():
+            if campo in self.CAMPOS:
+                setattr(self, campo, valor)
+            else:
+                self.extra[campo] = valor
+
+    def como_dict(self):
+        return {
+            "tramo": self.nombre,
+            "segundos": self.segundos,
+            **{campo: getattr(self, campo) for campo in self.CAMPOS},
+            "hilo": self.hilo,
+            **self.extra,
+        }
+
+
+class Muestreador:
+    """Perfilador de muestreo: cuenta las pilas de un hilo tomadas a intervalos fijos."""
+
+    def __init__(self, id_hilo, intervalo=INTERVALO_MUESTREO):
+        self.id_hilo = id_hilo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="trazas-muestreador", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+        return self
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.id_hilo)
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                marco = marco.f_back
+            if pila:
+                self.pilas[tuple(reversed(pila))] += 1
+
+    @property
+    def muestras(self):
+        return sum(self.pilas.values())
+
+    def funciones(self, limite=FUNCIONES_PERFIL):
+        """[(función, muestras propias, muestras incluyendo llamadas)] ordenadas por las propias."""
+        propias = Counter()
+        incluidas = Counter()
+        for pila, muestras in self.pilas.items():
+            propias[pila[-1]] += muestras
+            for funcion in set(pila):
+                incluidas[funcion] += muestras
+        return [(funcion, muestras, incluidas[funcion]) for funcion, muestras in propias.most_common(limite)]
+
+    def guardar(self, ruta):
+        """Escribe las pilas en formato colapsado (`a;b;c muestras`)."""
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            for pila, muestras in self.pilas.most_common():
+                archivo.write(f"{';'.join(pila)} {muestras}\n")
+        return ruta
+
+
+class Ejecucion:
+    """Tramos de un rerun de una sesión."""
+
+    def __init__(self, pagina, sesion, numero, muestreador=None, fragmento=None):
+        self.pagina = pagina
+        self.sesion = sesion
+        self.numero = numero
+        self.fragmento = fragmento  # Nombre del fragmento si el rerun solo ejecuta ese fragmento
+        self.inicio = time.perf_counter()
+        self.tramos = []
+        self.muestreador = muestreador
+        self.segundos = None
+        self.primer_pintado = None
+
+
+def _sesion():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def _logger():
+    global _log
+    with _log_lock:
+        if _log is None:
+            DIRECTORIO.mkdir(parents=True, exist_ok=True)
+            manejador = RotatingFileHandler(
+                DIRECTORIO / "trazas.jsonl", maxBytes=MAX_BYTES_LOG, backupCount=COPIAS_LOG, encoding="utf-8"
+            )
+            manejador.setFormatter(logging.Formatter("%(message)s"))
+            _log = logging.getLogger("miproyecto.trazas")
+            _log.setLevel(logging.INFO)
+            _log.propagate = False
+            _log.addHandler(manejador)
+        return _log
+
+
+def perfil_activo():
+    """True si esta sesión pidió el perfilador (`?perfil=1`)."""
+    return st.query_params.get(PARAMETRO_PERFIL) == "1"
+
+
+def iniciar(pagina, fragmento=None):
+    """Empieza a medir el rerun actual de `pagina` (o solo de su `fragmento`)."""
+    sesion = _sesion()
+    if sesion is None:
+        return None
+    numero = st.session_state.get("_trazas_rerun", 0) + 1
+    st.session_state["_trazas_rerun"] = numero
+    st.session_state["_trazas_pagina"] = pagina
+    muestreador = Muestreador(threading.get_ident()).iniciar() if perfil_activo() else None
+    with _ejecuciones_lock:
+        anterior = _ejecuciones.get(sesion)
+        _ejecuciones[sesion] = ejecucion = Ejecucion(pagina, sesion, numero, muestreador, fragmento)
+    if anterior is not None and anterior.muestreador is not None:
+        anterior.muestreador.detener()  # El rerun anterior se interrumpió antes de cerrar
+    return ejecucion
+
+
+@contextmanager
+def tramo(nombre, cacheado=False, **atributos):
+    """Mide el bloque como un tramo del rerun actual. Devuelve el `Tramo` para anotarlo."""
+    actual = Tramo(nombre, cacheado, **atributos)
+    pila = getattr(_abiertos, "pila", None)
+    if pila is None:
+        pila = _abiertos.pila = []
+    pila.append(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        actual.segundos = time.perf_counter() - inicio
+        pila.pop()
+        sesion = _sesion()
+        with _ejecuciones_lock:
+            ejecucion = _ejecuciones.get(sesion)
+        if ejecucion is not None:
+            ejecucion.tramos.append(actual)
+
+
+@contextmanager
+def fragmento(nombre):
+    """Tramo "fragmento:<nombre>" del cuerpo de un fragmento; si el rerun es solo del fragmento, lo mide entero."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    propio = False
+    if ctx is not None and ctx.fragment_ids_this_run:
+        with _ejecuciones_lock:
+            abierta = _ejecuciones.get(ctx.session_id)
+        # En un fragmento anidado, la ejecución ya la abrió el fragmento exterior
+        propio = abierta is None or abierta.fragmento is None
+    if propio:
+        iniciar(st.session_state.get("_trazas_pagina"), fragmento=nombre)
+    try:
+        with tramo(f"fragmento:{nombre}") as actual:
+            yield actual
+    finally:
+        if propio:
+            cerrar(panel=False)
+
+
+@contextmanager
+def importaciones():
+    """Tramo "importar" para las importaciones pesadas de una página, con los módulos que cargaron."""
+    antes = len(sys.modules)
+    with tramo("importar") as actual:
+        try:
+            yield actual
+        finally:
+            actual.extra["modulos"] = len(sys.modules) - antes
+
+
+def primer_pintado():
+    """Anota el tiempo desde el inicio del rerun hasta el primer contenido visible (una vez por rerun)."""
+    with _ejecuciones_lock:
+        ejecucion = _ejecuciones.get(_sesion())
+    if ejecucion is None or ejecucion.primer_pintado is not None:
+        return None
+    ejecucion.primer_pintado = time.perf_counter() - ejecucion.inicio
+    actual = Tramo(
+        "primer_pintado",
+        presupuesto=PRESUPUESTO_PRIMER_PINTADO,
+        excedido=ejecucion.primer_pintado > PRESUPUESTO_PRIMER_PINTADO,
+    )
+    actual.segundos = ejecucion.primer_pintado
+    ejecucion.tramos.append(actual)
+    return ejecucion.primer_pintado
+
+
+def anotar(nombre, segundos, **extra):
+    """Escribe en el log un tramo suelto, fuera de los reruns (p. ej. la precarga en segundo plano)."""
+    if not LOG_ACTIVO:
+        return
+    linea = {
+        "ts": time.time(),
+        "pagina": None,
+        "tramo": nombre,
+        "segundos": segundos,
+        "hilo": threading.current_thread().name,
+        **extra,
+    }
+    try:
+        _logger().info(json.dumps(linea, ensure_ascii=False, default=str))
+    except OSError:
+        pass
+
+
+def fallo_cache():
+    """Marca como fallo de caché el tramo `cacheado` más interno abierto en este hilo."""
+    for abierto in reversed(getattr(_abiertos, "pila", [])):
+        if abierto.cache is not None:
+            abierto.cache = "fallo"
+            return
+
+
+def bytes_de(df):
+    """Bytes en memoria de un DataFrame, sin recorrer el texto (barato en cada rerun)."""
+    return int(df.memory_usage(index=False, deep=False).sum())
+
+
+def cerrar(panel=True):
+    """Termina el rerun actual: escribe el log y muestra el panel si está activado (y `panel`)."""
+    sesion = _sesion()
+    with _ejecuciones_lock:
+        ejecucion = _ejecuciones.pop(sesion, None)
+    if ejecucion is None:
+        return None
+    ejecucion.segundos = time.perf_counter() - ejecucion.inicio
+    ruta_perfil = None
+    if ejecucion.muestreador is not None:
+        ejecucion.muestreador.detener()
+        if ejecucion.muestreador.muestras:
+            nombre = f"perfil-{sesion[:8]}-{ejecucion.numero}-{time.strftime('%Y%m%d-%H%M%S')}.txt"
+            ruta_perfil = ejecucion.muestreador.guardar(DIRECTORIO / nombre)
+    if LOG_ACTIVO:
+        _escribir_log(ejecucion)
+    if panel:
+        _panel(ejecucion, ruta_perfil)
+    return ejecucion
+
+
+def _escribir_log(ejecucion):
+    comun = {"ts": time.time(), "pagina": ejecucion.pagina, "sesion": ejecucion.sesion, "rerun": ejecucion.numero}
+    if ejecucion.fragmento is not None:
+        comun["fragmento"] = ejecucion.fragmento
+    try:
+        log = _logger()
+        for actual in ejecucion.tramos:
+            log.info(json.dumps({**comun, **actual.como_dict()}, ensure_ascii=False, default=str))
+        log.info(json.dumps({**comun, "tramo": "total", "segundos": ejecucion.segundos}, ensure_ascii=False))
+    except OSError:
+        pass  # Sin disco no hay log, pero la página sigue funcionando
+
+
+def _alternar_perfil():
+    if st.session_state.get("trazas_perfil"):
+        st.query_params[PARAMETRO_PERFIL] = "1"
+    else:
+        st.query_params.pop(PARAMETRO_PERFIL, None)
+
+
+def _panel(ejecucion, ruta_perfil):
+    if not st.sidebar.checkbox("⏱️ Tiempos de ejecución", key="trazas_panel"):
+        return
+    import pandas as pd
+
+    with st.sidebar.container(border=True):
+        st.caption(f"Rerun {ejecucion.numero}: {ejecucion.segundos * 1000:.0f} ms en total")
+        if ejecucion.primer_pintado is not None:
+            excedido = ejecucion.primer_pintado > PRESUPUESTO_PRIMER_PINTADO
+            st.caption(
+                f"{'⚠️ ' if excedido else ''}Primer pintado: {ejecucion.primer_pintado * 1000:.0f} ms "
+                f"(presupuesto {PRESUPUESTO_PRIMER_PINTADO * 1000:.0f} ms)"
+            )
+        if ejecucion.tramos:
+            tramos = pd.DataFrame([actual.como_dict() for actual in ejecucion.tramos])
+            tramos["ms"] = (tramos.pop("segundos") * 1000).round(1)
+            columnas = ["tramo", "ms"] + [col for col in Tramo.CAMPOS if tramos[col].notna().any()]
+            st.dataframe(tramos[columnas], hide_index=True, use_container_width=True)
+        st.toggle(
+            "Perfilador de muestreo (esta sesión)",
+            value=perfil_activo(),
+            key="trazas_perfil",
+            on_change=_alternar_perfil,
+        )
+        if ejecucion.muestreador is not None and ejecucion.muestreador.muestras:
+            funciones = pd.DataFrame(
+                ejecucion.muestreador.funciones(), columns=["función", "propias", "incluidas"]
+            )
+            st.caption(f"{ejecucion.muestreador.muestras} muestras cada {INTERVALO_MUESTREO * 1000:.0f} ms")
+            st.dataframe(funciones, hide_index=True, use_container_width=True)
+            if ruta_perfil is not None:
+                st.caption(f"Pilas completas en `{ruta_perfil}`")